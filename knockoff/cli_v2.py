@@ -30,6 +30,8 @@ class KnockoffCLI(ResourceLocatorMixin):
                        "configuration"),
             "run": "Load data into a database given "
                    "a knockoff_db path",
+            "load": "Load a bundle dumped with "
+                    "knockoff run --dump",
             "version": "Print knockoff version",
         }
 
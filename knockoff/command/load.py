@@ -0,0 +1,46 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+import os
+import argparse
+import sys
+import logging
+
+from knockoff.sdk.bundle import load_bundle
+
+logger = logging.getLogger(__name__)
+
+
+KNOCKOFF_LOAD_DB_URL_ENV = "KNOCKOFF_LOAD_DB_URL"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        usage='''knockoff load <bundle> [<args>]'''
+    )
+    parser.add_argument("bundle",
+                        help="directory of a bundle dumped with knockoff run --dump")
+    parser.add_argument("--url",
+                        default=os.getenv(
+                            KNOCKOFF_LOAD_DB_URL_ENV,
+                            "postgresql://postgres@localhost:5432/postgres"
+                        ),
+                        help="url of the database to load the bundle into")
+    parser.add_argument("--local-infile", action="store_true",
+                        help="load mysql tables with LOAD DATA LOCAL INFILE, "
+                             "which lets the server read any file the client can")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest = load_bundle(args.bundle, url=args.url,
+                           local_infile=args.local_infile)
+    logger.info(f"Loaded {len(manifest['tables'])} tables from {args.bundle}.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
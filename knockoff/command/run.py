@@ -13,6 +13,7 @@ from knockoff.utilities.environ import clear_env_vars
 from knockoff.utilities.ioc import get_container
 from knockoff.sdk.db import KnockoffDB, DefaultDatabaseService
 from knockoff.sdk.blueprint import Blueprint
+from knockoff.sdk.bundle import FORMATS
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +23,14 @@ DEFAULT_TEMPDB_CONTAINER = "knockoff.tempdb.container:TempDBContainer"
 
 KNOCKOFF_RUN_DB_URL_ENV = "KNOCKOFF_RUN_DB_URL"
 KNOCKOFF_RUN_BLUEPRINT_PLAN_ENV = "KNOCKOFF_RUN_BLUEPRINT_PLAN"
+KNOCKOFF_RUN_TEMPDB_SETUP_TEARDOWN_ENV = "KNOCKOFF_RUN_TEMPDB_SETUP_TEARDOWN"
 
 
 def clear_run_env_vars():
     clear_env_vars([
         KNOCKOFF_RUN_DB_URL_ENV,
-        KNOCKOFF_RUN_BLUEPRINT_PLAN_ENV
+        KNOCKOFF_RUN_BLUEPRINT_PLAN_ENV,
+        KNOCKOFF_RUN_TEMPDB_SETUP_TEARDOWN_ENV
     ])
 
 
@@ -37,10 +40,21 @@ def testable_input(prompt=None, **kwargs):
 
 
 def run(knockoff_db: KnockoffDB,
-        blueprint: Blueprint):
+        blueprint: Blueprint,
+        load_mode=False,
+        report_path=None,
+        dump_path=None,
+        dump_format="copy"):
     dfs, knockoff_db = blueprint.construct(knockoff_db)
-    knockoff_db.insert()
+    if dump_path:
+        knockoff_db.dump(dump_path, format=dump_format)
+        logger.info(f"knockoff data successfully dumped to {dump_path}.")
+        return
+    report = knockoff_db.insert(load_mode=load_mode)
     logger.info("knockoff data successfully loaded into database.")
+    if report_path:
+        report.save(report_path)
+        logger.info(f"Insert report written to {report_path}")
 
 
 def seed(i):
@@ -80,7 +94,10 @@ def default_config(container_package):
                     "postgresql://postgres@localhost:5432/postgres"
                 ),
                 "setup_teardown": {
-                    "package": "knockoff.tempdb.setup_teardown:postgres_setup_teardown"
+                    "package": os.getenv(
+                        KNOCKOFF_RUN_TEMPDB_SETUP_TEARDOWN_ENV,
+                        "knockoff.tempdb.setup_teardown:postgres_setup_teardown"
+                    )
                 }
             }
         }
@@ -104,7 +121,31 @@ def parse_args(argv=None):
                         help="Default TempDBContainer")
     parser.add_argument("-s", "--seed", type=int,
                         help="Set seed")
-    return parser.parse_args(argv)
+    parser.add_argument("--load-mode",
+                        action="store_true",
+                        help="drop secondary indexes while loading, then "
+                             "recreate them and analyze the tables")
+    parser.add_argument("--disable-constraints",
+                        action="store_true",
+                        help="with --load-mode, also disable triggers and "
+                             "foreign key checks while loading (requires a "
+                             "superuser on postgresql)")
+    parser.add_argument("--report",
+                        help="path to write a json report of the rows, bytes "
+                             "and generation, serialization and database time "
+                             "of each table inserted")
+    parser.add_argument("--dump",
+                        help="directory to dump the knockoff data to (as a "
+                             "bundle that can be loaded with knockoff load) "
+                             "instead of inserting it")
+    parser.add_argument("--dump-format",
+                        default="copy",
+                        choices=list(FORMATS),
+                        help="format of the dumped tables")
+    args = parser.parse_args(argv)
+    if args.disable_constraints and not args.load_mode:
+        parser.error("--disable-constraints requires --load-mode")
+    return args
 
 
 def main(argv=None):
@@ -129,7 +170,8 @@ def main(argv=None):
 
         # this overrides the configured url for the database service
         # with temp_url
-        override_dict = {"database_service": {"url": temp_url}}
+        override_dict = {"database_service": {"url": temp_url,
+                                              "ephemeral": True}}
 
     container = get_container(
         args.container,
@@ -141,7 +183,18 @@ def main(argv=None):
     knockoff_db = container.knockoff_db()
     blueprint = container.blueprint()
 
-    run(knockoff_db, blueprint)
+    load_mode = args.load_mode
+    if args.disable_constraints:
+        load_mode = {"disable_constraints": True}
+
+    try:
+        run(knockoff_db, blueprint,
+            load_mode=load_mode,
+            report_path=args.report,
+            dump_path=args.dump,
+            dump_format=args.dump_format)
+    finally:
+        knockoff_db.database_service.dispose()
 
     if args.ephemeral:
         try:
@@ -12,6 +12,18 @@ class DependencyNotFoundError(Exception):
         super(DependencyNotFoundError, self).__init__(message)
 
 
+class CyclicDependencyError(AssertionError):
+    """
+    Exception when dependencies form a cycle (an AssertionError,
+    which is what a cycle used to raise)
+    """
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return repr(self.msg)
+
+
 class FactoryNotFound(Exception):
     """Exception when factory function is not found for column"""
     def __init__(self, msg):
@@ -6,11 +6,9 @@
 
 import logging
 import re
-import networkx as nx
-from networkx.algorithms import topological_sort
-from networkx.algorithms import is_directed_acyclic_graph
 
 
+from knockoff.utilities.dag import Dag
 from knockoff.factory.sink import KnockoffSink
 from knockoff.factory.source import KnockoffSource
 from knockoff.factory.node import Table, FactoryPart, FactoryComponent, FactoryPrototype
@@ -26,7 +24,7 @@ DEPENDENCY_PATTERN = re.compile(DEPENDENCY_REGEX)
 
 class BlueprintBuilder:
     def __init__(self):
-        self.dag = nx.DiGraph()
+        self.dag = Dag()
         self.nodes = []
         self.index = {}
         self.dependency_queue = []
@@ -132,7 +130,8 @@ class BlueprintBuilder:
         assert len(self.dag.nodes) == len(self.nodes), 'Mismatch in dag and nodes'
         for i, (node_type, name) in self.dependency_queue:
             self._add_dependency(i, node_type, name, queue_on_error=False)
-        assert is_directed_acyclic_graph(self.dag)
+        # raises CyclicDependencyError if there's a cycle
+        self.dag.topological_sort()
         return Blueprint(self.dag, self.nodes, self.index)
 
 
@@ -146,7 +145,7 @@ class Blueprint:
         return self.nodes[self.index[node_type, name]]
 
     def iter_topologically(self):
-        return topological_sort(self.dag)
+        return iter(self.dag.topological_sort())
 
     @staticmethod
     def from_config(config):
@@ -0,0 +1,171 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import json
+import asyncio
+import logging
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.types import JSON
+
+from knockoff.sdk.db import DefaultDatabaseService
+from knockoff.utilities.io import auto_chunksize, _to_records
+from knockoff.utilities.insert_methods import copy_insert, conflict_statement, MULTI
+from knockoff.utilities.timing import timed, SERIALIZATION
+
+logger = logging.getLogger(__name__)
+
+ASYNCPG = "asyncpg"
+
+
+def _json_dumps(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+class AsyncKnockoffDatabaseService(DefaultDatabaseService):
+    """
+    KnockoffDatabaseService that inserts with sqlalchemy's asyncio
+    extension (see insert_async and KnockoffDB.insert_async).
+
+    The chunks of every DataFrame being inserted share a small pool
+    of connections and at most max_in_flight of them are written at
+    the same time. With asyncpg, chunks are copied with the binary
+    COPY protocol (copy_records_to_table) when the insertion method
+    is "auto" or "copy".
+
+    Reflection, reads and synchronous inserts go through the same
+    backend with its default (synchronous) driver, e.g. for
+    sqlite+aiosqlite:///knockoff.db, sqlite:///knockoff.db is used.
+    In memory databases aren't supported since they wouldn't be shared.
+    sqlite only allows one writer at a time so its chunks are
+    inserted one at a time.
+    """
+    def __init__(self, url, sync_url=None, max_in_flight=None, **kwargs):
+        """
+        :param url: str
+            Database url with an asyncio driver,
+            e.g. postgresql+asyncpg://.. or sqlite+aiosqlite:///..
+        :param sync_url: str, default None
+            Database url used for reflection, reads and synchronous
+            inserts. Defaults to url with the backend's default driver.
+        :param max_in_flight: int, default None
+            Maximum number of chunks inserted concurrently.
+            Defaults to pool_size. Always 1 for sqlite.
+        :param kwargs:
+            Passed to DefaultDatabaseService (e.g. pool_size and
+            max_overflow, which also apply to the async engine).
+        """
+        async_url = make_url(url)
+        if sync_url is None:
+            sync_url = async_url.set(drivername=async_url.get_backend_name())
+            sync_url = sync_url.render_as_string(hide_password=False)
+        super(AsyncKnockoffDatabaseService, self).__init__(url=sync_url, **kwargs)
+        self.async_engine = create_async_engine(async_url, **self.pool_kwargs)
+        # sqlite locks the whole database for each write
+        self.supports_concurrent_writes = (async_url.get_backend_name() !=
+                                           sqlite.dialect.name)
+        self.max_in_flight = (max_in_flight or self.pool_kwargs['pool_size']
+                              if self.supports_concurrent_writes else 1)
+        self._in_flight = None
+
+    def dispose(self):
+        # connections of the async engine can only be closed by
+        # awaiting dispose_async, so they're dereferenced instead
+        self.async_engine.sync_engine.dispose(close=False)
+        super(AsyncKnockoffDatabaseService, self).dispose()
+
+    async def dispose_async(self):
+        await self.async_engine.dispose()
+        super(AsyncKnockoffDatabaseService, self).dispose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self.dispose_async()
+
+    def _semaphore(self):
+        # asyncio primitives belong to the loop they're first used in
+        loop = asyncio.get_running_loop()
+        if self._in_flight is None or self._in_flight[0] is not loop:
+            self._in_flight = (loop, asyncio.Semaphore(self.max_in_flight))
+        return self._in_flight[1]
+
+    async def _insert_chunk(self, table, df, semaphore, statement=None):
+        keys = list(df.columns)
+        async with semaphore:
+            with timed(SERIALIZATION):
+                rows = _to_records(df, table)
+            async with self.async_engine.begin() as conn:
+                for session_statement, _ in self._session_statements or []:
+                    await conn.exec_driver_sql(session_statement)
+                try:
+                    if (statement is None and
+                            self.async_engine.dialect.driver == ASYNCPG and
+                            self.kwargs['method'] is copy_insert):
+                        await self._copy_records(conn, table, keys, rows)
+                    else:
+                        with timed(SERIALIZATION):
+                            records = [dict(zip(keys, row)) for row in rows]
+                        await conn.execute(statement if statement is not None
+                                           else table.insert(), records)
+                finally:
+                    for _, reset_statement in self._session_statements or []:
+                        if reset_statement:
+                            await conn.exec_driver_sql(reset_statement)
+
+    async def _copy_records(self, conn, table, keys, rows):
+        with timed(SERIALIZATION):
+            json_columns = [i for i, key in enumerate(keys)
+                            if isinstance(table.c[key].type, JSON)]
+            if json_columns:
+                # asyncpg's json codecs expect strings
+                rows = [tuple(_json_dumps(value) if i in json_columns else value
+                              for i, value in enumerate(row))
+                        for row in rows]
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            table.name,
+            records=rows,
+            columns=keys,
+            schema_name=table.schema
+        )
+
+    async def insert_async(self, name, df, dtype=None, on_conflict=None,
+                           conflict_columns=None, **kwargs):
+        """
+        Insert df in chunks that are written concurrently (at
+        most max_in_flight at a time across every insert).
+
+        dtype is ignored since the table is reflected. on_conflict
+        and conflict_columns are the same as for insert.
+        """
+        table = await asyncio.to_thread(self.reflect_table, name)
+        on_conflict = on_conflict or self.on_conflict
+        statement = None
+        if on_conflict:
+            statement = conflict_statement(table, list(df.columns),
+                                           self.engine.dialect.name,
+                                           on_conflict, conflict_columns)
+        chunksize = self.kwargs.get('chunksize') or auto_chunksize(
+            df.shape[1], self.engine.dialect.name, MULTI
+        )
+        semaphore = self._semaphore()
+        tasks = [asyncio.ensure_future(self._insert_chunk(table,
+                                                          df[i:i+chunksize],
+                                                          semaphore,
+                                                          statement))
+                 for i in range(0, df.shape[0], chunksize)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
@@ -0,0 +1,204 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+"""
+Parallel generation of the tables of a KnockoffDB (see KnockoffDB.build),
+which is opt-in with prefer="processes" or prefer="threads".
+
+Each table is submitted as soon as every table it depends on has
+been built. With processes, a table is pickled (with cloudpickle,
+so lambdas and closures work) without the tables it references:
+those are replaced by their built DataFrames, which are the only
+part of them a worker needs (and which joblib memory maps when
+they're large).
+"""
+
+import io
+import pickle
+import hashlib
+import logging
+from concurrent.futures import (Future, ThreadPoolExecutor,
+                                wait, FIRST_COMPLETED)
+
+from faker import Faker
+from numpy import random
+from joblib.executor import get_memmapping_executor
+
+try:
+    import cloudpickle
+except ImportError:  # joblib < 1.5 vendors it
+    from joblib.externals import cloudpickle
+
+from knockoff.sdk.table import KnockoffTable
+
+logger = logging.getLogger(__name__)
+
+PROCESSES = "processes"
+THREADS = "threads"
+
+_BUILT_TABLE = "built_table"
+_EXCLUDED = "excluded"
+
+
+def table_seed(seed, name):
+    """seed of a table derived from the KnockoffDB's seed and its name"""
+    digest = hashlib.sha256(f"{seed}:{name}".encode("utf8")).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+class _TablePickler(cloudpickle.CloudPickler):
+    """
+    Pickles a table with the other built tables it references
+    replaced by persistent ids (collected in self.dependencies).
+    """
+    def __init__(self, file, table, excluded):
+        super(_TablePickler, self).__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.table = table
+        self.excluded = {id(obj) for obj in excluded if obj is not None}
+        self.dependencies = {}
+
+    def persistent_id(self, obj):
+        if (isinstance(obj, KnockoffTable) and
+                obj is not self.table and
+                obj._df is not None):
+            self.dependencies[obj.name] = {"df": obj._df,
+                                           "columns": obj.columns,
+                                           "dtype": obj.dtype}
+            return _BUILT_TABLE, obj.name
+        if id(obj) in self.excluded:
+            # e.g. database services, tables are already prepared
+            return _EXCLUDED, None
+        return None
+
+
+class _TableUnpickler(pickle.Unpickler):
+    def __init__(self, file, dependencies):
+        super(_TableUnpickler, self).__init__(file)
+        self.dependencies = dependencies
+        self.tables = {}
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind == _EXCLUDED:
+            return None
+        if name not in self.tables:
+            dependency = self.dependencies[name]
+            table = KnockoffTable(name,
+                                  columns=dependency["columns"],
+                                  dtype=dependency["dtype"])
+            table.prepare()
+            table._df = dependency["df"]
+            self.tables[name] = table
+        return self.tables[name]
+
+
+def _dumps(table, excluded):
+    buffer = io.BytesIO()
+    pickler = _TablePickler(buffer, table, excluded)
+    pickler.dump(table)
+    return buffer.getvalue(), pickler.dependencies
+
+
+def _seed(seed):
+    if seed is not None:
+        Faker.seed(seed)
+        random.seed(seed)
+
+
+def _build_table(table, seed):
+    _seed(seed)
+    return table.build()
+
+
+def _build_pickled_table(payload, dependencies, seed):
+    table = _TableUnpickler(io.BytesIO(payload), dependencies).load()
+    return _build_table(table, seed)
+
+
+def _completed(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _submit_to_process(executor, table, seed, excluded):
+    try:
+        payload, dependencies = _dumps(table, excluded)
+    except Exception as e:
+        # e.g. a factory holding a generator
+        logger.debug(f"Building table {table.name} in this process, "
+                     f"it can't be pickled: {e!r}")
+        return _completed(_build_table, table, seed)
+    return executor.submit(_build_pickled_table, payload, dependencies, seed)
+
+
+def build_tables(knockoff_db, max_workers=None, prefer=None, node_ids=None):
+    """
+    Build every table of knockoff_db (see KnockoffDB.build), or only
+    those in node_ids, which must include the ancestors of each.
+
+    :return: dict[str, pd.DataFrame]
+    """
+    if prefer not in (None, PROCESSES, THREADS):
+        raise ValueError(f"prefer must be None, {PROCESSES!r} or {THREADS!r}. "
+                         f"Received: {prefer!r}.")
+    dag_service = knockoff_db.dag_service
+    database_service = knockoff_db.database_service
+    nodes = {node.node_id: node for node in dag_service.iter_topologically()
+             if node_ids is None or node.node_id in node_ids}
+    for node in nodes.values():
+        # reflection happens here, workers get prepared tables
+        node.table.prepare(database_service=database_service)
+
+    max_workers = max_workers or knockoff_db.max_workers
+    if prefer is None or max_workers == 1 or len(nodes) == 1:
+        return {node.table.name: node.table.df for node in nodes.values()}
+
+    seeds = {node_id: (table_seed(knockoff_db.seed, node.table.name)
+                       if knockoff_db.seed else None)
+             for node_id, node in nodes.items()}
+    excluded = [database_service] + [node.table.database_service
+                                     for node in nodes.values()]
+    if prefer == PROCESSES:
+        # joblib's reusable executor, so workers are only started
+        # once and large arrays are memory mapped instead of copied
+        executor = get_memmapping_executor(max_workers)
+
+        def submit(node):
+            return _submit_to_process(executor, node.table,
+                                      seeds[node.node_id], excluded)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        def submit(node):
+            # the tables share the global random state,
+            # so seeded builds aren't reproducible
+            return executor.submit(node.table.build)
+
+    # like table.df, tables that were already built are kept
+    done = {node_id for node_id, node in nodes.items()
+            if node.table._df is not None}
+    running = {}
+    try:
+        while not nodes.keys() <= done:
+            for node_id in dag_service.ready(done):
+                if node_id in nodes and node_id not in running:
+                    running[node_id] = submit(nodes[node_id])
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for node_id, future in list(running.items()):
+                if future in finished:
+                    del running[node_id]
+                    nodes[node_id].table._df = future.result()
+                    done.add(node_id)
+    finally:
+        for future in running.values():
+            future.cancel()
+        if prefer == THREADS:
+            executor.shutdown(wait=True)
+    return {node.table.name: node.table.df for node in nodes.values()}
@@ -0,0 +1,373 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+"""
+Bundles are knockoff data dumped to files (one per table) with a
+manifest listing the tables in topological order, so the same
+generated data can be restored many times without generating it
+again (see KnockoffDB.dump and load_bundle).
+"""
+
+import io
+import os
+import json
+import gzip
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, insert, literal, null
+from sqlalchemy import table as sql_table, column as sql_column
+from sqlalchemy.dialects import postgresql, mysql
+from sqlalchemy.engine import make_url
+
+from knockoff.utilities.io import _TableRef
+from knockoff.utilities.insert_methods import (format_copy_value,
+                                               executemany_insert,
+                                               load_data_insert,
+                                               load_data_connect_args)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+BUNDLE_VERSION = 1
+
+# postgres COPY text format (tab separated, \N for nulls),
+# which is also mysql LOAD DATA's default format
+COPY = "copy"
+COPY_GZ = "copy.gz"
+# multi-row INSERT statements for a dialect
+SQL = "sql"
+
+FORMATS = {
+    COPY: ".tsv",
+    COPY_GZ: ".tsv.gz",
+    SQL: ".sql",
+}
+
+ROWS_PER_STATEMENT = 1000
+LOAD_BATCH_SIZE = 10000
+
+_COPY_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+
+
+def _python_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _rows(df):
+    df = df.astype(object).where(df.notna(), None)
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(map(_python_value, row))
+
+
+def format_bundle_value(value):
+    """format a value as a field of a copy bundle file"""
+    if isinstance(value, bool):
+        # accepted by postgres and mysql
+        return "1" if value else "0"
+    if isinstance(value, datetime.datetime):
+        # a space (instead of T) like LOAD DATA expects
+        return value.isoformat(sep=" ")
+    return format_copy_value(value)
+
+
+def parse_copy_line(line):
+    """fields of a line of the COPY text format (None for \\N)"""
+    values = []
+    for field in line.rstrip("\n").split("\t"):
+        if field == "\\N":
+            values.append(None)
+            continue
+        if "\\" not in field:
+            values.append(field)
+            continue
+        chars = []
+        i = 0
+        while i < len(field):
+            if field[i] == "\\" and i + 1 < len(field):
+                chars.append(_COPY_UNESCAPES.get(field[i+1], field[i+1]))
+                i += 2
+            else:
+                chars.append(field[i])
+                i += 1
+        values.append("".join(chars))
+    return values
+
+
+def _literal_dialect(dialect_name):
+    # named parameters so that percent signs in string
+    # literals aren't escaped for the driver
+    dialect = make_url(f"{dialect_name}://").get_dialect()(paramstyle="named")
+    if dialect.name == postgresql.dialect.name:
+        # standard_conforming_strings is on by default
+        dialect._backslash_escapes = False
+    return dialect
+
+
+def _literal(value):
+    if value is None:
+        return null()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return literal(value)
+
+
+def _serialize_copy(df):
+    return "".join("\t".join(map(format_bundle_value, row)) + "\n"
+                   for row in _rows(df))
+
+
+def _serialize_sql(df, name, dialect):
+    target = sql_table(name, *map(sql_column, df.columns))
+    # literals are typed by their value since the columns aren't
+    rows = [dict(zip(df.columns, map(_literal, row))) for row in _rows(df)]
+    statements = []
+    for i in range(0, len(rows), ROWS_PER_STATEMENT):
+        statement = insert(target).values(rows[i:i+ROWS_PER_STATEMENT])
+        statements.append(str(statement.compile(
+            dialect=dialect,
+            compile_kwargs={"literal_binds": True}
+        )) + ";\n")
+    return "".join(statements)
+
+
+def _append(path, text, format):
+    if format == COPY_GZ:
+        # mtime=0 so the same data is always dumped to the same bytes
+        with open(path, "ab") as f, \
+                gzip.GzipFile(filename="", mode="ab", fileobj=f, mtime=0) as gz:
+            gz.write(text.encode("utf8"))
+    else:
+        with open(path, "a", encoding="utf8") as f:
+            f.write(text)
+
+
+def dump_bundle(knockoff_db, path, format=COPY, dialect=None, max_workers=None):
+    """
+    Generate every table of knockoff_db and dump the ones it would
+    insert to a bundle instead of the database (see KnockoffDB.dump).
+
+    Tables (or chunks, see KnockoffDB.chunksize) are generated in
+    topological order on the calling thread and serialized by a
+    pool of threads. Chunks are appended to their table's file
+    in the order they were generated.
+
+    :return: dict
+        The bundle's manifest.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported bundle format: {format}. "
+                         f"Expected one of {list(FORMATS)}.")
+    if format == SQL and dialect is None:
+        engine = getattr(knockoff_db.database_service, "engine", None)
+        dialect = engine.dialect.name if engine is not None else postgresql.dialect.name
+    literal_dialect = _literal_dialect(dialect) if format == SQL else None
+    os.makedirs(path, exist_ok=True)
+
+    slots = threading.BoundedSemaphore(knockoff_db.max_queue_size)
+    errors = []
+    tables = []
+
+    def write_chunk(df, name, file_path, previous):
+        try:
+            if format == SQL:
+                text = _serialize_sql(df, name, literal_dialect)
+            else:
+                text = _serialize_copy(df)
+            if previous is not None:
+                # keep chunks in order (previous was submitted
+                # first, so it's already running)
+                previous.result()
+            if not errors:
+                _append(file_path, text, format)
+        except Exception as e:
+            errors.append(e)
+            raise
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers or knockoff_db.max_workers) as executor:
+        for node in knockoff_db.dag_service.iter_topologically():
+            node.table.prepare(database_service=knockoff_db.database_service)
+            if not node.insert:
+                _ = node.table.df  # create table needed downstream
+                continue
+            entry = {"name": node.table.name,
+                     "file": node.table.name + FORMATS[format],
+                     "columns": [],
+                     "rows": 0}
+            tables.append(entry)
+            file_path = os.path.join(path, entry["file"])
+            open(file_path, "wb").close()
+            previous = None
+            for df in knockoff_db._iter_chunks(node):
+                slots.acquire()
+                if errors:
+                    slots.release()
+                    break
+                entry["columns"] = entry["columns"] or list(df.columns)
+                entry["rows"] += df.shape[0]
+                previous = executor.submit(write_chunk, df, node.table.name,
+                                           file_path, previous)
+            if errors:
+                break
+
+    if errors:
+        raise errors[0]
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "format": format,
+        "dialect": dialect if format == SQL else None,
+        "tables": tables,
+    }
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Dumped {len(tables)} tables to {path}")
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version: {manifest.get('version')}")
+    return manifest
+
+
+def split_statements(text, backslash_escapes=False):
+    """split sql on the semicolons that aren't in string literals"""
+    statements = []
+    start = 0
+    in_string = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string and backslash_escapes and char == "\\":
+            i += 2
+            continue
+        if char == "'":
+            # '' (an escaped quote) toggles twice
+            in_string = not in_string
+        elif char == ";" and not in_string:
+            statements.append(text[start:i].strip())
+            start = i + 1
+        i += 1
+    statements.append(text[start:].strip())
+    return [statement for statement in statements if statement]
+
+
+def _execute_statements(conn, statements):
+    # executed with the DBAPI cursor and no parameters so
+    # percent signs in string literals aren't placeholders
+    cursor = conn.connection.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def _open_copy_file(path, format):
+    if format == COPY_GZ:
+        return gzip.open(path, "rt", encoding="utf8", newline="\n")
+    return open(path, encoding="utf8", newline="\n")
+
+
+def _copy_from(conn, entry, f):
+    preparer = conn.dialect.identifier_preparer
+    columns = ", ".join(map(preparer.quote, entry["columns"]))
+    sql = f"COPY {preparer.quote(entry['name'])} ({columns}) FROM STDIN"
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(sql, f)
+        else:
+            # psycopg (3)
+            with cursor.copy(sql) as copy:
+                while data := f.read(io.DEFAULT_BUFFER_SIZE):
+                    copy.write(data)
+    finally:
+        cursor.close()
+
+
+def _insert_lines(conn, entry, f, local_infile=False):
+    method = (load_data_insert
+              if local_infile and conn.dialect.name == mysql.dialect.name
+              else executemany_insert)
+    ref = _TableRef(entry["name"], None)
+    batch = []
+    for line in f:
+        batch.append(parse_copy_line(line))
+        if len(batch) == LOAD_BATCH_SIZE:
+            method(ref, conn, entry["columns"], iter(batch))
+            batch = []
+    if batch:
+        method(ref, conn, entry["columns"], iter(batch))
+
+
+def load_bundle(path, engine=None, url=None, local_infile=False):
+    """
+    Restore a bundle dumped with KnockoffDB.dump.
+
+    Tables are loaded in the manifest's (topological) order, each
+    in its own transaction. Copy bundles are streamed to postgres
+    with COPY FROM STDIN, to mysql with LOAD DATA LOCAL INFILE if
+    local_infile is True (see load_data_insert) and inserted with
+    executemany otherwise.
+
+    :param path: str
+        Directory of the bundle.
+    :param engine: sqlalchemy.engine.Engine, default None
+    :param url: str, default None
+        Used to create an engine if engine isn't provided.
+    :param local_infile: bool, default False
+        If True, the engine created for url allows LOAD DATA LOCAL
+        INFILE (see load_data_connect_args) and it's used for mysql.
+        This lets the server read any file the client can, so only
+        enable it for trusted servers. A provided engine must have
+        been created with the same connect args.
+    :return: dict
+        The bundle's manifest.
+    """
+    manifest = read_manifest(path)
+    owns_engine = engine is None
+    if owns_engine:
+        connect_args = load_data_connect_args(url) if local_infile else {}
+        engine = create_engine(url, future=True, connect_args=connect_args)
+    try:
+        for entry in manifest["tables"]:
+            if not entry["rows"]:
+                continue
+            logger.info(f"Loading table: {entry['name']}")
+            file_path = os.path.join(path, entry["file"])
+            with engine.begin() as conn:
+                if manifest["format"] == SQL:
+                    with open(file_path, encoding="utf8") as f:
+                        statements = split_statements(
+                            f.read(),
+                            backslash_escapes=manifest["dialect"] == mysql.dialect.name
+                        )
+                    _execute_statements(conn, statements)
+                else:
+                    with _open_copy_file(file_path, manifest["format"]) as f:
+                        if conn.dialect.name == postgresql.dialect.name:
+                            _copy_from(conn, entry, f)
+                        else:
+                            _insert_lines(conn, entry, f, local_infile)
+    finally:
+        if owns_engine:
+            engine.dispose()
+    return manifest
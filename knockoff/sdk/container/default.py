@@ -5,30 +5,39 @@
 # the LICENSE file in the root directory of this source tree.
 
 from dependency_injector import containers, providers
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
 
-from knockoff.sdk.db import KnockoffDB, DefaultDatabaseService
+from knockoff.sdk.db import KnockoffDB, create_database_service
 from knockoff.sdk.blueprint import Blueprint
 
 
 class KnockoffContainer(containers.DeclarativeContainer):
     config = providers.Configuration()
 
-    engine = providers.Factory(
-        create_engine,
-        config.database_service.url,
-        poolclass=NullPool
-    )
-
+    # the database service owns a single pooled engine that is
+    # shared by all reflection and insert calls. Its class is
+    # resolved from the url's backend (e.g. sqlite or duckdb)
     database_service = providers.Singleton(
-        DefaultDatabaseService,
-        engine=engine
+        create_database_service,
+        url=config.database_service.url,
+        ephemeral=config.database_service.ephemeral,
+        pool_size=config.database_service.pool_size,
+        max_overflow=config.database_service.max_overflow,
+        pool_pre_ping=config.database_service.pool_pre_ping,
+        pool_recycle=config.database_service.pool_recycle,
+        reflection_cache_dir=config.database_service.reflection_cache_dir,
+        on_conflict=config.database_service.on_conflict
     )
 
+    # kept for containers and configs that reference it,
+    # it's the database service's engine
+    engine = database_service.provided.engine
+
     knockoff_db = providers.Singleton(
         KnockoffDB,
-        database_service=database_service
+        database_service=database_service,
+        max_workers=config.knockoff_db.max_workers,
+        chunksize=config.knockoff_db.chunksize,
+        max_queue_size=config.knockoff_db.max_queue_size
     )
 
     blueprint = providers.Factory(
@@ -5,9 +5,7 @@
 # the LICENSE file in the root directory of this source tree.
 
 
-import networkx as nx
-from networkx.algorithms import topological_sort
-from networkx.algorithms import is_directed_acyclic_graph
+from knockoff.utilities.dag import Dag
 
 
 class Node(object):
@@ -24,7 +22,7 @@ class Node(object):
 
 class DagService(object):
     def __init__(self):
-        self.dag = nx.DiGraph()
+        self.dag = Dag()
         self.nodes = []
         self.index = {}
 
@@ -38,9 +36,35 @@ class DagService(object):
         self.nodes.append(node)
         self.index[node_id] = ix
         self.dag.add_node(node_id)
+        self.add_dependencies(node_id, depends_on)
+
+    def add_dependencies(self, node_id, depends_on):
+        """add edges from the nodes in depends_on to node_id"""
         if depends_on:
             self.dag.add_edges_from([(other_node_id, node_id) for other_node_id in depends_on])
 
     def iter_topologically(self):
-        assert is_directed_acyclic_graph(self.dag)
-        return (self.nodes[self.index[node_id]] for node_id in topological_sort(self.dag))
+        return (self.nodes[self.index[node_id]] for node_id in self.dag.topological_sort())
+
+    def levels(self):
+        """
+        ids of the nodes grouped by depth, every node only
+        depends on nodes in earlier levels
+        """
+        return [list(level) for level in self.dag.levels()]
+
+    def ancestors(self, node_ids):
+        """ids of every node the nodes in node_ids (transitively) depend on"""
+        return self.dag.ancestors(node_ids)
+
+    def ready(self, done):
+        """ids of the nodes that aren't done and only depend on done nodes"""
+        return self.dag.ready(done)
+
+    def parents(self, node_id):
+        """ids of the nodes node_id depends on"""
+        return list(self.dag.predecessors(node_id))
+
+    def children(self, node_id):
+        """ids of the nodes that depend on node_id"""
+        return list(self.dag.successors(node_id))
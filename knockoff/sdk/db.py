@@ -5,32 +5,121 @@
 # the LICENSE file in the root directory of this source tree.
 
 
+import os
+import time
+import asyncio
+import pickle
+import hashlib
 import logging
+import threading
 from abc import ABCMeta, abstractmethod
 from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
-from sqlalchemy import MetaData, Table, inspect
-from sqlalchemy.dialects import postgresql, mysql
+from sqlalchemy import MetaData, Table, inspect, select, func, text, bindparam
+from sqlalchemy.dialects import postgresql, mysql, sqlite
 from sqlalchemy.types import JSON
-from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.exc import NoSuchTableError, DBAPIError
 from sqlalchemy.dialects.mysql import TINYINT
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
 
+import pandas as pd
 from faker import Faker
 from numpy import random
 
-from knockoff.utilities.io import to_sql
+from knockoff.utilities.io import (to_sql, auto_chunksize, probe_insert_methods,
+                                   WriterPool)
+from knockoff.utilities.insert_methods import (AUTO, AUTOTUNE, LOAD_DATA, method_name,
+                                               resolve_insert_method,
+                                               candidate_insert_methods,
+                                               load_data_connect_args,
+                                               load_data_insert,
+                                               ConflictInsert)
 from knockoff.orm import get_engine, get_child_tables
+from knockoff.utilities.importlib_utils import resolve_package_name
 from knockoff.sdk.constraints import KnockoffUniqueConstraint
 from knockoff.sdk.dag import DagService, Node
+from knockoff.sdk.report import InsertReport, ChunkMetrics
+from knockoff.sdk.bundle import dump_bundle
+from knockoff.sdk.build import build_tables
+from knockoff.utilities import timing
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_RECYCLE = 3600
+DEFAULT_MAX_WORKERS = 4
+
+# where KnockoffDB.build/insert(only=..) load ancestors from
+DATABASE_ANCESTORS = "database"
+CACHED_ANCESTORS = "cache"
+
+# queries that cheaply describe the tables, columns and constraints
+# in the current schema. Their results are hashed to key the on-disk
+# reflection cache so it is invalidated whenever the schema changes.
+SCHEMA_FINGERPRINT_QUERIES = {
+    postgresql.dialect.name: [
+        "select table_name, column_name, data_type, is_nullable "
+        "from information_schema.columns "
+        "where table_schema = current_schema() "
+        "order by table_name, ordinal_position",
+        "select table_name, constraint_name, constraint_type "
+        "from information_schema.table_constraints "
+        "where table_schema = current_schema() "
+        "order by table_name, constraint_name",
+    ],
+    mysql.dialect.name: [
+        "select table_name, column_name, column_type, is_nullable "
+        "from information_schema.columns "
+        "where table_schema = database() "
+        "order by table_name, ordinal_position",
+        "select table_name, constraint_name, constraint_type "
+        "from information_schema.table_constraints "
+        "where table_schema = database() "
+        "order by table_name, constraint_name",
+    ],
+    sqlite.dialect.name: [
+        "select type, name, sql from sqlite_master order by type, name",
+    ],
+}
+
+# (statement, reset_statement) pairs executed in every insert
+# transaction while in load mode. SET LOCAL only lasts for the
+# transaction so it doesn't need to be reset.
+LOAD_MODE_SESSION_STATEMENTS = {
+    postgresql.dialect.name: [
+        ("SET LOCAL synchronous_commit = off", None),
+    ],
+}
+LOAD_MODE_DISABLE_CONSTRAINTS_STATEMENTS = {
+    # disables triggers, including the ones enforcing foreign keys
+    postgresql.dialect.name: [
+        ("SET LOCAL session_replication_role = replica", None),
+    ],
+    mysql.dialect.name: [
+        ("SET SESSION foreign_key_checks = 0",
+         "SET SESSION foreign_key_checks = 1"),
+    ],
+}
+ANALYZE_STATEMENTS = {
+    postgresql.dialect.name: "ANALYZE {}",
+    mysql.dialect.name: "ANALYZE TABLE {}",
+    sqlite.dialect.name: "ANALYZE {}",
+}
+
 
 class KnockoffDatabaseService(metaclass=ABCMeta):
 
     Schema = namedtuple("Schema", ["columns", "dtype"])
 
+    # whether inserts can run concurrently. Otherwise KnockoffDB
+    # inserts one chunk at a time (e.g. sqlite's single writer)
+    supports_concurrent_writes = True
+
     @abstractmethod
     def reflect_table(self, name):
         return  # pragma: no cover
@@ -51,24 +140,178 @@ class KnockoffDatabaseService(metaclass=ABCMeta):
     def reflect_schema(self, name) -> Schema:
         return  # pragma: no cover
 
+    def max_value(self, name, column):
+        """return max(column) for table name or None if it's empty"""
+        raise NotImplementedError(f"{type(self).__name__} does not "
+                                  f"implement max_value")
+
+    def read_sample(self, name, size):
+        """return a DataFrame with up to size rows of table name"""
+        raise NotImplementedError(f"{type(self).__name__} does not "
+                                  f"implement read_sample")
+
+    def read_table(self, name):
+        """return a DataFrame with every row of table name"""
+        raise NotImplementedError(f"{type(self).__name__} does not "
+                                  f"implement read_table")
+
+    def truncate(self, tables):
+        """
+        delete every row of tables, which are in topological
+        order (i.e. referenced tables before the tables that
+        reference them)
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not "
+                                  f"implement truncate")
+
+    def dispose(self):
+        """release any resources (e.g. pooled connections) held by the service"""
+        return
+
+    @contextmanager
+    def load_mode(self, tables=None, **kwargs):
+        """
+        Context manager for loading tables as fast as possible.
+        Services without a load mode insert as usual.
+        """
+        yield self
+
 
 class DefaultDatabaseService(KnockoffDatabaseService):
-    def __init__(self, engine=None, **kwargs):
-        self.engine = engine or get_engine()
-        # No longer using the engine directly. Recreating with url instead
-        # since we were getting "TypeError: argument 2 must be a connection,
-        # cursor or None" when testing with mysql
-        self.url = str(self.engine.url)
+    # whether the chunks of a DataFrame that isn't inserted
+    # in parallel are written in a single transaction
+    single_transaction = False
+
+    def __init__(self, engine=None, url=None,
+                 pool_size=None,
+                 max_overflow=None,
+                 pool_pre_ping=None,
+                 pool_recycle=None,
+                 bulk_reflect=True,
+                 reflection_cache_dir=None,
+                 max_writers=None,
+                 on_conflict=None,
+                 local_infile=False,
+                 **kwargs):
+        """
+        :param engine: sqlalchemy.engine.Engine, default None
+            If provided, this engine is used as is. Otherwise the
+            service creates and owns a single pooled engine for url
+            that is shared by every reflection and insert.
+        :param url: str, default None
+            Database url. Defaults to the url of the default
+            engine configured with knockoff.orm.
+        :param pool_size: int, default 5
+        :param max_overflow: int, default 10
+        :param pool_pre_ping: bool, default True
+        :param pool_recycle: int, default 3600
+            Seconds after which pooled connections are recycled.
+        :param bulk_reflect: bool, default True
+            If True, the whole schema is reflected (tables, primary
+            keys and unique constraints) in a few round trips the first
+            time any table is reflected and cached in memory. Tables
+            missing from the cache (e.g. postgres partitioned tables)
+            fall back to being reflected individually.
+        :param reflection_cache_dir: str, default None
+            If provided, bulk reflections are also pickled to this
+            directory, keyed by the url and a fingerprint of the schema,
+            and reused across processes until the schema changes.
+        :param max_writers: int, default None
+            Number of threads in the service's WriterPool, which
+            writes the chunks of parallelized inserts with the
+            service's engine. Defaults to pool_size.
+        :param on_conflict: str, default None
+            Default on_conflict of insert (see insert).
+        :param local_infile: bool, default False
+            If True, mysql engines created by the service allow
+            LOAD DATA LOCAL INFILE and it is used to insert by
+            default. This lets the server read any file the client
+            can, so only enable it for trusted servers. Implied by
+            method="load_data".
+        :param kwargs:
+            Passed to pandas.DataFrame.to_sql on insert. The
+            method defaults to "auto" which uses COPY for postgresql,
+            LOAD DATA LOCAL INFILE (if local_infile) or batched
+            executemany for mysql and multi-row INSERT statements otherwise
+            (see knockoff.utilities.insert_methods). With "autotune",
+            the first rows inserted into each table are used to time
+            the methods the dialect supports and the fastest is used
+            for the rest of the table (see autotune_report).
+            The chunksize defaults to one based on the number of
+            columns and the dialect's limit on bound parameters.
+        """
+        self.pool_kwargs = {
+            'pool_size': DEFAULT_POOL_SIZE if pool_size is None else pool_size,
+            'max_overflow': DEFAULT_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            'pool_pre_ping': True if pool_pre_ping is None else pool_pre_ping,
+            'pool_recycle': DEFAULT_POOL_RECYCLE if pool_recycle is None else pool_recycle,
+        }
         self.kwargs = {
             'if_exists': 'append',
             'index': False,
-            'method': 'multi'
+            'method': AUTO
         }
         self.kwargs.update(kwargs)
+        self.local_infile = (local_infile or
+                             self.kwargs['method'] in (LOAD_DATA, load_data_insert))
+        if engine is None:
+            url = url or get_engine(build='builder').build(uri_only=True)
+            engine = self._create_engine(url)
+        self.engine = engine
+        # render the password so the url can be used to
+        # create engines in worker processes
+        self.url = self.engine.url.render_as_string(hide_password=False)
+        self.bulk_reflect = bulk_reflect
+        self.reflection_cache_dir = reflection_cache_dir
+        self._reflection = None
+        self._session_statements = None
+        self.max_writers = max_writers or self.pool_kwargs['pool_size']
+        self.on_conflict = on_conflict
+        self._conflict_methods = {}
+        self._writer_pool = None
+        self._writer_pool_lock = threading.Lock()
+        # insertion method (and metrics) chosen for each table with "autotune"
+        self.autotune_report = {}
+        self._autotuned = {}
+        # tables being probed and the locks guarding their entries
+        self._autotuning = set()
+        self._autotune_locks = {}
+        # e.g. resolve "auto" to the fastest insertion method for the dialect
+        self.kwargs['method'] = resolve_insert_method(self.kwargs['method'],
+                                                      self.engine.dialect.name,
+                                                      self.local_infile)
+
+    def _create_engine(self, url):
+        # lets mysql engines use LOAD DATA LOCAL INFILE if opted into
+        connect_args = load_data_connect_args(url) if self.local_infile else {}
+        return create_engine(url, future=True,
+                             connect_args=connect_args,
+                             **self.pool_kwargs)
+
+    @property
+    def writer_pool(self):
+        """WriterPool created the first time it's used"""
+        with self._writer_pool_lock:
+            if self._writer_pool is None:
+                self._writer_pool = WriterPool(self.engine,
+                                               max_workers=self.max_writers)
+            return self._writer_pool
+
+    def dispose(self):
+        with self._writer_pool_lock:
+            if self._writer_pool is not None:
+                self._writer_pool.close()
+                self._writer_pool = None
+        self.engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.dispose()
 
     def has_table(self, name):
-        engine = create_engine(self.url, future=True)
-        with engine.connect() as conn:
+        with self.engine.connect() as conn:
             return conn.dialect.has_table(conn, name)
 
     def _resolve_table_name_postgresql(self, name, conn):
@@ -88,23 +331,142 @@ class DefaultDatabaseService(KnockoffDatabaseService):
                 return names[0]
             raise
 
-    def _resolve_table_name(self, name):
-        engine = create_engine(self.url, future=True)
-        with engine.connect() as conn:
-            dialect = conn.dialect.name
-            if dialect == postgresql.dialect.name:
-                return self._resolve_table_name_postgresql(name, conn)
-            # so far there are no special cases we've had to deal with
-            # for other dialects like postgresql partitioned tables
-            return name
+    def _resolve_table_name(self, name, conn):
+        if not conn.dialect.has_table(conn, name):
+            raise NoSuchTableError(name)
+        dialect = conn.dialect.name
+        if dialect == postgresql.dialect.name:
+            return self._resolve_table_name_postgresql(name, conn)
+        # so far there are no special cases we've had to deal with
+        # for other dialects like postgresql partitioned tables
+        return name
+
+    def _schema_fingerprint(self, conn):
+        queries = SCHEMA_FINGERPRINT_QUERIES.get(conn.dialect.name)
+        if not queries:
+            return None
+        digest = hashlib.sha1()
+        for query in queries:
+            for row in conn.execute(text(query)):
+                digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+
+    def _reflection_cache_path(self, fingerprint):
+        key = hashlib.sha1(f"{self.url}|{fingerprint}".encode()).hexdigest()
+        return os.path.join(self.reflection_cache_dir, f"{key}.pickle")
+
+    def _reflect_all(self, conn):
+        meta = MetaData()
+        meta.reflect(bind=conn)
+        insp = inspect(conn)
+        pk_constraints = insp.get_multi_pk_constraint()
+        unique_constraints = insp.get_multi_unique_constraints()
+
+        # (columns, name) of the primary key and unique constraints
+        constraints = {name: [] for name in meta.tables}
+        for (_, name), response in pk_constraints.items():
+            if name in constraints and response['constrained_columns']:
+                constraints[name].append((response['constrained_columns'],
+                                          response['name']))
+        for (_, name), responses in unique_constraints.items():
+            if name in constraints:
+                constraints[name].extend((constraint['column_names'],
+                                          constraint['name'])
+                                         for constraint in responses)
+        return {"tables": dict(meta.tables), "constraints": constraints}
+
+    def _autotune(self, name, df, kwargs):
+        """
+        Choose the insertion method for a table the first time
+        it's inserted into by probing each candidate with the
+        first rows of df. Returns the method and the rows of
+        df that are left to insert.
+
+        Other tables are probed concurrently and inserts into
+        a table that is being probed use the default method.
+        """
+        dialect_name = self.engine.dialect.name
+        default = resolve_insert_method(AUTO, dialect_name, self.local_infile)
+        # setdefault is atomic so every caller gets the same lock
+        lock = self._autotune_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name in self._autotuned:
+                return self._autotuned[name], df
+            if name in self._autotuning:
+                return default, df
+            self._autotuning.add(name)
+        method, rows_per_second, nrows = default, None, 0
+        try:
+            probe_kwargs = {key: value for key, value in kwargs.items()
+                            if key not in ('n_jobs', 'method', 'chunksize',
+                                           'writer_pool')}
+            method, rows_per_second, nrows = probe_insert_methods(
+                df, name, self.engine,
+                candidate_insert_methods(dialect_name, self.local_infile),
+                **probe_kwargs
+            )
+        finally:
+            with lock:
+                self._autotuning.discard(name)
+                if rows_per_second:
+                    self._autotuned[name] = method
+                    self.autotune_report[name] = {
+                        'method': method_name(method),
+                        'chunksize': kwargs.get('chunksize') or auto_chunksize(
+                            df.shape[1], dialect_name, method),
+                        'rows_per_second': rows_per_second,
+                    }
+        if not rows_per_second:
+            # too few rows to probe, try again on the next insert
+            return default, df
+        return method, df[nrows:]
+
+    @property
+    def reflection(self):
+        """
+        Bulk reflection of the current schema:
+        {"tables": {name: Table}, "constraints": {name: [(columns, constraint_name)]}}
+        """
+        if self._reflection is None:
+            with self.engine.connect() as conn:
+                path = None
+                if self.reflection_cache_dir:
+                    fingerprint = self._schema_fingerprint(conn)
+                    if fingerprint:
+                        path = self._reflection_cache_path(fingerprint)
+
+                if path and os.path.exists(path):
+                    logger.info(f"Loading cached reflection from {path}")
+                    with open(path, "rb") as f:
+                        self._reflection = pickle.load(f)
+                else:
+                    self._reflection = self._reflect_all(conn)
+                    if path:
+                        os.makedirs(self.reflection_cache_dir, exist_ok=True)
+                        with open(path, "wb") as f:
+                            pickle.dump(self._reflection, f)
+        return self._reflection
+
+    def clear_reflection_cache(self):
+        """forget the in memory bulk reflection (e.g. after DDL)"""
+        self._reflection = None
+        self._conflict_methods = {}
+        with self._writer_pool_lock:
+            if self._writer_pool is not None:
+                self._writer_pool.clear()
+
+    def _get_reflected(self, key, name):
+        if not self.bulk_reflect:
+            return None
+        return self.reflection[key].get(name)
 
     def reflect_table(self, name):
-        if not self.has_table(name):
-            raise NoSuchTableError(name)
+        table = self._get_reflected("tables", name)
+        if table is not None:
+            return table
         meta = MetaData()
-        engine = create_engine(self.url, future=True)
-        with engine.connect() as conn:
-            table = Table(self._resolve_table_name(name), meta, autoload_with=conn)
+        with self.engine.connect() as conn:
+            table = Table(self._resolve_table_name(name, conn), meta, autoload_with=conn)
             table.name = name  # we do this in case we needed to use the resolved child table of a partition
             return table
 
@@ -125,11 +487,13 @@ class DefaultDatabaseService(KnockoffDatabaseService):
         return self.Schema(columns=columns, dtype=dtype)
 
     def reflect_unique_constraints(self, name):
-        if not self.has_table(name):
-            raise NoSuchTableError(name)
-        name = self._resolve_table_name(name)
-        engine = create_engine(self.url, future=True)
-        with engine.connect() as conn:
+        constraints = self._get_reflected("constraints", name)
+        if constraints is not None:
+            # constraints are stateful so new ones are created every call
+            return [KnockoffUniqueConstraint(keys, name=constraint_name)
+                    for keys, constraint_name in constraints]
+        with self.engine.connect() as conn:
+            name = self._resolve_table_name(name, conn)
             insp = inspect(conn)
             response = insp.get_pk_constraint(name)
             constraints = [KnockoffUniqueConstraint(response['constrained_columns'],
@@ -142,20 +506,292 @@ class DefaultDatabaseService(KnockoffDatabaseService):
                                                             name=constraint['name']))
             return constraints
 
-    def insert(self, name, df, dtype=None, parallelize=True):
+    def max_value(self, name, column):
+        # the reflected table keeps its schema (and resolved name)
+        table = self.reflect_table(name)
+        query = select(func.max(table.c[column]))
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def read_sample(self, name, size):
+        query = select(self.reflect_table(name)).limit(size)
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(query, conn)
+
+    def read_table(self, name):
+        query = select(self.reflect_table(name))
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(query, conn)
+
+    def _conflict_method(self, on_conflict, conflict_columns=None):
+        key = (on_conflict, tuple(conflict_columns or ()))
+        if key not in self._conflict_methods:
+            self._conflict_methods[key] = ConflictInsert(on_conflict,
+                                                         conflict_columns)
+        return self._conflict_methods[key]
+
+    def insert(self, name, df, dtype=None, parallelize=True, n_jobs=None,
+               on_conflict=None, conflict_columns=None):
+        """
+        :param n_jobs: int, default None
+            Number of threads used to insert chunks of df when
+            parallelized. Defaults to the service's writer_pool.
+        :param on_conflict: str, default None
+            "ignore" to skip rows that conflict with existing rows (ON
+            CONFLICT DO NOTHING or INSERT IGNORE) or "update" to update
+            them (ON CONFLICT DO UPDATE or ON DUPLICATE KEY UPDATE)
+            instead of failing. Supported for postgresql, sqlite and
+            mysql. Rows are chunked like any other insert but aren't
+            inserted with the service's insertion method (e.g. COPY).
+            Defaults to the service's on_conflict.
+        :param conflict_columns: list[str], default None
+            Columns of the unique constraint that conflicts when
+            updating (see knockoff.utilities.insert_methods.conflict_statement).
+            Defaults to the primary key.
+        """
         kwargs = self.kwargs.copy()
+        on_conflict = on_conflict or self.on_conflict
+        if on_conflict:
+            kwargs['method'] = self._conflict_method(on_conflict,
+                                                     conflict_columns)
         # TODO: handle dtype[col] = JSON different?
         if dtype:
             kwargs['dtype'] = dtype
+        if n_jobs is not None:
+            kwargs['n_jobs'] = n_jobs
+        elif parallelize:
+            kwargs['writer_pool'] = self.writer_pool
+        if self._session_statements:
+            kwargs['session_statements'] = self._session_statements
+        if kwargs['method'] == AUTOTUNE:
+            kwargs['method'], df = self._autotune(name, df, kwargs)
 
         to_sql(
             df,
             name,
             self.url,
             parallelize=parallelize,
+            engine=self.engine,
+            single_transaction=self.single_transaction,
             **kwargs
         )
 
+    def _drop_indexes(self, tables):
+        """drop the non-unique indexes of tables and return them"""
+        dropped = []
+        for name in tables:
+            for index in list(self.reflect_table(name).indexes):
+                if index.unique:
+                    # these enforce constraints
+                    continue
+                try:
+                    with self.engine.begin() as conn:
+                        index.drop(conn)
+                    dropped.append(index)
+                except DBAPIError as e:
+                    # e.g. mysql indexes required by a foreign key
+                    logger.warning(f"Unable to drop index {index.name} "
+                                   f"on {name}. It will be kept: {e}")
+        return dropped
+
+    def _analyze(self, tables):
+        statement = ANALYZE_STATEMENTS.get(self.engine.dialect.name)
+        if statement is None:
+            return
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.begin() as conn:
+            for name in tables:
+                conn.exec_driver_sql(statement.format(preparer.quote(name)))
+
+    def truncate(self, tables, restart_identity=True):
+        """
+        Delete every row of tables in a single transaction.
+
+        On postgresql this is one TRUNCATE .. CASCADE of every table,
+        which also truncates any other table referencing them. Other
+        dialects delete the rows of each table in reverse order.
+
+        :param tables: list[str]
+            Tables in topological order (i.e. referenced tables
+            before the tables that reference them).
+        :param restart_identity: bool, default True
+            If True, identity/autoincrement columns start over
+            (RESTART IDENTITY on postgresql, AUTO_INCREMENT = 1 on
+            mysql and resetting sqlite_sequence on sqlite).
+        """
+        if not tables:
+            return
+        dialect_name = self.engine.dialect.name
+        preparer = self.engine.dialect.identifier_preparer
+        names = [preparer.quote(name) for name in tables]
+        with self.engine.begin() as conn:
+            if dialect_name == postgresql.dialect.name:
+                restart = "RESTART IDENTITY" if restart_identity else "CONTINUE IDENTITY"
+                conn.exec_driver_sql(f"TRUNCATE {', '.join(names)} {restart} CASCADE")
+                return
+            for name in reversed(names):
+                conn.exec_driver_sql(f"DELETE FROM {name}")
+            if restart_identity and dialect_name == sqlite.dialect.name:
+                # only exists if a table has an AUTOINCREMENT column
+                if conn.exec_driver_sql("SELECT 1 FROM sqlite_master "
+                                        "WHERE name = 'sqlite_sequence'").first():
+                    conn.execute(text("DELETE FROM sqlite_sequence "
+                                      "WHERE name IN :names")
+                                 .bindparams(bindparam("names", expanding=True)),
+                                 {"names": list(tables)})
+        if restart_identity and dialect_name == mysql.dialect.name:
+            # DDL, so outside of the transaction
+            with self.engine.begin() as conn:
+                for name in names:
+                    conn.exec_driver_sql(f"ALTER TABLE {name} AUTO_INCREMENT = 1")
+
+    @contextmanager
+    def load_mode(self, tables=None,
+                  disable_constraints=False,
+                  drop_indexes=True,
+                  analyze=True):
+        """
+        Context manager for bulk loading tables:
+
+            with database_service.load_mode(tables=["product"]):
+                database_service.insert("product", df)
+
+        :param tables: list[str], default None
+            Tables that will be loaded. Defaults to every table.
+        :param disable_constraints: bool, default False
+            If True, triggers and foreign key checks are disabled
+            while inserting (session_replication_role=replica on
+            postgresql, which requires a superuser, and
+            foreign_key_checks=0 on mysql). Loader friendly session
+            settings (e.g. synchronous_commit=off) are always used.
+        :param drop_indexes: bool, default True
+            If True, the non-unique indexes of tables are dropped
+            and recreated once loading is done.
+        :param analyze: bool, default True
+            If True, tables are analyzed once loading is done so
+            the planner statistics reflect the loaded data.
+        """
+        dialect = self.engine.dialect.name
+        if tables is None:
+            with self.engine.connect() as conn:
+                tables = inspect(conn).get_table_names()
+
+        statements = list(LOAD_MODE_SESSION_STATEMENTS.get(dialect, []))
+        if disable_constraints:
+            statements.extend(LOAD_MODE_DISABLE_CONSTRAINTS_STATEMENTS.get(dialect, []))
+
+        dropped = self._drop_indexes(tables) if drop_indexes else []
+        self._session_statements = statements
+        try:
+            yield self
+        finally:
+            self._session_statements = None
+            for index in dropped:
+                logger.info(f"Recreating index {index.name}")
+                with self.engine.begin() as conn:
+                    index.create(conn)
+            if analyze:
+                self._analyze(tables)
+
+
+class SqliteDatabaseService(DefaultDatabaseService):
+    """
+    KnockoffDatabaseService for sqlite databases, which makes it
+    possible to load blueprints without an external database
+    (see knockoff.tempdb.setup_teardown.sqlite_setup_teardown).
+
+    Each DataFrame is inserted in chunks with executemany, all in
+    a single transaction since sqlite only supports a single writer.
+    """
+    single_transaction = True
+    supports_concurrent_writes = False
+
+    def __init__(self, engine=None, url=None, ephemeral=False, **kwargs):
+        """
+        :param ephemeral: bool, default False
+            If True, journaling and syncing to disk are turned off
+            (PRAGMA journal_mode=OFF and synchronous=OFF) for faster
+            inserts. Only use this for throwaway databases since a
+            crash can corrupt the database.
+        :param kwargs:
+            Passed to DefaultDatabaseService.
+        """
+        self.ephemeral = ephemeral
+        super(SqliteDatabaseService, self).__init__(engine=engine,
+                                                    url=url,
+                                                    **kwargs)
+
+    def _create_engine(self, url):
+        url = make_url(url)
+        if url.database in (None, "", ":memory:"):
+            # a private in memory database only lives as long as
+            # its connection so every checkout shares the same one
+            engine = create_engine(url, future=True,
+                                   poolclass=StaticPool,
+                                   connect_args={"check_same_thread": False})
+        else:
+            # sqlalchemy picks the appropriate pool for sqlite
+            # so the pool settings don't apply
+            engine = create_engine(url, future=True)
+
+        if self.ephemeral:
+            @event.listens_for(engine, "connect")
+            def set_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=OFF")
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.close()
+        return engine
+
+    def insert(self, name, df, dtype=None, parallelize=False, n_jobs=None,
+               **kwargs):
+        # sqlite only allows one writer at a time
+        # so inserts are never parallelized
+        super(SqliteDatabaseService, self).insert(name, df,
+                                                  dtype=dtype,
+                                                  parallelize=False,
+                                                  **kwargs)
+
+
+# database services (or "package:name" of optional ones) by
+# sqlalchemy backend name. DefaultDatabaseService is used for
+# any other backend.
+DATABASE_SERVICES = {
+    sqlite.dialect.name: SqliteDatabaseService,
+    "duckdb": "knockoff.sdk.duckdb_service:DuckDBDatabaseService",
+}
+# database service for urls with an asyncio driver (e.g. postgresql+asyncpg)
+ASYNC_DATABASE_SERVICE = "knockoff.sdk.async_service:AsyncKnockoffDatabaseService"
+
+
+def create_database_service(url, ephemeral=False, **kwargs):
+    """
+    Create the KnockoffDatabaseService registered for the
+    backend of url (see DATABASE_SERVICES), or an
+    AsyncKnockoffDatabaseService if url's driver is async.
+
+    :param url: str
+    :param ephemeral: bool, default False
+        True if the database is a throwaway database (e.g. created
+        by knockoff run --ephemeral). Services may use this to trade
+        durability for speed.
+    :param kwargs:
+        Passed to the database service. Options that are None
+        (e.g. not configured) fall back to the service's defaults.
+    """
+    url_ = make_url(url)
+    backend = url_.get_backend_name()
+    if url_.drivername != backend and url_.get_dialect().is_async:
+        cls = ASYNC_DATABASE_SERVICE
+    else:
+        cls = DATABASE_SERVICES.get(backend, DefaultDatabaseService)
+    if isinstance(cls, str):
+        cls = resolve_package_name(cls)
+    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    if issubclass(cls, SqliteDatabaseService):
+        kwargs['ephemeral'] = bool(ephemeral)
+    return cls(url=url, **kwargs)
+
 
 class KnockoffDB(object):
     """
@@ -167,17 +803,48 @@ class KnockoffDB(object):
     """
     def __init__(self, database_service,
                  dag_service=None,
-                 seed=None):
+                 seed=None,
+                 max_workers=None,
+                 chunksize=None,
+                 max_queue_size=None):
+        """
+        :param database_service: KnockoffDatabaseService
+        :param dag_service: DagService, default None
+        :param seed: int, default None
+        :param max_workers: int, default 4
+            Maximum number of inserts that run concurrently. A table
+            is inserted as soon as all the tables it depends on have
+            been inserted. Use 1 to insert one table at a time (which
+            is always the case for database services that don't
+            support concurrent writes, e.g. SqliteDatabaseService).
+        :param chunksize: int, default None
+            If provided, tables that no other table depends on are
+            generated and inserted in chunks of this many rows, so
+            the next chunk is generated while the previous one is
+            written. Their data isn't kept (table.df isn't populated
+            by self.insert()). Otherwise each table is one chunk.
+        :param max_queue_size: int, default 2 * max_workers
+            Maximum number of generated chunks waiting to be (or
+            being) inserted. Generation blocks until a chunk has
+            been inserted, which caps memory.
+        """
         self.database_service = database_service
         self.dag_service = dag_service or DagService()
         self.seed = seed
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.chunksize = chunksize
+        self.max_queue_size = max_queue_size or 2 * self.max_workers
+        self.report = None
         self._tables = {}
+        # tables added with insert=False since other tables read from them
+        self._inferred = set()
 
     @property
     def tables(self):
         return self._tables
 
-    def add(self, table, insert=True, depends_on=None):
+    def add(self, table, insert=True, depends_on=None, n_jobs=None,
+            on_conflict=None, infer_dependencies=True):
         """
         :param table: KnockoffTable
         :param insert: boolean, default True
@@ -186,41 +853,480 @@ class KnockoffDB(object):
         :param depends_on: list[str], default None
             List of table names that are the table being added has a
             dependency on.
+        :param n_jobs: int, default None
+            Number of writer threads used to insert this table's chunks.
+            Defaults to the database service's default.
+        :param on_conflict: str, default None
+            "ignore" or "update" to skip or update rows that conflict
+            with existing rows (see DefaultDatabaseService.insert).
+            Defaults to the database service's default.
+        :param infer_dependencies: boolean, default True
+            If True, the tables the table's factories read from (e.g.
+            the table of a KnockoffTableFactory, see
+            KnockoffTable.dependencies) are added to depends_on. Those
+            that haven't been added are added with insert=False, unless
+            they're added later on.
         :return:
         """
-        # TODO: should we automatically check for KnockoffTableFactory
-        #       to add thoes as dependencies?
-        node = Node(table.name, table=table, insert=insert)
+        if table.name in self._inferred:
+            # added earlier since another table reads from it
+            self._inferred.remove(table.name)
+            if self.tables[table.name] is not table:
+                logger.warning(f"Table {table.name} was added as a dependency "
+                               f"of another table with a different KnockoffTable.")
+            node = self.dag_service.get_node(table.name)
+            node.table = table
+            node.insert = insert
+            node.n_jobs = n_jobs
+            node.on_conflict = on_conflict
+            self.dag_service.add_dependencies(table.name, depends_on)
+        else:
+            node = Node(table.name, table=table, insert=insert, n_jobs=n_jobs,
+                        on_conflict=on_conflict)
+            self.dag_service.add_node(node, depends_on=depends_on)
         self.tables[table.name] = table
-        self.dag_service.add_node(node, depends_on=depends_on)
+
+        if not infer_dependencies:
+            return
+        for dependency in table.dependencies():
+            if isinstance(dependency, str):
+                name = dependency
+            else:
+                name = dependency.name
+                if name not in self.tables:
+                    self.add(dependency, insert=False)
+                    self._inferred.add(name)
+            if name != table.name:
+                self.dag_service.add_dependencies(table.name, [name])
 
     def prepare(self):
         for node in self.dag_service.iter_topologically():
             node.table.prepare(database_service=self.database_service)
 
-    def build(self):
-        dfs = {}
-        # TODO: parallelize?
-        for node in self.dag_service.iter_topologically():
+    def _subgraph(self, only=None, load_ancestors=None, cache_dir=None):
+        """
+        Nodes in topological order and the ids of the ones to
+        generate and insert: every node if only is None, otherwise
+        the tables in only and the ancestors they need, which are
+        loaded (see load_ancestors) when possible.
+        """
+        nodes = list(self.dag_service.iter_topologically())
+        if only is None:
+            return nodes, {node.node_id for node in nodes}
+        if load_ancestors not in (None, DATABASE_ANCESTORS, CACHED_ANCESTORS):
+            raise ValueError(f"load_ancestors must be None, {DATABASE_ANCESTORS!r} "
+                             f"or {CACHED_ANCESTORS!r}. Received: {load_ancestors!r}.")
+        if load_ancestors == CACHED_ANCESTORS and cache_dir is None:
+            raise ValueError("cache_dir is required to load ancestors from the cache")
+        unknown = [name for name in only if name not in self.tables]
+        if unknown:
+            raise ValueError(f"Unknown tables: {unknown}")
+
+        targets = set(only)
+        ancestors = self.dag_service.ancestors(targets) - targets
+        for node_id in ancestors:
+            node = self.dag_service.get_node(node_id)
             table = node.table
-            table.prepare(database_service=self.database_service)
-            dfs[table.name] = table.df
+            if table._df is not None:
+                continue
+            if load_ancestors == DATABASE_ANCESTORS and node.insert:
+                logger.info(f"Reading table {table.name} from the database")
+                table.prepare(database_service=self.database_service)
+                table._df = self.database_service.read_table(table.name)
+            elif load_ancestors == CACHED_ANCESTORS:
+                path = self._cache_path(cache_dir, table.name)
+                if os.path.exists(path):
+                    logger.info(f"Reading table {table.name} from {path}")
+                    table._df = pd.read_pickle(path)
+        nodes = [node for node in nodes
+                 if node.node_id in targets or node.node_id in ancestors]
+        return nodes, targets
+
+    @staticmethod
+    def _cache_path(cache_dir, name):
+        return os.path.join(cache_dir, f"{name}.pkl")
+
+    def build(self, max_workers=None, prefer=None, only=None,
+              load_ancestors=None, cache_dir=None):
+        """
+        Generate every table, one at a time in topological order in
+        this process by default. With prefer="processes" or "threads",
+        each table is generated as soon as the tables it depends on
+        have been generated, with independent tables generated
+        concurrently.
+
+        With processes, each table is generated by a worker process
+        that receives the table and the DataFrames of the tables it
+        references (but not their factories). Tables that can't be
+        pickled (e.g. a factory holding a generator) are generated
+        in this process. Factories are copied to the workers, so
+        state shared between tables (e.g. a SequenceFactory used by
+        two tables) isn't shared anymore. If self.seed is set, every
+        table is seeded with a seed derived from it and the table's
+        name so the result doesn't depend on scheduling (but differs
+        from the sequential result).
+
+        :param max_workers: int, default None
+            Number of tables generated at the same time with prefer.
+            Defaults to self.max_workers. 1 generates them one at a
+            time, in topological order, in this process.
+        :param prefer: str, default None
+            None generates the tables sequentially. "processes" or
+            "threads" generate them concurrently. Threads share the
+            GIL but build the tables in place (so factories keep
+            their state).
+        :param only: list[str], default None
+            If provided, only these tables and the tables they
+            (transitively) depend on are generated.
+        :param load_ancestors: str, default None
+            With only, "database" reads the tables they depend on
+            that are inserted from the database and "cache" reads
+            them from cache_dir (when they've been cached) instead
+            of generating them.
+        :param cache_dir: str, default None
+            If provided, every table generated is saved to this
+            directory (as a pickled DataFrame per table), e.g. to
+            be used with load_ancestors="cache" later on.
+        :return: dict[str, pd.DataFrame]
+            DataFrames of the tables generated or loaded.
+        """
+        nodes, _ = self._subgraph(only, load_ancestors, cache_dir)
+        node_ids = {node.node_id for node in nodes}
+        # tables that were already generated (or loaded) aren't saved again
+        loaded = {node.node_id for node in nodes if node.table._df is not None}
+        dfs = build_tables(self, max_workers=max_workers, prefer=prefer,
+                           node_ids=node_ids)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            for node in nodes:
+                if node.node_id not in loaded:
+                    dfs[node.table.name].to_pickle(self._cache_path(cache_dir,
+                                                                    node.table.name))
         return dfs
 
-    def insert(self):
+    def truncate(self):
+        """
+        Delete every row of the tables that would be inserted (e.g. to
+        reset a database between tests before inserting again).
+
+        See the database service's truncate, e.g. on postgresql the
+        tables are truncated with a single TRUNCATE .. RESTART IDENTITY
+        CASCADE and other dialects delete them in reverse topological
+        order.
+        """
+        tables = [node.table.name
+                  for node in self.dag_service.iter_topologically()
+                  if node.insert]
+        self.database_service.truncate(tables)
+
+    def _insert_kwargs(self, node):
+        dtype = {}
+        for c, t in node.table.dtype.items():
+            if t == dict:
+                dtype[c] = JSON
+        kwargs = {'dtype': dtype}
+        if node.n_jobs is not None:
+            kwargs['n_jobs'] = node.n_jobs
+        if node.on_conflict is not None:
+            kwargs['on_conflict'] = node.on_conflict
+        return kwargs
+
+    def _insert_df(self, node, df):
+        self.database_service.insert(node.table.name, df,
+                                     **self._insert_kwargs(node))
+
+    async def _insert_df_async(self, node, df):
+        kwargs = self._insert_kwargs(node)
+        if hasattr(self.database_service, 'insert_async'):
+            await self.database_service.insert_async(node.table.name, df, **kwargs)
+        else:
+            await asyncio.to_thread(self.database_service.insert,
+                                    node.table.name, df, **kwargs)
+
+    def _iter_chunks(self, node):
+        table = node.table
+        if self.chunksize and not self.dag_service.children(node.node_id):
+            # nothing needs this table's data after it's inserted
+            yield from table.iter_build(self.chunksize)
+        elif self.chunksize:
+            df = table.df
+            for i in range(0, df.shape[0], self.chunksize):
+                yield df[i:i+self.chunksize]
+        else:
+            yield table.df
+
+    def dump(self, path, format="copy", dialect=None, max_workers=None):
+        """
+        Generate every table and dump the ones that would be inserted
+        to a bundle (one file per table and a manifest listing them in
+        topological order) instead of inserting them. The bundle can be
+        restored any number of times with knockoff.sdk.bundle.load_bundle.
+
+        :param path: str
+            Directory the bundle is written to.
+        :param format: str, default "copy"
+            "copy" (or "copy.gz") for files in postgres COPY's text
+            format, which mysql's LOAD DATA also reads, or "sql" for
+            multi-row INSERT statements.
+        :param dialect: str, default None
+            Dialect of the INSERT statements with format="sql".
+            Defaults to the database service's dialect.
+        :param max_workers: int, default None
+            Number of threads serializing tables. Defaults to max_workers.
+        :return: dict
+            The bundle's manifest.
+        """
+        return dump_bundle(self, path, format=format, dialect=dialect,
+                           max_workers=max_workers)
+
+    def _iter_timed_chunks(self, node):
+        """chunks of a table and the seconds spent generating each"""
+        chunks = self._iter_chunks(node)
+        while True:
+            start = time.perf_counter()
+            df = next(chunks, None)
+            if df is None:
+                return
+            yield df, time.perf_counter() - start
+
+    def insert(self, load_mode=False, only=None,
+               load_ancestors=DATABASE_ANCESTORS, cache_dir=None):
+        """
+        Generate and insert every table.
+
+        If load_mode is True (or a dict of its options, e.g.
+        {"disable_constraints": True}), the tables are loaded within
+        the database service's load_mode (e.g. indexes are dropped
+        and recreated afterwards).
+
+        Tables (or chunks of tables, see chunksize) are generated
+        one at a time in topological order on the calling thread,
+        so seeded runs stay reproducible, while the chunks that
+        have already been generated are inserted by a pool of
+        max_workers threads. A chunk is inserted once every table
+        its table depends on has been completely inserted.
+
+        only, load_ancestors and cache_dir are the same as for
+        build(): only the tables in only are inserted and the
+        tables they depend on are loaded but not inserted, since
+        they're expected to be in the database. They're read from
+        the database by default, so the inserted rows reference
+        existing rows. With load_ancestors=None they're generated
+        instead, which only works if the generated rows match the
+        ones in the database (e.g. seeded sequences).
+
+        :return: InsertReport
+            Rows, bytes and generation, serialization and database
+            time of every chunk inserted (also kept as self.report).
+        """
         # TODO: Should we use the dfs from self.build()?
-        # TODO: parallelize?
-        for node in self.dag_service.iter_topologically():
-            table = node.table
-            table.prepare(database_service=self.database_service)
-            if not node.insert:
-                _ = node.table.build()  # create table needed downstream
-                continue
-            dtype = {}
-            for c, t in table.dtype.items():
-                if t == dict:
-                    dtype[c] = JSON
-            self.database_service.insert(table.name, table.df, dtype=dtype)
+        self._check_load_ancestors(only, load_ancestors)
+        self.report = InsertReport()
+        start = time.perf_counter()
+        nodes, targets = self._subgraph(only, load_ancestors, cache_dir)
+        with self._load_mode(load_mode, nodes, targets):
+            self._insert(self.report, nodes, targets)
+        self.report.elapsed_seconds = time.perf_counter() - start
+        self.report.log()
+        return self.report
+
+    async def insert_async(self, load_mode=False, only=None,
+                           load_ancestors=DATABASE_ANCESTORS, cache_dir=None):
+        """
+        Generate and insert every table like insert(), on the running
+        event loop. Chunks are generated one at a time in topological
+        order in a worker thread while the chunks that have already
+        been generated are inserted concurrently (at most max_queue_size
+        of them), with the database service's insert_async if it has
+        one (see AsyncKnockoffDatabaseService) or its insert in a thread.
+        only, load_ancestors and cache_dir are the same as for insert().
+
+        :return: InsertReport
+        """
+        self._check_load_ancestors(only, load_ancestors)
+        self.report = InsertReport()
+        start = time.perf_counter()
+        nodes, targets = await asyncio.to_thread(self._subgraph, only,
+                                                 load_ancestors, cache_dir)
+        with self._load_mode(load_mode, nodes, targets):
+            await self._insert_async(self.report, nodes, targets)
+        self.report.elapsed_seconds = time.perf_counter() - start
+        self.report.log()
+        return self.report
+
+    @staticmethod
+    def _check_load_ancestors(only, load_ancestors):
+        if only is not None and load_ancestors is None:
+            logger.warning("Generating the tables that the tables in only "
+                           "depend on instead of reading them from the "
+                           "database. The inserted rows may reference rows "
+                           "that don't exist.")
+
+    def _load_mode(self, load_mode, nodes, targets):
+        """database service's load_mode for the inserted tables (if enabled)"""
+        if not load_mode:
+            return nullcontext()
+        options = load_mode if isinstance(load_mode, dict) else {}
+        tables = [node.node_id for node in nodes
+                  if node.insert and node.node_id in targets]
+        return self.database_service.load_mode(tables=tables, **options)
+
+    async def _insert_async(self, report, nodes, targets):
+        slots = asyncio.Semaphore(self.max_queue_size)
+        # chunks are inserted one at a time if the service can't
+        # write concurrently
+        writers = asyncio.Semaphore(self.max_queue_size
+                                    if self._concurrent_writes else 1)
+        # set once every chunk of a table has been inserted
+        inserted = {node.node_id: asyncio.Event() for node in nodes}
+        tasks = []
+
+        async def insert_chunk(node, df, generation_seconds):
+            try:
+                for parent_id in self.dag_service.parents(node.node_id):
+                    if parent_id in inserted:
+                        await inserted[parent_id].wait()
+                async with writers:
+                    await self._insert_chunk_async(node, df, generation_seconds, report)
+            finally:
+                slots.release()
+
+        async def finish(node_id, chunk_tasks):
+            await asyncio.gather(*chunk_tasks)
+            inserted[node_id].set()
+
+        def raise_failure():
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception():
+                    raise task.exception()
+
+        try:
+            for node in nodes:
+                await asyncio.to_thread(node.table.prepare,
+                                        database_service=self.database_service)
+                chunk_tasks = []
+                if not node.insert or node.node_id not in targets:
+                    # create table needed downstream
+                    await asyncio.to_thread(lambda: node.table.df)
+                else:
+                    chunks = self._iter_timed_chunks(node)
+                    while True:
+                        await slots.acquire()
+                        raise_failure()
+                        chunk = await asyncio.to_thread(next, chunks, None)
+                        if chunk is None:
+                            slots.release()
+                            break
+                        chunk_tasks.append(
+                            asyncio.ensure_future(insert_chunk(node, *chunk))
+                        )
+                    tasks.extend(chunk_tasks)
+                tasks.append(asyncio.ensure_future(finish(node.node_id, chunk_tasks)))
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def _chunk_metrics(self, df, generation_seconds, elapsed, timer):
+        serialization_seconds = timer.seconds[timing.SERIALIZATION]
+        return ChunkMetrics(
+            rows=df.shape[0],
+            bytes=int(df.memory_usage(index=False, deep=True).sum()),
+            generation_seconds=generation_seconds,
+            serialization_seconds=serialization_seconds,
+            # serialization on several writer threads can overlap
+            database_seconds=max(elapsed - serialization_seconds, 0.0),
+        )
+
+    async def _insert_chunk_async(self, node, df, generation_seconds, report):
+        with timing.collect() as timer:
+            start = time.perf_counter()
+            await self._insert_df_async(node, df)
+            elapsed = time.perf_counter() - start
+        report.add_chunk(node.node_id,
+                         self._chunk_metrics(df, generation_seconds, elapsed, timer))
+
+    def _insert_chunk(self, node, df, generation_seconds, report):
+        """insert a chunk and add its metrics to report"""
+        with timing.collect() as timer:
+            start = time.perf_counter()
+            self._insert_df(node, df)
+            elapsed = time.perf_counter() - start
+        report.add_chunk(node.node_id,
+                         self._chunk_metrics(df, generation_seconds, elapsed, timer))
+
+    @property
+    def _concurrent_writes(self):
+        return getattr(self.database_service, "supports_concurrent_writes", True)
+
+    def _insert(self, report, nodes, targets):
+
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_queue_size)
+        # set once every chunk of a table has been inserted
+        inserted = {node.node_id: threading.Event() for node in nodes}
+        outstanding = {node.node_id: 0 for node in nodes}
+        generated = set()
+        errors = []
+
+        def fail(e):
+            with lock:
+                errors.append(e)
+            # wake up everything waiting on a parent so it can bail out
+            for event in inserted.values():
+                event.set()
+
+        def finish(node_id):
+            with lock:
+                if node_id in generated and outstanding[node_id] == 0:
+                    inserted[node_id].set()
+
+        def insert_chunk(node, df, generation_seconds):
+            try:
+                # chunks are submitted in topological order to a FIFO
+                # queue, so the parents' chunks are already running
+                for parent_id in self.dag_service.parents(node.node_id):
+                    if parent_id in inserted:
+                        inserted[parent_id].wait()
+                if not errors:
+                    self._insert_chunk(node, df, generation_seconds, report)
+            except Exception as e:
+                fail(e)
+            finally:
+                slots.release()
+                with lock:
+                    outstanding[node.node_id] -= 1
+                finish(node.node_id)
+
+        max_workers = self.max_workers if self._concurrent_writes else 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                for node in nodes:
+                    node.table.prepare(database_service=self.database_service)
+                    if not node.insert or node.node_id not in targets:
+                        _ = node.table.df  # create table needed downstream
+                    else:
+                        for df, generation_seconds in self._iter_timed_chunks(node):
+                            slots.acquire()
+                            if errors:
+                                slots.release()
+                                break
+                            with lock:
+                                outstanding[node.node_id] += 1
+                            executor.submit(insert_chunk, node, df,
+                                            generation_seconds)
+                    if errors:
+                        break
+                    with lock:
+                        generated.add(node.node_id)
+                    finish(node.node_id)
+            except Exception as e:
+                fail(e)
+
+        if errors:
+            raise errors[0]
 
     @property
     def seed(self):
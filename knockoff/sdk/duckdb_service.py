@@ -0,0 +1,279 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import re
+import json
+import logging
+from uuid import uuid4
+
+import duckdb
+from sqlalchemy import MetaData, Table, Column
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy import types
+
+from knockoff.sdk.constraints import KnockoffUniqueConstraint
+from knockoff.sdk.db import KnockoffDatabaseService
+from knockoff.utilities.insert_methods import ON_CONFLICT, IGNORE
+
+logger = logging.getLogger(__name__)
+
+# options of the other database services (e.g. forwarded by
+# create_database_service) that don't apply to duckdb's
+# single connection
+IGNORED_OPTIONS = ("ephemeral", "pool_size", "max_overflow",
+                   "pool_pre_ping", "pool_recycle",
+                   "bulk_reflect", "reflection_cache_dir")
+
+# duckdb data types (without parameters, e.g. DECIMAL(18,3))
+# to sqlalchemy types
+DUCKDB_TYPES = {
+    "BOOLEAN": types.Boolean,
+    "TINYINT": types.SmallInteger,
+    "SMALLINT": types.SmallInteger,
+    "INTEGER": types.Integer,
+    "BIGINT": types.BigInteger,
+    "HUGEINT": types.BigInteger,
+    "UTINYINT": types.SmallInteger,
+    "USMALLINT": types.Integer,
+    "UINTEGER": types.BigInteger,
+    "UBIGINT": types.BigInteger,
+    "FLOAT": types.Float,
+    "DOUBLE": types.Float,
+    "DECIMAL": types.Numeric,
+    "VARCHAR": types.String,
+    "BLOB": types.LargeBinary,
+    "DATE": types.Date,
+    "TIME": types.Time,
+    "TIMESTAMP": types.DateTime,
+    "TIMESTAMP_NS": types.DateTime,
+    "TIMESTAMP_MS": types.DateTime,
+    "TIMESTAMP_S": types.DateTime,
+    "TIMESTAMP WITH TIME ZONE": lambda: types.DateTime(timezone=True),
+    "INTERVAL": types.Interval,
+    "UUID": types.Uuid,
+    "JSON": types.JSON,
+}
+
+
+def _to_json(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value != value:
+        # NaN
+        return None
+    return json.dumps(value)
+
+
+def to_sqlalchemy_type(data_type):
+    base = re.sub(r"\(.*\)$", "", data_type).strip()
+    type_ = DUCKDB_TYPES.get(base)
+    if type_ is None:
+        logger.warning(f"Unrecognized duckdb type {data_type}.")
+        return types.NullType()
+    return type_()
+
+
+class DuckDBDatabaseService(KnockoffDatabaseService):
+    """
+    KnockoffDatabaseService for duckdb databases.
+
+    Inserts register the DataFrame with duckdb and run
+    INSERT INTO .. SELECT so the frame is scanned directly
+    instead of binding parameters row by row. Tables are
+    reflected through duckdb's catalog (duckdb_columns()
+    and duckdb_constraints()).
+
+    Requires the duckdb extra (pip install knockoff[duckdb]).
+    """
+    # a single writer avoids transaction conflicts between
+    # the cursors of concurrent inserts
+    supports_concurrent_writes = False
+
+    def __init__(self, url=None, database=None, connection=None,
+                 read_only=False, config=None, on_conflict=None, **kwargs):
+        """
+        :param url: str, default None
+            e.g. duckdb:///path/to/file.duckdb or duckdb:///:memory:
+        :param database: str, default None
+            Path to the database file. Takes precedence over url.
+            Defaults to an in memory database.
+        :param connection: duckdb.DuckDBPyConnection, default None
+            If provided, this connection is used as is.
+        :param read_only: bool, default False
+        :param config: dict, default None
+            duckdb configuration options passed to duckdb.connect.
+        :param on_conflict: str, default None
+            Default on_conflict of insert (see insert).
+        :param kwargs:
+            Options of the other database services that don't apply
+            to duckdb (see IGNORED_OPTIONS, e.g. pool_size and
+            max_overflow, which create_database_service forwards).
+            They're ignored.
+        """
+        unsupported = sorted(set(kwargs) - set(IGNORED_OPTIONS))
+        if unsupported:
+            raise TypeError(f"Unsupported options for {type(self).__name__}: "
+                            f"{unsupported}")
+        if kwargs:
+            logger.debug(f"Ignoring options that don't apply "
+                         f"to duckdb: {sorted(kwargs)}")
+        if on_conflict is not None and on_conflict not in ON_CONFLICT:
+            raise ValueError(f"Unsupported on_conflict: {on_conflict}. "
+                             f"Expected one of {list(ON_CONFLICT)}.")
+        self.on_conflict = on_conflict
+        if connection is None:
+            if database is None and url is not None:
+                database = make_url(url).database
+            connection = duckdb.connect(database or ":memory:",
+                                        read_only=read_only,
+                                        config=config or {})
+        self.connection = connection
+
+    def dispose(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.dispose()
+
+    def _cursor(self):
+        # duckdb connections aren't thread safe, cursors
+        # are new connections to the same database
+        return self.connection.cursor()
+
+    def _quote(self, name):
+        return '"{}"'.format(name.replace('"', '""'))
+
+    def has_table(self, name):
+        with self._cursor() as cursor:
+            return cursor.execute(
+                "select count(*) from duckdb_tables() where table_name = ?",
+                [name]
+            ).fetchone()[0] > 0
+
+    def reflect_table(self, name):
+        with self._cursor() as cursor:
+            rows = cursor.execute(
+                "select column_name, data_type, is_nullable "
+                "from duckdb_columns() where table_name = ? "
+                "order by column_index",
+                [name]
+            ).fetchall()
+        if not rows:
+            raise NoSuchTableError(name)
+        return Table(name, MetaData(),
+                     *[Column(column_name,
+                              to_sqlalchemy_type(data_type),
+                              nullable=is_nullable)
+                       for column_name, data_type, is_nullable in rows])
+
+    def reflect_schema(self, name):
+        table = self.reflect_table(name)
+        columns = [col.name for col in table.c]
+        dtype = {col.name: col.type.python_type for col in table.c}
+        return self.Schema(columns=columns, dtype=dtype)
+
+    def reflect_unique_constraints(self, name):
+        with self._cursor() as cursor:
+            rows = cursor.execute(
+                "select constraint_type, constraint_name, constraint_column_names "
+                "from duckdb_constraints() where table_name = ? "
+                "and constraint_type in ('PRIMARY KEY', 'UNIQUE') "
+                # primary key first like DefaultDatabaseService
+                "order by constraint_type != 'PRIMARY KEY', constraint_index",
+                [name]
+            ).fetchall()
+        return [KnockoffUniqueConstraint(list(column_names), name=constraint_name)
+                for _, constraint_name, column_names in rows]
+
+    def _primary_key(self, name):
+        with self._cursor() as cursor:
+            row = cursor.execute(
+                "select constraint_column_names from duckdb_constraints() "
+                "where table_name = ? and constraint_type = 'PRIMARY KEY'",
+                [name]
+            ).fetchone()
+        return list(row[0]) if row else []
+
+    def max_value(self, name, column):
+        with self._cursor() as cursor:
+            return cursor.execute(
+                f"select max({self._quote(column)}) from {self._quote(name)}"
+            ).fetchone()[0]
+
+    def read_sample(self, name, size):
+        with self._cursor() as cursor:
+            return cursor.execute(
+                f"select * from {self._quote(name)} limit {int(size)}"
+            ).df()
+
+    def read_table(self, name):
+        with self._cursor() as cursor:
+            return cursor.execute(f"select * from {self._quote(name)}").df()
+
+    def truncate(self, tables):
+        # referencing tables are emptied first, each in its own
+        # transaction since duckdb checks foreign keys against
+        # the rows deleted earlier in the same transaction
+        with self._cursor() as cursor:
+            for name in reversed(tables):
+                cursor.execute(f"delete from {self._quote(name)}")
+
+    def _conflict_clause(self, name, keys, on_conflict, conflict_columns=None):
+        """ON CONFLICT clause like conflict_statement's for postgresql"""
+        if on_conflict not in ON_CONFLICT:
+            raise ValueError(f"Unsupported on_conflict: {on_conflict}. "
+                             f"Expected one of {list(ON_CONFLICT)}.")
+        conflict_columns = list(conflict_columns or self._primary_key(name))
+        update_columns = [key for key in keys if key not in conflict_columns]
+        if on_conflict == IGNORE or not update_columns:
+            return " on conflict do nothing"
+        if not conflict_columns:
+            raise ValueError(f"on_conflict=update needs conflict_columns "
+                             f"since {name} has no primary key.")
+        return (" on conflict ({}) do update set {}".format(
+            ", ".join(map(self._quote, conflict_columns)),
+            ", ".join(f"{self._quote(key)} = excluded.{self._quote(key)}"
+                      for key in update_columns)
+        ))
+
+    def insert(self, name, df, dtype=None, n_jobs=None,
+               on_conflict=None, conflict_columns=None):
+        """
+        :param n_jobs: int, default None
+            Ignored since duckdb parallelizes the scan itself.
+        :param on_conflict: str, default None
+            "ignore" to skip rows that conflict with existing rows
+            (ON CONFLICT DO NOTHING) or "update" to update them
+            (ON CONFLICT DO UPDATE) instead of failing. Defaults
+            to the service's on_conflict.
+        :param conflict_columns: list[str], default None
+            Columns of the unique constraint that conflicts when
+            updating. Defaults to the primary key.
+        """
+        on_conflict = on_conflict or self.on_conflict
+        conflict = ""
+        if on_conflict:
+            conflict = self._conflict_clause(name, list(df.columns),
+                                             on_conflict, conflict_columns)
+        df = df.copy(deep=False)
+        for col, type_ in (dtype or {}).items():
+            if (type_ is types.JSON or isinstance(type_, types.JSON)) and col in df:
+                # duckdb would otherwise infer a STRUCT from the dicts
+                df[col] = df[col].map(_to_json).astype(object)
+        view = f"knockoff_{uuid4().hex}"
+        columns = ", ".join(map(self._quote, df.columns))
+        with self._cursor() as cursor:
+            cursor.register(view, df)
+            try:
+                cursor.execute(f"insert into {self._quote(name)} ({columns}) "
+                               f"select {columns} from {view}{conflict}")
+            finally:
+                cursor.unregister(view)
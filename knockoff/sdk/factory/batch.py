@@ -0,0 +1,89 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+from abc import ABCMeta, abstractmethod
+
+import numpy as np
+
+
+DEFAULT_BUFFER_SIZE = 1024
+
+
+class BatchFactory(metaclass=ABCMeta):
+    """
+    BatchFactory is the base class for factories that can
+    generate values in bulk with numpy.
+
+    Calling an instance with size=n returns an array of n values.
+    Calling an instance without a size returns a single value that
+    is served from a buffer of pre-drawn values, so a BatchFactory
+    can be used anywhere a per-row factory is expected
+    (e.g. wrapped by a ColumnFactory or as a (column, factory)
+    tuple in a KnockoffTable).
+    """
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param buffer_size: int, default 1024
+            Number of values drawn at a time to serve
+            single value calls.
+        """
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._index = 0
+
+    @abstractmethod
+    def draw(self, size):
+        """return a numpy array of size values"""
+        return  # pragma: no cover
+
+    def box(self, values):
+        """convert an array returned by self.draw to a list of scalars"""
+        return values.tolist()
+
+    def __call__(self, size=None):
+        if size is not None:
+            return self.draw(size)
+        if self._index >= len(self._buffer):
+            self._buffer = self.box(self.draw(self.buffer_size))
+            self._index = 0
+        value = self._buffer[self._index]
+        self._index += 1
+        return value
+
+    def reset(self):
+        """discard any buffered values"""
+        self._buffer = []
+        self._index = 0
+
+
+class RandomBatchFactory(BatchFactory):
+    """
+    RandomBatchFactory is the base class for batch factories
+    that draw values from a numpy.random.Generator.
+    """
+    def __init__(self, seed=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param seed: int, default None
+            Seed for the numpy.random.Generator. If None, the seed is
+            drawn from numpy's global random state on the first draw so
+            that seeds set by KnockoffDB or `knockoff run --seed` still
+            make the generated values reproducible.
+        :param buffer_size: int, default 1024
+            Number of values drawn at a time to serve single value calls.
+        """
+        super(RandomBatchFactory, self).__init__(buffer_size=buffer_size)
+        self.seed = seed
+        self._rng = None
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            seed = self.seed
+            if seed is None:
+                seed = np.random.randint(0, 2**32 - 1)
+            self._rng = np.random.default_rng(seed)
+        return self._rng
@@ -5,12 +5,27 @@
 # the LICENSE file in the root directory of this source tree.
 
 
+import numpy as np
 import pandas as pd
 
 from knockoff.sdk.factory.next_strategy.df import sample_df
 from knockoff.sdk.factory.next_strategy.table import sample_table
 
 
+def factory_dependencies(factory):
+    """
+    Tables (KnockoffTable or table names) a factory reads from.
+
+    Factories opt in by implementing knockoff_dependencies(), which
+    returns them (e.g. KnockoffTableFactory returns its table). Other
+    callables have no dependencies.
+    """
+    knockoff_dependencies = getattr(factory, "knockoff_dependencies", None)
+    if knockoff_dependencies is None:
+        return []
+    return list(knockoff_dependencies())
+
+
 class CollectionsFactory(object):
     """
     CollectionsFactory is a callable that
@@ -61,6 +76,9 @@ class CollectionsFactory(object):
                                rename=self.rename,
                                drop=self.drop)
 
+    def knockoff_dependencies(self):
+        return factory_dependencies(self.callable)
+
 
 def resolve_columns(record,
                     columns=None,
@@ -134,6 +152,9 @@ class KnockoffTableFactory(KnockoffFactory):
         if self.columns is None:
             self.columns = self.columns or self.obj.columns
 
+    def knockoff_dependencies(self):
+        return [self.obj]
+
 
 class KnockoffDataFrameFactory(KnockoffFactory):
 
@@ -163,3 +184,123 @@ class KnockoffTransform(object):
 
     def __call__(self):
         return self.transform(self.factory())
+
+    def knockoff_dependencies(self):
+        return factory_dependencies(self.factory)
+
+
+class FanOutFactory(KnockoffTableFactory):
+    """
+    FanOutFactory generates child rows for each row of a parent
+    KnockoffTable (e.g. each order has 1-20 line items).
+
+    The number of children for every parent row is drawn at once
+    from counts and the child rows are built with a single np.repeat
+    over the parent rows. The rows are then served in order, one per
+    call, so a KnockoffTable using this factory has exactly one row
+    per generated child. If the KnockoffTable has no size, it is
+    derived from this factory (see self.size). When a row is rejected
+    by one of the KnockoffTable's constraints, its child row is served
+    again for the next attempt (see self.rollback()).
+    """
+    def __init__(self, table, counts, columns=None, rename=None, drop=None,
+                 ordinal=None, ordinal_start=0):
+        """
+        :param table: KnockoffTable
+            The parent table.
+        :param counts: int, callable or array-like
+            Number of children per parent row. This can be a fixed int,
+            a callable that accepts size (the number of parent rows) and
+            returns an array of counts (e.g. a BatchFactory such as
+            UniformFactory(1, 21, dtype=int)), or an array-like with a
+            count for each parent row.
+        :param columns: list[str], default None
+            Parent columns to include in each child row. Defaults to all
+            columns of the parent table.
+        :param rename: dict[str, str], default None
+        :param drop: list[str], default None
+        :param ordinal: str, default None
+            If provided, each child row will include the position of the
+            child within its parent under this key.
+        :param ordinal_start: int, default 0
+            The ordinal of the first child of each parent.
+        """
+        self.counts = counts
+        self.ordinal = ordinal
+        self.ordinal_start = ordinal_start
+        self._size = None
+        self._position = 0
+        super(FanOutFactory, self).__init__(table,
+                                            columns=columns,
+                                            rename=rename,
+                                            drop=drop,
+                                            next_strategy_factory=self._fan_out)
+
+    def _resolve_counts(self, size):
+        if isinstance(self.counts, (int, np.integer)):
+            counts = np.full(size, self.counts)
+        elif callable(self.counts):
+            counts = self.counts(size=size)
+        else:
+            counts = self.counts
+        counts = np.asarray(counts, dtype=np.int64)
+        if counts.shape != (size,):
+            raise ValueError(f"Expected {size} counts (one per parent row). "
+                             f"Received: {counts.shape}")
+        if (counts < 0).any():
+            raise ValueError("counts must be non-negative")
+        return counts
+
+    def _fan_out(self, table):
+        df = table.df
+        columns = [col for col in self.columns if col != self.ordinal]
+        counts = self._resolve_counts(len(df))
+        index = np.repeat(np.arange(len(df)), counts)
+        data = {col: df[col].to_numpy()[index] for col in columns}
+        if self.ordinal is not None:
+            # vectorized cumcount of each child within its parent
+            offsets = np.repeat(np.cumsum(counts) - counts, counts)
+            data[self.ordinal] = np.arange(len(index)) - offsets + self.ordinal_start
+        records = pd.DataFrame(data, columns=list(data)).to_dict('records')
+        self._size = len(records)
+        self._position = 0
+
+        def _call(*args, **kwargs):
+            if self._position >= self._size:
+                raise ValueError(f"FanOutFactory exhausted after generating "
+                                 f"{self._size} child rows. The size of the "
+                                 f"KnockoffTable should be derived from "
+                                 f"FanOutFactory.size")
+            self._position += 1
+            return records[self._position - 1]
+
+        return _call
+
+    def rollback(self):
+        """
+        Serve the last child row again, e.g. because the row it
+        was part of was rejected by a constraint (see KnockoffTable).
+        """
+        if self._position:
+            self._position -= 1
+
+    def initialize(self):
+        if self.columns is None:
+            self.columns = list(self.obj.columns)
+        super(FanOutFactory, self).initialize()
+        if self.ordinal is not None and self.ordinal not in self.columns:
+            self.columns = list(self.columns) + [self.ordinal]
+
+    @property
+    def size(self):
+        """number of child rows (the parent table is built if necessary)"""
+        if not self.initialized:
+            self.initialize()
+        return self._size
+
+    def reset(self):
+        """regenerate the child rows on the next call"""
+        self.initialized = False
+        self.next = None
+        self._size = None
+        self._position = 0
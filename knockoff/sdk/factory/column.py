@@ -8,6 +8,8 @@
 import numpy as np
 from faker import Faker
 
+from knockoff.sdk.factory.collections import factory_dependencies
+
 
 class ColumnFactory(object):
     """
@@ -35,6 +37,9 @@ class ColumnFactory(object):
     def __call__(self, *args, **kwargs):
         return {self.column: self.callable(*args,**kwargs)}
 
+    def knockoff_dependencies(self):
+        return factory_dependencies(self.callable)
+
 
 class ChoiceFactory(object):
     def __init__(self, choices, p=None, replace=True):
@@ -0,0 +1,182 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from knockoff.utilities.date.interval import Endpoint, now
+from knockoff.sdk.factory.batch import RandomBatchFactory, DEFAULT_BUFFER_SIZE
+
+
+# units of knockoff.utilities.date.interval (and sub-second
+# units) mapped to numpy datetime units
+UNIT = {
+    'y': 'Y',
+    'm': 'M',
+    'd': 'D',
+    'H': 'h',
+    'M': 'm',
+    's': 's',
+    'ms': 'ms',
+    'us': 'us',
+}
+
+
+def parse_endpoint(endpoint):
+    """
+    Parse an endpoint which can either be a date/datetime like
+    object or a string parsed by knockoff.utilities.date.interval.Endpoint
+    (e.g. "2020-01-01", "now", "today -1m", "-2y").
+
+    Relative strings like "-2y" are returned as a relativedelta.
+    """
+    if isinstance(endpoint, str):
+        return Endpoint.parse(endpoint)
+    if isinstance(endpoint, relativedelta):
+        return endpoint
+    return pd.Timestamp(endpoint)
+
+
+def resolve_range(start, end):
+    """
+    Resolve start and end endpoints to pd.Timestamp's. A relative
+    endpoint is applied to the other endpoint or to now if both
+    endpoints are relative.
+    """
+    start = parse_endpoint(start)
+    end = parse_endpoint(end)
+    is_start_rel = isinstance(start, relativedelta)
+    is_end_rel = isinstance(end, relativedelta)
+    if is_start_rel and is_end_rel:
+        reference = now()
+        start, end = reference + start, reference + end
+    elif is_start_rel:
+        start = end + start
+    elif is_end_rel:
+        end = start + end
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start > end:
+        raise ValueError(f"start ({start}) must not be after end ({end})")
+    return start, end
+
+
+class DatetimeRangeFactory(RandomBatchFactory):
+    """
+    DatetimeRangeFactory draws uniformly distributed datetimes
+    in [start, end) as int64 epoch offsets in bulk.
+
+    Batches are returned as datetime64[ns] arrays (or a tz-aware
+    pandas DatetimeArray if tz is provided) and single values are
+    served as datetime objects from a pre-drawn buffer.
+    """
+    def __init__(self, start="-30d", end="now",
+                 tz=None, unit=None, seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param start: str, date, datetime or relativedelta, default "-30d"
+            Strings are parsed with knockoff.utilities.date.interval.Endpoint.
+            Relative endpoints are resolved against the other endpoint.
+        :param end: str, date, datetime or relativedelta, default "now"
+        :param tz: str, default None
+            Timezone of the generated values. Naive endpoints are
+            interpreted as wall time in this timezone.
+        :param unit: str, default None
+            Truncate the generated values to this unit, using the
+            units of Interval strings ('y' years, 'm' months, 'd' days,
+            'H' hours, 'M' minutes, 's' seconds) or 'ms'/'us'.
+        :param seed: int, default None
+        :param buffer_size: int, default 1024
+        """
+        if unit is not None and unit not in UNIT:
+            raise ValueError(f"unit must be one of {sorted(UNIT)}. "
+                             f"Received: {unit}")
+        super(DatetimeRangeFactory, self).__init__(seed=seed,
+                                                   buffer_size=buffer_size)
+        self.start = start
+        self.end = end
+        self.tz = tz
+        self.unit = unit
+        self._bounds = None
+
+    @property
+    def bounds(self):
+        """[start, end) as nanoseconds since the epoch (resolved on first use)"""
+        if self._bounds is None:
+            start, end = resolve_range(self.start, self.end)
+            if self.tz is not None:
+                start, end = (ts.tz_localize(self.tz) if ts.tzinfo is None
+                              else ts for ts in (start, end))
+            self._bounds = (start.value, end.value)
+        return self._bounds
+
+    def draw(self, size):
+        low, high = self.bounds
+        values = self.rng.integers(low, max(high, low + 1), size=size, dtype=np.int64)
+        values = values.view('datetime64[ns]')
+        if self.tz is not None:
+            values = pd.DatetimeIndex(values, tz='UTC').tz_convert(self.tz)
+            if self.unit is not None:
+                # truncate the wall time
+                values = pd.DatetimeIndex(
+                    self._truncate(values.tz_localize(None).values)
+                ).tz_localize(self.tz, ambiguous=False, nonexistent='shift_backward')
+            return values.array
+        if self.unit is not None:
+            values = self._truncate(values)
+        return values
+
+    def _truncate(self, values):
+        return values.astype(f'datetime64[{UNIT[self.unit]}]').astype('datetime64[ns]')
+
+    def box(self, values):
+        if self.tz is not None:
+            return list(pd.DatetimeIndex(values).to_pydatetime())
+        return values.astype('datetime64[us]').tolist()
+
+
+class DateRangeFactory(RandomBatchFactory):
+    """
+    DateRangeFactory draws uniformly distributed dates in [start, end]
+    as int64 day offsets in bulk.
+
+    Batches are returned as datetime64[ns] arrays truncated to the
+    day and single values are served as date objects from a
+    pre-drawn buffer.
+    """
+    def __init__(self, start="-30d", end="today", seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param start: str, date, datetime or relativedelta, default "-30d"
+            Strings are parsed with knockoff.utilities.date.interval.Endpoint.
+            Relative endpoints are resolved against the other endpoint.
+        :param end: str, date, datetime or relativedelta, default "today"
+        :param seed: int, default None
+        :param buffer_size: int, default 1024
+        """
+        super(DateRangeFactory, self).__init__(seed=seed,
+                                               buffer_size=buffer_size)
+        self.start = start
+        self.end = end
+        self._bounds = None
+
+    @property
+    def bounds(self):
+        """[start, end] as days since the epoch (resolved on first use)"""
+        if self._bounds is None:
+            start, end = resolve_range(self.start, self.end)
+            self._bounds = tuple(np.datetime64(ts.date(), 'D').astype(np.int64)
+                                 for ts in (start, end))
+        return self._bounds
+
+    def draw(self, size):
+        low, high = self.bounds
+        days = self.rng.integers(low, high, size=size, dtype=np.int64, endpoint=True)
+        return days.view('datetime64[D]').astype('datetime64[ns]')
+
+    def box(self, values):
+        return values.astype('datetime64[D]').tolist()
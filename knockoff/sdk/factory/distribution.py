@@ -0,0 +1,159 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import numpy as np
+import pandas as pd
+
+from knockoff.sdk.factory.batch import RandomBatchFactory, DEFAULT_BUFFER_SIZE
+
+
+class DistributionFactory(RandomBatchFactory):
+    """
+    DistributionFactory draws values in bulk from a distribution
+    method of a seeded numpy.random.Generator.
+
+    e.g. DistributionFactory("poisson", lam=3)(size=10) is
+    equivalent to numpy.random.default_rng().poisson(lam=3, size=10)
+    """
+    def __init__(self, distribution, seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE, **kwargs):
+        """
+        :param distribution: str
+            Name of the numpy.random.Generator method to draw from.
+        :param seed: int, default None
+        :param buffer_size: int, default 1024
+        :param kwargs:
+            Parameters for the distribution.
+        """
+        super(DistributionFactory, self).__init__(seed=seed,
+                                                  buffer_size=buffer_size)
+        self.distribution = distribution
+        self.kwargs = kwargs
+
+    def draw(self, size):
+        return getattr(self.rng, self.distribution)(size=size, **self.kwargs)
+
+
+class NormalFactory(DistributionFactory):
+    def __init__(self, loc=0.0, scale=1.0, **kwargs):
+        super(NormalFactory, self).__init__("normal", loc=loc,
+                                            scale=scale, **kwargs)
+
+
+class LogNormalFactory(DistributionFactory):
+    def __init__(self, mean=0.0, sigma=1.0, **kwargs):
+        super(LogNormalFactory, self).__init__("lognormal", mean=mean,
+                                               sigma=sigma, **kwargs)
+
+
+class PoissonFactory(DistributionFactory):
+    def __init__(self, lam=1.0, **kwargs):
+        super(PoissonFactory, self).__init__("poisson", lam=lam, **kwargs)
+
+
+class ExponentialFactory(DistributionFactory):
+    def __init__(self, scale=1.0, **kwargs):
+        super(ExponentialFactory, self).__init__("exponential", scale=scale,
+                                                 **kwargs)
+
+
+class ZipfFactory(DistributionFactory):
+    def __init__(self, a, **kwargs):
+        super(ZipfFactory, self).__init__("zipf", a=a, **kwargs)
+
+
+class UniformFactory(DistributionFactory):
+    """
+    Draws floats in [low, high) or integers in [low, high)
+    if dtype is int.
+    """
+    def __init__(self, low=0.0, high=1.0, dtype=float, **kwargs):
+        if np.issubdtype(dtype, np.integer):
+            super(UniformFactory, self).__init__("integers", low=low,
+                                                 high=high, **kwargs)
+        else:
+            super(UniformFactory, self).__init__("uniform", low=low,
+                                                 high=high, **kwargs)
+
+
+class HistogramFactory(RandomBatchFactory):
+    """
+    HistogramFactory draws values from an empirical histogram. A
+    bin is drawn with probability proportional to its count and
+    the value is drawn uniformly within the bin.
+    """
+    def __init__(self, bin_edges, counts, seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param bin_edges: list[float]
+            Monotonically increasing bin edges of length len(counts) + 1
+            (e.g. as returned by numpy.histogram).
+        :param counts: list[float]
+            Count (or weight) of each bin.
+        :param seed: int, default None
+        :param buffer_size: int, default 1024
+        """
+        super(HistogramFactory, self).__init__(seed=seed,
+                                               buffer_size=buffer_size)
+        self.bin_edges = np.asarray(bin_edges, dtype=float)
+        self.counts = np.asarray(counts, dtype=float)
+        if len(self.bin_edges) != len(self.counts) + 1:
+            raise ValueError("bin_edges must have length len(counts) + 1")
+        if self.counts.sum() <= 0:
+            raise ValueError("counts must sum to a positive number")
+        self._cdf = np.cumsum(self.counts)/self.counts.sum()
+
+    @classmethod
+    def from_data(cls, data, bins=10, **kwargs):
+        """fit a HistogramFactory from observed values"""
+        counts, bin_edges = np.histogram(np.asarray(data, dtype=float), bins=bins)
+        return cls(bin_edges, counts, **kwargs)
+
+    def draw(self, size):
+        index = np.searchsorted(self._cdf, self.rng.random(size), side='right')
+        # guard against floating point error at the last edge of the cdf
+        index = np.minimum(index, len(self.counts) - 1)
+        low = self.bin_edges[index]
+        return low + self.rng.random(size)*(self.bin_edges[index + 1] - low)
+
+
+class CategoricalFactory(RandomBatchFactory):
+    """
+    CategoricalFactory draws values from a finite set of
+    values with the given weights (e.g. observed frequencies).
+    """
+    def __init__(self, values, weights=None, seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param values: list
+        :param weights: list[float], default None
+            Weight of each value. Values are drawn uniformly if None.
+        :param seed: int, default None
+        :param buffer_size: int, default 1024
+        """
+        super(CategoricalFactory, self).__init__(seed=seed,
+                                                 buffer_size=buffer_size)
+        # let pandas infer the dtype so mixed values stay objects
+        self.values = pd.Series(list(values), dtype=object if not len(values) else None).to_numpy()
+        if weights is None:
+            weights = np.ones(len(values))
+        weights = np.asarray(weights, dtype=float)
+        if len(weights) != len(values):
+            raise ValueError("weights must have the same length as values")
+        if weights.sum() <= 0:
+            raise ValueError("weights must sum to a positive number")
+        self.weights = weights
+        self._cdf = np.cumsum(weights)/weights.sum()
+
+    def draw(self, size):
+        index = np.searchsorted(self._cdf, self.rng.random(size), side='right')
+        return self.values[np.minimum(index, len(self.values) - 1)]
+
+    def box(self, values):
+        if values.dtype.kind == 'M':
+            return list(pd.DatetimeIndex(values).to_pydatetime())
+        return values.tolist()
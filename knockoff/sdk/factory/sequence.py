@@ -0,0 +1,133 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import threading
+
+import numpy as np
+
+from knockoff.sdk.factory.batch import BatchFactory, DEFAULT_BUFFER_SIZE
+
+
+class SequenceFactory(BatchFactory):
+    """
+    SequenceFactory generates an autoincrementing sequence of
+    integers in np.arange blocks.
+
+    The sequence can be split into disjoint shards with
+    self.shard(..) so parallel workers can generate values
+    without coordinating with each other. Shard i of n generates
+    start + (i + k*n)*step for k = 0, 1, 2, ... Once sharded, an
+    instance only hands out the values it had already buffered.
+
+    Draws are thread-safe, so a single instance can also be
+    shared by threads and every call is handed a disjoint range.
+    """
+    def __init__(self, start=0, step=1,
+                 shard=0, num_shards=1,
+                 buffer_size=DEFAULT_BUFFER_SIZE,
+                 start_from=None):
+        """
+        :param start: int, default 0
+            First value of the sequence. If start_from is provided,
+            this is only used when the database column is empty.
+        :param step: int, default 1
+        :param shard: int, default 0
+            Index of the shard of the sequence this instance generates.
+        :param num_shards: int, default 1
+            Number of disjoint shards the sequence is split into.
+        :param buffer_size: int, default 1024
+            Number of values reserved at a time to serve single value calls.
+        :param start_from: tuple(KnockoffDatabaseService, str, str), default None
+            (database_service, table name, column) used to lazily resolve the
+            start of the sequence from max(column) + step on the first draw.
+            See SequenceFactory.from_database.
+        """
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"shard must be in [0, {num_shards}). "
+                             f"Received: {shard}")
+        if step == 0:
+            raise ValueError("step must be non-zero")
+        super(SequenceFactory, self).__init__(buffer_size=buffer_size)
+        self._start = None if start_from else start
+        self.default_start = start
+        self.step = step
+        self.shard_index = shard
+        self.num_shards = num_shards
+        self.start_from = start_from
+        self._position = 0
+        self._sharded = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_database(cls, database_service, name, column, **kwargs):
+        """
+        Create a SequenceFactory that continues from the current
+        max(column) of a database table. The max is read through
+        the database service on the first draw.
+        """
+        return cls(start_from=(database_service, name, column), **kwargs)
+
+    @property
+    def start(self):
+        if self._start is None:
+            database_service, name, column = self.start_from
+            current = database_service.max_value(name, column)
+            self._start = (self.default_start if current is None
+                           else int(current) + self.step)
+        return self._start
+
+    def shard(self, index, count):
+        """
+        Return a SequenceFactory for shard index of count disjoint
+        shards of this sequence. Shards can be split further.
+
+        Shards start after the values this instance has already
+        drawn (including those buffered but not returned yet) and
+        the shards take over the rest of the sequence, so this
+        instance can't draw new values afterwards. Its buffered
+        values and the shards' values never overlap.
+        """
+        with self._lock:
+            self._sharded = True
+            stride = self.step*self.num_shards
+            start = self.start + self.shard_index*self.step + self._position*stride
+        return SequenceFactory(start=start,
+                               step=stride,
+                               shard=index,
+                               num_shards=count,
+                               buffer_size=self.buffer_size)
+
+    def shards(self, count):
+        return [self.shard(i, count) for i in range(count)]
+
+    def draw(self, size):
+        with self._lock:
+            if self._sharded:
+                raise RuntimeError("SequenceFactory has been sharded, "
+                                   "draw values from its shards instead")
+            stride = self.step*self.num_shards
+            first = self.start + self.shard_index*self.step
+            position = self._position
+            self._position += size
+        return first + np.arange(position, position + size, dtype=np.int64)*stride
+
+    def __call__(self, size=None):
+        # the lock is reentrant so that refilling the buffer
+        # through self.draw(..) stays atomic with the read
+        with self._lock:
+            return super(SequenceFactory, self).__call__(size=size)
+
+    def __getstate__(self):
+        # locks can't be pickled, which is required to
+        # send a shard to a worker process
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
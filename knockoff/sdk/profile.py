@@ -0,0 +1,273 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from knockoff.io import read_sql
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.factory.batch import RandomBatchFactory, DEFAULT_BUFFER_SIZE
+from knockoff.sdk.factory.distribution import CategoricalFactory, HistogramFactory
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL = "categorical"
+NUMERIC = "numeric"
+DATETIME = "datetime"
+STRING = "string"
+
+DEFAULT_MAX_CATEGORIES = 50
+DEFAULT_BINS = 50
+DEFAULT_SAMPLE_SIZE = 10000
+
+
+def _to_json_values(values):
+    """convert a pandas Series to a list of json serializable values"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [ts.isoformat() for ts in values]
+    return [value.item() if isinstance(value, np.generic) else value
+            for value in values]
+
+
+def profile_column(series, max_categories=DEFAULT_MAX_CATEGORIES, bins=DEFAULT_BINS):
+    """
+    Learn a json serializable profile of a column from observed values.
+
+    Columns with at most max_categories distinct values are profiled
+    by the frequency of each value. Otherwise, numeric and datetime
+    columns are profiled with a histogram and string columns with
+    the distribution of their lengths and characters.
+
+    Returns None if the column can't be profiled (e.g. json columns).
+    """
+    size = len(series)
+    values = series.dropna()
+    profile = {
+        "dtype": str(series.dtype),
+        "null_rate": (1 - len(values)/size) if size else 0.0,
+    }
+    if values.empty:
+        # nothing to learn from besides the column being null
+        profile.update(kind=CATEGORICAL, values=[None], weights=[1.0])
+        return profile
+
+    if (values.dtype == object and
+            not all(pd.api.types.is_hashable(value) for value in values)):
+        # unhashable values (e.g. dicts from json columns)
+        return None
+
+    frequencies = values.value_counts()
+
+    if len(frequencies) <= max_categories:
+        profile.update(kind=CATEGORICAL,
+                       values=_to_json_values(frequencies.index.to_series()),
+                       weights=frequencies.tolist())
+    elif pd.api.types.is_datetime64_any_dtype(values):
+        counts, bin_edges = np.histogram(values.astype('int64'), bins=bins)
+        profile.update(kind=DATETIME,
+                       bin_edges=bin_edges.tolist(),
+                       counts=counts.tolist())
+    elif pd.api.types.is_numeric_dtype(values):
+        counts, bin_edges = np.histogram(values.astype(float), bins=bins)
+        profile.update(kind=NUMERIC,
+                       integer=bool(pd.api.types.is_integer_dtype(values)),
+                       bin_edges=bin_edges.tolist(),
+                       counts=counts.tolist())
+    elif all(isinstance(value, str) for value in values):
+        lengths = values.str.len().value_counts()
+        characters = pd.Series(list("".join(values))).value_counts()
+        profile.update(kind=STRING,
+                       lengths=lengths.index.tolist(),
+                       length_weights=lengths.tolist(),
+                       characters="".join(characters.index),
+                       character_weights=characters.tolist())
+    else:
+        return None
+    return profile
+
+
+class StringFactory(RandomBatchFactory):
+    """
+    StringFactory draws random strings with the given distributions
+    of lengths and characters. All the characters for a batch are
+    drawn at once and then split into strings.
+    """
+    def __init__(self, lengths, length_weights, characters, character_weights,
+                 seed=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        super(StringFactory, self).__init__(seed=seed,
+                                            buffer_size=buffer_size)
+        self.lengths = CategoricalFactory(lengths, length_weights, seed=self._spawn())
+        self.characters = CategoricalFactory(list(characters), character_weights,
+                                             seed=self._spawn())
+
+    def _spawn(self):
+        return int(self.rng.integers(0, 2**32 - 1))
+
+    def draw(self, size):
+        lengths = self.lengths(size=size).astype(np.int64)
+        text = "".join(self.characters(size=int(lengths.sum())).tolist())
+        ends = np.cumsum(lengths).tolist()
+        starts = [0] + ends[:-1]
+        return np.array([text[i:j] for i, j in zip(starts, ends)], dtype=object)
+
+
+class ProfileFactory(RandomBatchFactory):
+    """
+    ProfileFactory generates rows from a TableProfile.
+
+    Calling an instance with size=n returns a DataFrame of n rows
+    where every column is drawn in bulk. Calling it without a size
+    returns a single record (dict) from a pre-drawn buffer, so it can
+    be provided as a factory to a KnockoffTable.
+    """
+    def __init__(self, profile, columns=None, seed=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        super(ProfileFactory, self).__init__(seed=seed,
+                                             buffer_size=buffer_size)
+        self.profile = profile
+        self.columns = columns or list(profile.columns)
+        self._factories = None
+
+    def _make_factory(self, column_profile):
+        seed = int(self.rng.integers(0, 2**32 - 1))
+        kind = column_profile["kind"]
+        if kind == CATEGORICAL:
+            values = column_profile["values"]
+            if column_profile["dtype"].startswith("datetime64"):
+                values = pd.to_datetime(values).to_numpy()
+            return CategoricalFactory(values, column_profile["weights"], seed=seed)
+        if kind in (NUMERIC, DATETIME):
+            return HistogramFactory(column_profile["bin_edges"],
+                                    column_profile["counts"],
+                                    seed=seed)
+        if kind == STRING:
+            return StringFactory(column_profile["lengths"],
+                                 column_profile["length_weights"],
+                                 column_profile["characters"],
+                                 column_profile["character_weights"],
+                                 seed=seed)
+        raise ValueError(f"Unrecognized column profile kind: {kind}")
+
+    @property
+    def factories(self):
+        if self._factories is None:
+            self._factories = {col: self._make_factory(self.profile.columns[col])
+                               for col in self.columns}
+        return self._factories
+
+    def _draw_column(self, col, size):
+        column_profile = self.profile.columns[col]
+        values = self.factories[col](size=size)
+        kind = column_profile["kind"]
+        if kind == DATETIME:
+            values = values.astype(np.int64).view('datetime64[ns]')
+        elif kind == NUMERIC and column_profile["integer"]:
+            values = np.floor(values).astype(np.int64)
+
+        null_rate = column_profile["null_rate"]
+        if null_rate > 0:
+            nulls = self.rng.random(size) < null_rate
+            if nulls.any():
+                values = pd.Series(values)
+                if kind == NUMERIC and column_profile["integer"]:
+                    values = values.astype("Int64")
+                values = values.where(~nulls, None)
+        return values
+
+    def draw(self, size):
+        return pd.DataFrame({col: self._draw_column(col, size)
+                             for col in self.columns},
+                            columns=self.columns)
+
+    def box(self, values):
+        return values.to_dict('records')
+
+
+class TableProfile(object):
+    """
+    TableProfile learns per column distributions (categorical
+    frequencies, numeric histograms, null rates and string lengths)
+    from a sample of an existing table so that similar data can be
+    generated without copying any rows.
+
+    A profile can be persisted with self.save(..) and loaded with
+    TableProfile.load(..).
+    """
+    def __init__(self, name, columns, size=None):
+        """
+        :param name: str
+            Name of the profiled table.
+        :param columns: dict[str, dict]
+            Column name to column profile (see profile_column).
+        :param size: int, default None
+            Number of rows in the profiled sample.
+        """
+        self.name = name
+        self.columns = columns
+        self.size = size
+
+    @classmethod
+    def fit(cls, df, name=None,
+            max_categories=DEFAULT_MAX_CATEGORIES,
+            bins=DEFAULT_BINS):
+        columns = {}
+        for col in df.columns:
+            column_profile = profile_column(df[col],
+                                            max_categories=max_categories,
+                                            bins=bins)
+            if column_profile is None:
+                logger.warning(f"Unable to profile column {col} of "
+                               f"{name}. It will be excluded.")
+                continue
+            columns[col] = column_profile
+        return cls(name, columns, size=len(df))
+
+    @classmethod
+    def from_database(cls, database_service, name,
+                      sample_size=DEFAULT_SAMPLE_SIZE, **kwargs):
+        """fit a profile from a sample read through a database service"""
+        df = database_service.read_sample(name, sample_size)
+        return cls.fit(df, name=name, **kwargs)
+
+    @classmethod
+    def from_sql(cls, sql, database=None, name=None, **kwargs):
+        """fit a profile from a query read with knockoff.io.read_sql"""
+        return cls.fit(read_sql(sql, database), name=name, **kwargs)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "size": self.size,
+            "columns": self.columns,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["columns"], size=data.get("size"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def factory(self, columns=None, seed=None):
+        return ProfileFactory(self, columns=columns, seed=seed)
+
+    def knockoff_table(self, name=None, size=None, seed=None, **kwargs):
+        """create a KnockoffTable that generates rows from this profile"""
+        return KnockoffTable(name or self.name,
+                             columns=list(self.columns),
+                             factories=[self.factory(seed=seed)],
+                             size=size,
+                             **kwargs)
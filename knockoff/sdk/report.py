@@ -0,0 +1,109 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import json
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+ChunkMetrics = namedtuple("ChunkMetrics", [
+    "rows",
+    "bytes",  # approximate, see DataFrame.memory_usage
+    "generation_seconds",
+    "serialization_seconds",
+    "database_seconds",
+])
+
+
+def _latency_percentiles(latencies):
+    if not latencies:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": float(value)
+            for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))}
+
+
+def _summarize(chunks):
+    latencies = [chunk.serialization_seconds + chunk.database_seconds
+                 for chunk in chunks]
+    rows = sum(chunk.rows for chunk in chunks)
+    insert_seconds = sum(latencies)
+    return {
+        "rows": rows,
+        "bytes": sum(chunk.bytes for chunk in chunks),
+        "chunks": len(chunks),
+        "generation_seconds": sum(chunk.generation_seconds for chunk in chunks),
+        "serialization_seconds": sum(chunk.serialization_seconds for chunk in chunks),
+        "database_seconds": sum(chunk.database_seconds for chunk in chunks),
+        "rows_per_second": rows / insert_seconds if insert_seconds else None,
+        "latency_seconds": _latency_percentiles(latencies),
+    }
+
+
+class InsertReport(object):
+    """
+    Metrics of a KnockoffDB.insert, per table and per chunk.
+
+    A chunk's generation time is spent building its DataFrame,
+    its serialization time converting rows for the driver (e.g. to
+    the COPY format) and its database time is the rest of the time
+    spent inserting it (i.e. round trips to the database). Its
+    latency is serialization plus database time.
+    """
+    def __init__(self):
+        self.tables = {}
+        self.elapsed_seconds = None
+        self._lock = threading.Lock()
+
+    def add_chunk(self, table, chunk):
+        """
+        :param table: str
+        :param chunk: ChunkMetrics
+        """
+        with self._lock:
+            self.tables.setdefault(table, []).append(chunk)
+
+    def summary(self, table=None):
+        """totals and chunk latency percentiles of a table (or of every table)"""
+        with self._lock:
+            if table is not None:
+                chunks = list(self.tables.get(table, []))
+            else:
+                chunks = [chunk for chunks in self.tables.values() for chunk in chunks]
+        return _summarize(chunks)
+
+    def to_dict(self):
+        with self._lock:
+            tables = list(self.tables)
+        report = self.summary()
+        report["elapsed_seconds"] = self.elapsed_seconds
+        report["tables"] = {}
+        for table in tables:
+            report["tables"][table] = self.summary(table)
+            with self._lock:
+                report["tables"][table]["chunk_metrics"] = [
+                    chunk._asdict() for chunk in self.tables[table]
+                ]
+        return report
+
+    def save(self, path):
+        """write the report as json"""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def log(self):
+        for table in list(self.tables):
+            summary = self.summary(table)
+            logger.info(f"{table}: {summary['rows']} rows in {summary['chunks']} "
+                        f"chunks, generation {summary['generation_seconds']:.3f}s, "
+                        f"serialization {summary['serialization_seconds']:.3f}s, "
+                        f"database {summary['database_seconds']:.3f}s")
@@ -17,7 +17,8 @@ from faker import Faker
 from knockoff.exceptions import FactoryNotFound, AttemptLimitReached
 
 from knockoff.sdk.factory.column import ColumnFactory
-from knockoff.sdk.factory.collections import CollectionsFactory
+from knockoff.sdk.factory.collections import (CollectionsFactory, FanOutFactory,
+                                              factory_dependencies)
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +68,10 @@ class KnockoffTable(object):
             If no factories are provided, a default factory will be used based on
             the configured self.default_type_factory property.
 
+            Factories that read from other tables (e.g. KnockoffTableFactory) declare
+            them with a knockoff_dependencies() method returning the KnockoffTables (or
+            table names) they read, which the KnockoffDB adds as dependencies.
+
         :param columns: list, default None
             This is a list of column names for the table. The order of precedence in
             which the columns are set is as follows:
@@ -112,7 +117,8 @@ class KnockoffTable(object):
         :param size: int, default None
             This is the number of rows to generate for the table. This is expected to be
             provided as a parameter in the __init__ or during the build. The knockoffDB will
-            not provide a size to the table.
+            not provide a size to the table. If no size is provided and one of the factories
+            is a FanOutFactory, the size is derived from the number of child rows it generates.
 
         :param database_service: KnockoffDatabaseService instance, default None
             The database service is only required if autoload==True. The database service
@@ -323,28 +329,78 @@ class KnockoffTable(object):
                 self._add_record(record)
                 return record
 
+            for factory in self.factories:
+                if isinstance(factory, FanOutFactory):
+                    # the child row wasn't used, retry with it
+                    factory.rollback()
+
         if attempt >= self.attempt_limit:
             raise AttemptLimitReached("Attempts to create df with unique "
                                       "constraint reached limit={} for table={}"
                                       .format(self.attempt_limit, self.name))
 
-    def build(self, size=None):
-        size = size or self.size
+    def dependencies(self):
+        """
+        Tables (KnockoffTable or table names) this table's
+        factories read from (see factory_dependencies).
+        """
+        dependencies = []
+        for factory in self.factories:
+            if isinstance(factory, (tuple, list)):
+                _, factory = factory
+            for dependency in factory_dependencies(factory):
+                if (dependency is not self and
+                        not any(dependency is other for other in dependencies)):
+                    dependencies.append(dependency)
+        return dependencies
+
+    def _derive_size(self):
+        """derive size from factories that determine the number of rows"""
+        for factory in self.factories:
+            if isinstance(factory, FanOutFactory):
+                return factory.size
+        return None
+
+    def _resolve_size(self, size=None):
+        size = size or self.size or self._derive_size()
         if size is None:
             raise ValueError("size must be provided on __init__"
                              " or during self.build(..)")
-        # TODO: do this more memory efficiently?
-        self._df = pd.DataFrame([self._next() for _ in range(size)])
+        return size
 
+    def _finalize(self, df):
         if self.drop:
-            self._df = self._df.drop(columns=self.drop)
+            df = df.drop(columns=self.drop)
 
         if self.rename:
-            self._df = self._df.rename(columns=self.rename)
+            df = df.rename(columns=self.rename)
+
+        return df
 
+    def build(self, size=None):
+        size = self._resolve_size(size)
+        # TODO: do this more memory efficiently?
+        self._df = self._finalize(pd.DataFrame([self._next() for _ in range(size)]))
         return self.df
 
+    def iter_build(self, chunksize, size=None):
+        """
+        Generate the table in DataFrames of up to chunksize rows
+        so that only one chunk needs to be held in memory. Unique
+        constraints are still enforced across chunks.
+
+        Unlike self.build(..), the chunks are not stored so
+        self.df is not populated.
+        """
+        size = self._resolve_size(size)
+        for start in range(0, size, chunksize):
+            nrows = min(chunksize, size - start)
+            yield self._finalize(pd.DataFrame([self._next() for _ in range(nrows)]))
+
     def reset(self):
         self._df = None
         for constraint in self.constraints:
             constraint.reset()
+        for factory in self.factories:
+            if isinstance(factory, FanOutFactory):
+                factory.reset()
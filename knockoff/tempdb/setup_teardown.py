@@ -4,6 +4,13 @@
 # This source code is licensed under the Apache-2.0 license found in
 # the LICENSE file in the root directory of this source tree.
 
+import os
+import shutil
+import sqlite3
+import tempfile
+from uuid import uuid4
+
+from sqlalchemy.engine import make_url
 
 from knockoff.utilities.testing.postgresql import get_postgresql
 from knockoff.utilities.testing.mysql import ExternalMySql
@@ -31,3 +38,38 @@ def mysql_setup_teardown(url):
 
     # teardown
     mysql.stop()
+
+
+def sqlite_setup_teardown(url=None):
+    """
+    Create a temporary sqlite database so blueprints can be
+    loaded without an external database.
+
+    If url is an in memory sqlite url (e.g. "sqlite://" or
+    "sqlite:///:memory:"), a named in memory database is used
+    and a connection is kept open until teardown so that it
+    outlives the connections of the engines that use it.
+    Otherwise (including non-sqlite urls) the database is a
+    file in a temporary directory.
+    """
+    parsed = make_url(url) if url else None
+    if (parsed is not None and
+            parsed.get_backend_name() == "sqlite" and
+            parsed.database in (None, "", ":memory:")):
+        name = f"file:knockoff_{uuid4().hex}?mode=memory&cache=shared"
+        # setup
+        keeper = sqlite3.connect(name, uri=True)
+
+        yield f"sqlite:///{name}&uri=true"
+
+        # teardown
+        keeper.close()
+        return
+
+    # setup
+    tmpdir = tempfile.mkdtemp(prefix="knockoff_")
+
+    yield f"sqlite:///{os.path.join(tmpdir, 'knockoff.db')}"
+
+    # teardown
+    shutil.rmtree(tmpdir, ignore_errors=True)
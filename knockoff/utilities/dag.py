@@ -0,0 +1,137 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+"""
+A small directed acyclic graph (adjacency lists) used to order
+the nodes of a KnockoffDB and of a blueprint.
+"""
+
+from knockoff.exceptions import CyclicDependencyError
+
+
+class Dag(object):
+    """
+    Directed graph of hashable node ids where an edge (u, v)
+    means v depends on u.
+
+    Nodes (and edges) keep the order they were added in. The
+    topological order and levels are computed once (with Kahn's
+    algorithm) and cached until the graph is modified.
+    """
+    def __init__(self):
+        # node id -> dict of successor/predecessor ids (ordered sets)
+        self._successors = {}
+        self._predecessors = {}
+        self._levels = None
+        self._order = None
+
+    def __len__(self):
+        return len(self._successors)
+
+    def __contains__(self, node_id):
+        return node_id in self._successors
+
+    @property
+    def nodes(self):
+        return list(self._successors)
+
+    @property
+    def edges(self):
+        return [(u, v) for u, successors in self._successors.items()
+                for v in successors]
+
+    def _invalidate(self):
+        self._levels = None
+        self._order = None
+
+    def add_node(self, node_id):
+        if node_id not in self._successors:
+            self._successors[node_id] = {}
+            self._predecessors[node_id] = {}
+            self._invalidate()
+
+    def add_edge(self, u, v):
+        """add an edge from u to v, adding either node if needed"""
+        self.add_node(u)
+        self.add_node(v)
+        if v not in self._successors[u]:
+            self._successors[u][v] = None
+            self._predecessors[v][u] = None
+            self._invalidate()
+
+    def add_edges_from(self, edges):
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def predecessors(self, node_id):
+        """ids of the nodes node_id depends on"""
+        return list(self._predecessors[node_id])
+
+    def successors(self, node_id):
+        """ids of the nodes that depend on node_id"""
+        return list(self._successors[node_id])
+
+    def ancestors(self, node_ids):
+        """ids of every node the nodes in node_ids (transitively) depend on"""
+        ancestors = set()
+        stack = list(node_ids)
+        while stack:
+            for u in self._predecessors[stack.pop()]:
+                if u not in ancestors:
+                    ancestors.add(u)
+                    stack.append(u)
+        return ancestors
+
+    def levels(self):
+        """
+        Nodes grouped by depth: the first level is every node
+        without predecessors and each following level is every
+        node whose predecessors are all in earlier levels.
+
+        :raises CyclicDependencyError: if the graph has a cycle
+        """
+        if self._levels is None:
+            in_degree = {node_id: len(predecessors)
+                         for node_id, predecessors in self._predecessors.items()}
+            level = [node_id for node_id, degree in in_degree.items() if degree == 0]
+            levels = []
+            while level:
+                levels.append(tuple(level))
+                next_level = []
+                for node_id in level:
+                    for successor in self._successors[node_id]:
+                        in_degree[successor] -= 1
+                        if in_degree[successor] == 0:
+                            next_level.append(successor)
+                level = next_level
+            if sum(map(len, levels)) != len(self):
+                cycle = [node_id for node_id, degree in in_degree.items() if degree > 0]
+                raise CyclicDependencyError(f"Dependency cycle between: {cycle}")
+            self._levels = tuple(levels)
+        return list(self._levels)
+
+    def topological_sort(self):
+        """
+        Every node, each after the nodes it depends on.
+
+        :raises CyclicDependencyError: if the graph has a cycle
+        """
+        if self._order is None:
+            self._order = tuple(node_id for level in self.levels()
+                                for node_id in level)
+        return list(self._order)
+
+    def ready(self, done):
+        """
+        Ids of the nodes that aren't done and only depend on
+        nodes that are, in topological order.
+
+        :param done: set
+            Ids of the nodes that are done.
+        """
+        return [node_id for node_id in self.topological_sort()
+                if node_id not in done and
+                all(u in done for u in self._predecessors[node_id])]
@@ -0,0 +1,495 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+"""
+Insertion methods that can be passed as the method argument
+of pandas.DataFrame.to_sql, i.e. callables with the signature
+(pd_table, conn, keys, data_iter).
+"""
+
+import io
+import os
+import json
+import logging
+import datetime
+import weakref
+import tempfile
+import threading
+
+from sqlalchemy import MetaData, Table, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import postgresql, mysql, sqlite
+from sqlalchemy.types import JSON, ARRAY
+
+from knockoff.utilities.timing import timed, SERIALIZATION
+
+logger = logging.getLogger(__name__)
+
+MULTI = "multi"
+COPY = "copy"
+LOAD_DATA = "load_data"
+EXECUTEMANY = "executemany"
+AUTO = "auto"
+AUTOTUNE = "autotune"
+
+# on_conflict modes
+IGNORE = "ignore"
+UPDATE = "update"
+ON_CONFLICT = (IGNORE, UPDATE)
+
+# room left in max_allowed_packet for the packet header
+# and the INSERT ... VALUES prefix of batched executemany
+_PACKET_MARGIN = 16 * 1024
+
+# client argument enabling LOAD DATA LOCAL INFILE for each mysql driver
+_LOCAL_INFILE_ARGS = {
+    "pymysql": "local_infile",
+    "mysqldb": "local_infile",
+    "mysqlconnector": "allow_local_infile",
+}
+
+# postgres COPY text format escapes
+_COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+_COPY_NULL = "\\N"
+
+
+def format_copy_value(value):
+    """format a value as a field of the postgres COPY text format"""
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex format with its backslash escaped
+        return "\\\\x" + bytes(value).hex()
+    elif not isinstance(value, str):
+        return str(value)
+    return value.translate(_COPY_ESCAPES)
+
+
+def _array_element(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (list, tuple)):
+        return format_array_value(value)
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        value = value.isoformat()
+    elif not isinstance(value, str):
+        value = str(value)
+    # quoted elements are parsed with the element type's input function
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def format_array_value(value):
+    """format a list as a postgres array literal, e.g. {"a","b"}"""
+    return "{" + ",".join(map(_array_element, value)) + "}"
+
+
+def _array_columns(pd_table, conn, keys):
+    """
+    indexes of the keys that are ARRAY columns of the table, read
+    from the table already reflected by the WriterPool if there is
+    one (pandas' SQLTable has types inferred from the DataFrame)
+    """
+    reflected = getattr(pd_table, "reflected", None)
+    if reflected is not None:
+        columns = [{"name": column.name, "type": column.type}
+                   for column in reflected.columns]
+    else:
+        columns = inspect(conn).get_columns(pd_table.name, schema=pd_table.schema)
+    arrays = {column["name"] for column in columns
+              if isinstance(column["type"], ARRAY)}
+    return {i for i, key in enumerate(keys) if key in arrays}
+
+
+class _UnsupportedValue(Exception):
+    """raised for values that can't be sent with LOAD DATA"""
+
+
+def format_load_data_value(value):
+    """format a value as a field of mysql LOAD DATA's default format"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raise _UnsupportedValue(value)
+    # the defaults (FIELDS TERMINATED BY '\t' ESCAPED BY '\\'
+    # LINES TERMINATED BY '\n') use the same escapes as postgres COPY
+    return format_copy_value(value)
+
+
+def _qualified_name(pd_table, conn):
+    preparer = conn.dialect.identifier_preparer
+    name = preparer.quote(pd_table.name)
+    if pd_table.schema:
+        name = f"{preparer.quote_schema(pd_table.schema)}.{name}"
+    return name
+
+
+def copy_insert(pd_table, conn, keys, data_iter):
+    """
+    Insert rows with postgres COPY FROM STDIN.
+
+    Each chunk pandas provides is serialized to the COPY
+    text format in memory and streamed through the DBAPI
+    connection, which avoids the parameter limits and the
+    quoting overhead of multi-row INSERT statements.
+
+    Lists are formatted as array literals for ARRAY columns
+    (which are looked up the first time a chunk has a list)
+    and as json otherwise.
+    """
+    buffer = io.StringIO()
+    nrows = 0
+    array_columns = None
+    with timed(SERIALIZATION):
+        for row in data_iter:
+            if array_columns is None and any(isinstance(value, list) for value in row):
+                array_columns = _array_columns(pd_table, conn, keys)
+            if array_columns:
+                fields = [format_array_value(value).translate(_COPY_ESCAPES)
+                          if i in array_columns and isinstance(value, (list, tuple))
+                          else format_copy_value(value)
+                          for i, value in enumerate(row)]
+            else:
+                fields = map(format_copy_value, row)
+            buffer.write("\t".join(fields))
+            buffer.write("\n")
+            nrows += 1
+        buffer.seek(0)
+
+    preparer = conn.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(key) for key in keys)
+    sql = f"COPY {_qualified_name(pd_table, conn)} ({columns}) FROM STDIN"
+
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg (3)
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+    return nrows
+
+
+def load_data_connect_args(url):
+    """
+    connect_args enabling LOAD DATA LOCAL INFILE on the client
+    for a mysql (or mariadb) url, and none for other databases.
+
+    :param url: str or sqlalchemy.engine.URL
+    """
+    url = make_url(url)
+    if url.get_backend_name() not in (mysql.dialect.name, "mariadb"):
+        return {}
+    arg = _LOCAL_INFILE_ARGS.get(url.get_driver_name())
+    return {arg: True} if arg else {}
+
+
+# server variables read by the mysql insertion methods, by engine
+_server_variables = weakref.WeakKeyDictionary()
+_server_variables_lock = threading.Lock()
+
+
+def _server_variable(conn, cursor, name):
+    """value of a server variable, read once per engine"""
+    with _server_variables_lock:
+        variables = _server_variables.setdefault(conn.engine, {})
+        if name in variables:
+            return variables[name]
+    cursor.execute(f"select @@{name}")
+    value = cursor.fetchone()[0]
+    with _server_variables_lock:
+        variables[name] = value
+    return value
+
+
+def _write_fifo(path, data, opened):
+    try:
+        with open(path, "w", encoding="utf8") as f:
+            opened.set()
+            f.write(data)
+    except BrokenPipeError:
+        # the reader went away, i.e. the LOAD DATA statement failed
+        pass
+
+
+def _load_data(cursor, sql, data):
+    """
+    Execute sql (a LOAD DATA LOCAL INFILE statement with a
+    {path} placeholder) streaming data through a named pipe
+    so that nothing is written to disk.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "knockoff.fifo")
+        os.mkfifo(path)
+        opened = threading.Event()
+        writer = threading.Thread(target=_write_fifo,
+                                  args=(path, data, opened),
+                                  daemon=True)
+        writer.start()
+        # the path is embedded in the statement as a string literal
+        escaped = path.replace("\\", "\\\\").replace("'", "\\'")
+        try:
+            cursor.execute(sql.format(path=escaped))
+        finally:
+            if not opened.is_set():
+                # the statement never opened the pipe, so
+                # drain it to let the writer finish
+                with open(path, "rb") as f:
+                    while f.read(io.DEFAULT_BUFFER_SIZE):
+                        pass
+            writer.join()
+
+
+def executemany_insert(pd_table, conn, keys, data_iter, rows=None):
+    """
+    Insert rows with the DBAPI cursor's executemany.
+
+    For mysql drivers, executemany rewrites the statement into
+    multi-row INSERT statements of up to cursor.max_stmt_length
+    bytes, which is raised to the server's max_allowed_packet so
+    that each chunk is sent in as few round trips as possible.
+    """
+    with timed(SERIALIZATION):
+        rows = rows if rows is not None else list(data_iter)
+        rows = [tuple(json.dumps(value) if isinstance(value, (dict, list)) else value
+                      for value in row)
+                for row in rows]
+    preparer = conn.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(key) for key in keys)
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    placeholders = ", ".join([placeholder] * len(keys))
+    sql = (f"INSERT INTO {_qualified_name(pd_table, conn)} "
+           f"({columns}) VALUES ({placeholders})")
+
+    cursor = conn.connection.cursor()
+    try:
+        if (conn.dialect.name == mysql.dialect.name and
+                hasattr(cursor, "max_stmt_length")):
+            max_allowed_packet = _server_variable(conn, cursor, "max_allowed_packet")
+            cursor.max_stmt_length = max(int(max_allowed_packet) - _PACKET_MARGIN,
+                                         cursor.max_stmt_length)
+        cursor.executemany(sql, rows)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def load_data_insert(pd_table, conn, keys, data_iter):
+    """
+    Insert rows with mysql LOAD DATA LOCAL INFILE.
+
+    Each chunk is serialized to LOAD DATA's default tab separated
+    format and streamed to the driver through a named pipe. This
+    requires local_infile to be enabled by the server and the client
+    (see load_data_connect_args, which the database service's engine
+    is created with when its local_infile is True).
+    Otherwise, or if a chunk has values that can't be sent this way
+    (e.g. bytes), the rows are inserted with executemany_insert.
+    """
+    rows = list(data_iter)
+    if not rows:
+        return 0
+
+    cursor = conn.connection.cursor()
+    try:
+        if not hasattr(os, "mkfifo") or not int(_server_variable(conn, cursor, "local_infile")):
+            return executemany_insert(pd_table, conn, keys, None, rows=rows)
+        try:
+            with timed(SERIALIZATION):
+                data = "".join("\t".join(map(format_load_data_value, row)) + "\n"
+                               for row in rows)
+        except _UnsupportedValue:
+            return executemany_insert(pd_table, conn, keys, None, rows=rows)
+
+        preparer = conn.dialect.identifier_preparer
+        columns = ", ".join(preparer.quote(key) for key in keys)
+        sql = (f"LOAD DATA LOCAL INFILE '{{path}}' "
+               f"INTO TABLE {_qualified_name(pd_table, conn)} "
+               f"CHARACTER SET utf8mb4 ({columns})")
+        try:
+            _load_data(cursor, sql, data)
+        except conn.dialect.loaded_dbapi.Error as e:
+            # e.g. "Loading local data is disabled" on the client
+            logger.warning(f"LOAD DATA LOCAL INFILE failed ({e}). "
+                           f"Falling back to executemany.")
+            return executemany_insert(pd_table, conn, keys, None, rows=rows)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def conflict_statement(table, keys, dialect_name, on_conflict,
+                       conflict_columns=None):
+    """
+    INSERT statement for table that skips (on_conflict="ignore") or
+    updates (on_conflict="update") the rows that conflict with existing
+    ones, i.e. ON CONFLICT DO NOTHING/DO UPDATE for postgresql and sqlite
+    and INSERT IGNORE/ON DUPLICATE KEY UPDATE for mysql.
+
+    :param table: sqlalchemy.Table
+    :param keys: list[str]
+        Columns being inserted. Those that aren't conflict
+        columns are the ones updated.
+    :param conflict_columns: list[str], default None
+        Columns of the unique constraint that conflicts, needed
+        to update on postgresql and sqlite. Defaults to the
+        primary key. MySQL updates on any conflict.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"Unsupported on_conflict: {on_conflict}. "
+                         f"Expected one of {list(ON_CONFLICT)}.")
+    conflict_columns = list(conflict_columns or
+                            [col.name for col in table.primary_key.columns])
+    update_columns = [key for key in keys if key not in conflict_columns]
+
+    if dialect_name in (postgresql.dialect.name, sqlite.dialect.name):
+        dialect = postgresql if dialect_name == postgresql.dialect.name else sqlite
+        statement = dialect.insert(table)
+        if on_conflict == IGNORE or not update_columns:
+            return statement.on_conflict_do_nothing()
+        if not conflict_columns:
+            raise ValueError(f"on_conflict={UPDATE} needs conflict_columns "
+                             f"since {table.name} has no primary key.")
+        return statement.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={key: statement.excluded[key] for key in update_columns}
+        )
+    if dialect_name == mysql.dialect.name:
+        statement = mysql.insert(table)
+        if on_conflict == IGNORE or not update_columns:
+            return statement.prefix_with("IGNORE")
+        return statement.on_duplicate_key_update(
+            {key: statement.inserted[key] for key in update_columns}
+        )
+    raise ValueError(f"on_conflict isn't supported for {dialect_name}.")
+
+
+class ConflictInsert(object):
+    """
+    Insertion method that inserts rows with conflict_statement(..),
+    batched like any other insertion method (e.g. one executemany per
+    chunk, which sqlalchemy sends as multi-row statements where it can).
+    Target tables are reflected once per instance.
+    """
+    def __init__(self, on_conflict, conflict_columns=None):
+        """
+        :param on_conflict: str
+            "ignore" or "update"
+        :param conflict_columns: list[str], default None
+            See conflict_statement.
+        """
+        if on_conflict not in ON_CONFLICT:
+            raise ValueError(f"Unsupported on_conflict: {on_conflict}. "
+                             f"Expected one of {list(ON_CONFLICT)}.")
+        self.on_conflict = on_conflict
+        self.conflict_columns = conflict_columns
+        self.__name__ = f"on_conflict_{on_conflict}"
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _table(self, pd_table, conn):
+        with self._lock:
+            key = (pd_table.schema, pd_table.name)
+            if key not in self._tables:
+                self._tables[key] = Table(pd_table.name, MetaData(),
+                                          schema=pd_table.schema,
+                                          autoload_with=conn)
+            return self._tables[key]
+
+    def __call__(self, pd_table, conn, keys, data_iter):
+        table = self._table(pd_table, conn)
+        statement = conflict_statement(table, keys, conn.dialect.name,
+                                       self.on_conflict, self.conflict_columns)
+        with timed(SERIALIZATION):
+            json_keys = {key for key in keys if isinstance(table.c[key].type, JSON)}
+            rows = [{key: json.dumps(value)
+                     if isinstance(value, (dict, list)) and key not in json_keys
+                     else value
+                     for key, value in zip(keys, row)}
+                    for row in data_iter]
+        if not rows:
+            return 0
+        return conn.execute(statement, rows).rowcount
+
+
+METHODS = {
+    COPY: copy_insert,
+    LOAD_DATA: load_data_insert,
+    EXECUTEMANY: executemany_insert,
+}
+
+
+def default_insert_method(dialect_name, local_infile=False):
+    """
+    fastest insertion method supported by a dialect. LOAD DATA LOCAL
+    INFILE is only used for mysql if local_infile is True since it
+    lets the server read any file the client can.
+    """
+    if dialect_name == postgresql.dialect.name:
+        return copy_insert
+    if dialect_name == mysql.dialect.name:
+        return load_data_insert if local_infile else executemany_insert
+    if dialect_name == sqlite.dialect.name:
+        # pandas' default (None) uses executemany which is faster than
+        # multi-row INSERT statements for sqlite and isn't subject to
+        # its limit on the number of bound parameters
+        return None
+    return MULTI
+
+
+def candidate_insert_methods(dialect_name, local_infile=False):
+    """insertion methods worth comparing for a dialect (see AUTOTUNE)"""
+    if dialect_name == postgresql.dialect.name:
+        return [copy_insert, MULTI, None]
+    if dialect_name == mysql.dialect.name:
+        methods = [MULTI, executemany_insert]
+        return [load_data_insert] + methods if local_infile else methods
+    return [None, MULTI]
+
+
+def method_name(method):
+    """readable name of an insertion method"""
+    if method is None:
+        # pandas' default
+        return EXECUTEMANY
+    if callable(method):
+        return method.__name__
+    return method
+
+
+def resolve_insert_method(method, dialect_name, local_infile=False):
+    """
+    :param method: str or callable
+        "auto" resolves to the default insertion method for
+        the dialect, "copy", "load_data" and "executemany" to
+        their corresponding functions and anything else (including
+        "autotune", which is handled by the database service) is
+        passed through as is.
+    :param dialect_name: str
+    :param local_infile: bool, default False
+        See default_insert_method.
+    """
+    if method == AUTO:
+        return default_insert_method(dialect_name, local_infile)
+    if isinstance(method, str) and method in METHODS:
+        return METHODS[method]
+    return method
@@ -1,41 +1,361 @@
+import json
+import time
+import sqlite3
 import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 
-from sqlalchemy import create_engine
-from joblib import Parallel, delayed
+from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.types import JSON, ARRAY
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+from knockoff.utilities.insert_methods import MULTI, method_name
+from knockoff.utilities.timing import timed, submit, SERIALIZATION
 
 logger = logging.getLogger(__name__)
 
+# maximum number of bound parameters in a single statement
+MAX_PARAMETERS = {
+    "postgresql": 65535,
+    "mysql": 65535,
+    "sqlite": 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999,
+    "mssql": 2100,
+}
+DEFAULT_MAX_PARAMETERS = 32766
+
+# chunks are sized to hold about this many values (rows * columns)
+TARGET_CHUNK_VALUES = 1000000
+MAX_CHUNKSIZE = 100000
+MIN_PROBE_ROWS = 100
+
+
+def auto_chunksize(ncols, dialect_name, method=MULTI):
+    """
+    Number of rows per chunk for a table with ncols columns.
+
+    Chunks hold about TARGET_CHUNK_VALUES values, so narrow tables
+    use fewer round trips. Multi-row INSERT statements are also
+    capped by the dialect's limit on bound parameters.
+    """
+    ncols = max(ncols, 1)
+    chunksize = TARGET_CHUNK_VALUES // ncols
+    if method == MULTI:
+        max_parameters = MAX_PARAMETERS.get(dialect_name, DEFAULT_MAX_PARAMETERS)
+        chunksize = min(chunksize, max_parameters // ncols)
+    return max(1, min(chunksize, MAX_CHUNKSIZE))
 
-def _to_sql(df, table, url, **kwargs):
+
+def _to_sql(df, table, url, engine=None, session_statements=None,
+            single_transaction=False, **kwargs):
     to_sql_kwargs = {
         "index": False,
         "method": "multi",
         "if_exists": "append"
     }
     to_sql_kwargs.update(kwargs)
-    engine = create_engine(url)
-    with engine.connect() as conn:
-        df.to_sql(table, conn, **to_sql_kwargs)
+    if engine is None:
+        engine = create_engine(url, future=True)
+        try:
+            _write(df, table, engine, session_statements,
+                   single_transaction, **to_sql_kwargs)
+        finally:
+            engine.dispose()
+    else:
+        _write(df, table, engine, session_statements,
+               single_transaction, **to_sql_kwargs)
+
+
+@contextmanager
+def _begin(engine, session_statements=None):
+    """transaction with session_statements applied for its duration"""
+    session_statements = session_statements or []
+    with engine.begin() as conn:
+        for statement, _ in session_statements:
+            conn.exec_driver_sql(statement)
+        try:
+            yield conn
+        finally:
+            # restore settings that outlive the transaction
+            # before the connection is returned to the pool
+            for _, reset_statement in session_statements:
+                if reset_statement:
+                    conn.exec_driver_sql(reset_statement)
+
+
+def _write(df, table, engine, session_statements=None, single_transaction=False,
+           chunksize=None, **kwargs):
+    """
+    write df with one transaction per chunk (or a single one
+    for every chunk) using the same engine
+    """
+    nrows = df.shape[0]
+    chunksize = chunksize or nrows or 1
+    if single_transaction:
+        with _begin(engine, session_statements) as conn:
+            for i in range(0, nrows, chunksize):
+                df[i:i+chunksize].to_sql(table, conn, **kwargs)
+        return
+    for i in range(0, nrows, chunksize):
+        with _begin(engine, session_statements) as conn:
+            df[i:i+chunksize].to_sql(table, conn, **kwargs)
+
+
+# stands in for the pandas SQLTable passed to insertion methods,
+# with the reflected sqlalchemy Table when there is one
+_TableRef = namedtuple("_TableRef", ["name", "schema", "reflected"],
+                       defaults=[None])
+
+
+def _to_records(df, table):
+    """rows of df as python values (None for missing values)"""
+    df = df.astype(object).where(df.notna(), None)
+    for col in df.columns:
+        if not isinstance(table.c[col].type, (JSON, ARRAY)):
+            # e.g. dicts in a text column. Lists are left as is for
+            # ARRAY columns, which the insertion method formats
+            df[col] = df[col].map(lambda value: json.dumps(value)
+                                  if isinstance(value, (dict, list)) else value)
+    return list(df.itertuples(index=False, name=None))
+
+
+class WriterPool(object):
+    """
+    Persistent pool of writer threads sharing a single (pooled) engine.
+
+    Each target table is reflected once and its INSERT statement is
+    reused for every chunk, so chunks are neither pickled to worker
+    processes nor re-inspected by pandas.
+    """
+    def __init__(self, engine, max_workers=None):
+        """
+        :param engine: sqlalchemy.engine.Engine
+        :param max_workers: int, default None
+            Number of writer threads (see ThreadPoolExecutor).
+        """
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="knockoff-writer")
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def clear(self):
+        """forget reflected tables (e.g. after DDL)"""
+        with self._lock:
+            self._tables.clear()
+
+    def table(self, name, schema=None):
+        """reflected table and its INSERT statement"""
+        with self._lock:
+            if (name, schema) not in self._tables:
+                table = Table(name, MetaData(), schema=schema,
+                              autoload_with=self.engine)
+                self._tables[(name, schema)] = (table, table.insert())
+            return self._tables[(name, schema)]
+
+    def _write_chunk(self, df, name, schema, method, session_statements):
+        table, insert = self.table(name, schema)
+        with timed(SERIALIZATION):
+            rows = _to_records(df, table)
+        keys = list(df.columns)
+        with _begin(self.engine, session_statements) as conn:
+            if callable(method):
+                method(_TableRef(name, schema, table), conn, keys, iter(rows))
+            else:
+                # "multi" and pandas' default (None) both execute the
+                # statement with all rows, which sqlalchemy batches into
+                # multi-row VALUES where the dialect supports it
+                with timed(SERIALIZATION):
+                    records = [dict(zip(keys, row)) for row in rows]
+                conn.execute(insert, records)
+
+    def write(self, df, name, chunksize=None, schema=None, method=MULTI,
+              session_statements=None):
+        """
+        Insert df into an existing table with one transaction
+        per chunk, written concurrently by the pool's threads.
+
+        :param chunksize: int, default None
+            Defaults to auto_chunksize(..).
+        :param method: str or callable, default "multi"
+            An insertion method (see knockoff.utilities.insert_methods).
+        """
+        nrows = df.shape[0]
+        chunksize = chunksize or auto_chunksize(df.shape[1],
+                                                self.engine.dialect.name,
+                                                method)
+        futures = [submit(self.executor,
+                          self._write_chunk,
+                          df[i:i+chunksize],
+                          name,
+                          schema,
+                          method,
+                          session_statements)
+                   for i in range(0, nrows, chunksize)]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        for future in futures:
+            if not future.cancelled():
+                # raises the first error
+                future.result()
 
 
 def to_sql(df,
            table,
            url,
            parallelize=True,
-           chunksize=1000,
+           chunksize=None,
            n_jobs=-1,
+           engine=None,
+           session_statements=None,
+           writer_pool=None,
+           prefer="threads",
+           single_transaction=False,
            **kwargs):
+    """
+    :param parallelize: bool, default True
+        If True, chunks are written concurrently by a WriterPool
+        (or by worker processes, see prefer).
+    :param n_jobs: int, default -1
+        Number of writer threads (or processes) when parallelized
+        and no writer_pool is provided.
+    :param chunksize: int, default None
+        Number of rows written per transaction (and per worker
+        task when parallelized). Defaults to auto_chunksize(..)
+        for the number of columns, dialect and method.
+    :param engine: sqlalchemy.engine.Engine, default None
+        Engine used when writing from the current process.
+        Engines can't be shared across processes, so when
+        parallelized each worker creates a single engine for url
+        and writes all of its chunks with it.
+    :param session_statements: list[tuple[str, str]], default None
+        (statement, reset_statement) pairs. Each statement is
+        executed at the start of every transaction and each
+        reset_statement (if not None) at its end, e.g. to change
+        session settings while loading.
+    :param writer_pool: WriterPool, default None
+        Used to write chunks when parallelized. Otherwise a WriterPool
+        is created for this call. Writer pools only append to existing
+        tables, so any other if_exists is written by a single process.
+    :param prefer: str, default "threads"
+        "processes" writes chunks with joblib worker processes
+        instead of a WriterPool.
+    :param single_transaction: bool, default False
+        If True, chunks written by the current process (i.e. when
+        not parallelized) are all written in a single transaction.
+    """
     logger.info("Populating table: %s" % table)
-    # TODO: better default for more effect parallelization?
+    if chunksize is None:
+        dialect_name = (engine.dialect.name if engine is not None
+                        else make_url(url).get_backend_name())
+        chunksize = auto_chunksize(df.shape[1], dialect_name,
+                                   kwargs.get("method", MULTI))
     nrows = df.shape[0]
-    if parallelize and nrows > chunksize:
+    use_writer_pool = (kwargs.get("if_exists", "append") == "append" and
+                       prefer != "processes")
+    if parallelize and nrows > chunksize and use_writer_pool:
+        write_kwargs = {"method": kwargs.get("method", MULTI),
+                        "schema": kwargs.get("schema")}
+        if writer_pool is not None:
+            writer_pool.write(df, table, chunksize=chunksize,
+                              session_statements=session_statements,
+                              **write_kwargs)
+        else:
+            owns_engine = engine is None
+            engine = engine or create_engine(url, future=True)
+            try:
+                with WriterPool(engine, max_workers=effective_n_jobs(n_jobs)) as pool:
+                    pool.write(df, table, chunksize=chunksize,
+                               session_statements=session_statements,
+                               **write_kwargs)
+            finally:
+                if owns_engine:
+                    engine.dispose()
+    elif parallelize and nrows > chunksize:
+        chunks = list(range(0, nrows, chunksize))
+        n_tasks = min(effective_n_jobs(n_jobs), len(chunks))
+        # one task (and engine) per worker instead of one per chunk
         Parallel(n_jobs=n_jobs)(
             delayed(_to_sql)(
-                df[i:i+chunksize],
+                pd.concat([df[i:i+chunksize] for i in chunks[task::n_tasks]]),
                 table,
                 url,
+                chunksize=chunksize,
+                session_statements=session_statements,
                 **kwargs
-            ) for i in range(0, nrows, chunksize))
+            ) for task in range(n_tasks))
     else:
-        _to_sql(df, table, url, **kwargs)
+        _to_sql(df, table, url, engine=engine,
+                chunksize=chunksize,
+                session_statements=session_statements,
+                single_transaction=single_transaction,
+                **kwargs)
     logger.info("Populated table: %s" % table)
+
+
+def probe_insert_methods(df, table, engine, candidates,
+                         probe_rows=None, **kwargs):
+    """
+    Insert the first rows of df with each candidate insertion
+    method and return the fastest.
+
+    Each candidate writes different rows, so nothing is written
+    twice. Candidates that fail are skipped.
+
+    :return: (method, rows_per_second, nrows)
+        The fastest method (None if df is too small to probe), the
+        throughput of each candidate by method_name(..) and the
+        number of rows of df that have been inserted.
+    """
+    nrows = df.shape[0]
+    if nrows < MIN_PROBE_ROWS * (len(candidates) + 1):
+        return None, {}, 0
+    kwargs.pop("method", None)
+    kwargs.pop("chunksize", None)
+    dialect_name = engine.dialect.name
+    # leave at least as many rows for the actual load
+    probe_rows = probe_rows or min(auto_chunksize(df.shape[1], dialect_name),
+                                   nrows // (len(candidates) + 1))
+
+    rows_per_second = {}
+    best = None
+    offset = 0
+    error = None
+    for method in candidates:
+        chunk = df[offset:offset+probe_rows]
+        start = time.perf_counter()
+        try:
+            _to_sql(chunk, table, None, engine=engine, method=method,
+                    chunksize=auto_chunksize(df.shape[1], dialect_name, method),
+                    **kwargs)
+        except DBAPIError as e:
+            logger.warning(f"Insertion method {method_name(method)} failed "
+                           f"for {table}: {e}")
+            error = e
+            continue
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        rows_per_second[method_name(method)] = chunk.shape[0] / elapsed
+        if best is None or (rows_per_second[method_name(method)] >
+                            rows_per_second[method_name(best)]):
+            best = method
+        offset += chunk.shape[0]
+
+    if not rows_per_second:
+        raise error
+    logger.info(f"Using insertion method {method_name(best)} for {table} "
+                f"(rows per second: {rows_per_second})")
+    return best, rows_per_second, offset
@@ -0,0 +1,66 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+"""
+Timers for the steps of an insert that happen below the
+database service (e.g. serializing rows for COPY), which
+are collected with a context variable so the code doing
+the work doesn't need to be passed a timer.
+"""
+
+import time
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+SERIALIZATION = "serialization"
+
+_timer = contextvars.ContextVar("knockoff_timer", default=None)
+
+
+class Timer(object):
+    """seconds spent in each kind of step (thread safe)"""
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self._lock:
+            self.seconds[kind] += seconds
+
+
+@contextmanager
+def collect():
+    """
+    Collect the steps timed (with timed(..)) in this context,
+    including in threads started with copy_context().run.
+    """
+    timer = Timer()
+    token = _timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+
+@contextmanager
+def timed(kind):
+    """time a step if collect() is active"""
+    timer = _timer.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(kind, time.perf_counter() - start)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit(..) in a copy of the current context"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
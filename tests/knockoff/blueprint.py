@@ -21,3 +21,15 @@ def sometable_blueprint_plan(knockoff_db):
     )
     knockoff_db.add(table)
     return knockoff_db
+
+
+def sometable_with_id_blueprint_plan(knockoff_db):
+    # sqlite only autoincrements INTEGER PRIMARY KEY columns
+    # (sometable.id is a BIGINT) so we generate the ids
+    table = KnockoffTable(
+        SOMETABLE,
+        autoload=True,
+        size=10
+    )
+    knockoff_db.add(table)
+    return knockoff_db
@@ -6,6 +6,7 @@
 
 import pytest
 import os
+import json
 import pandas as pd
 
 from sqlalchemy import create_engine
@@ -13,6 +14,7 @@ from unittest.mock import patch
 
 from knockoff.command import run
 from knockoff.sdk.blueprint import noplan
+from knockoff.sdk.db import SqliteDatabaseService
 from knockoff.utilities.testing.mysql import TEST_MYSQL_ENABLED
 from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
 
@@ -24,6 +26,7 @@ HERE = os.path.dirname(__file__)
 CONFIG_PATH = os.path.join(HERE, "knockoff.yaml")
 CONFIG_PATH2 = os.path.join(HERE, "knockoff2.yaml")
 MYSQL_CONFIG_PATH = os.path.join(HERE, "mysql-knockoff.yaml")
+SQLITE_CONFIG_PATH = os.path.join(HERE, "sqlite-knockoff.yaml")
 
 TESTABLE_INPUT_PATH = "knockoff.command.run.testable_input"
 
@@ -61,6 +64,16 @@ def mock_seed(i):
     assert i == SEED
 
 
+class TestParseArgs:
+
+    def test_disable_constraints(self):
+        args = run.parse_args(["--load-mode", "--disable-constraints"])
+        assert args.load_mode and args.disable_constraints
+        assert not run.parse_args(["--load-mode"]).disable_constraints
+        with pytest.raises(SystemExit):
+            run.parse_args(["--disable-constraints"])
+
+
 @pytest.mark.skipif(
     not TEST_POSTGRES_ENABLED,
     reason="postgres not available"
@@ -134,3 +147,72 @@ class TestRun:
             ])
 
         run.clear_run_env_vars()
+
+
+class TestRunSqlite:
+
+    def test_run_sqlite(self, tmp_path):
+        run.clear_run_env_vars()
+        report_path = os.path.join(tmp_path, "report.json")
+
+        def _mock_testable_input(prompt, test_temp_url, test_knockoff_db, **kwargs):
+            assert test_temp_url.startswith("sqlite:///file:knockoff_")
+            assert isinstance(test_knockoff_db.database_service,
+                              SqliteDatabaseService)
+            assert test_knockoff_db.database_service.ephemeral
+            engine = create_engine(test_temp_url)
+            with engine.connect() as conn:
+                df = pd.read_sql_table(SOMETABLE, conn)
+            engine.dispose()
+            assert df.shape == (10, 7)
+
+        with patch(TESTABLE_INPUT_PATH, _mock_testable_input):
+            run.main(argv=[
+                "--ephemeral",
+                "--yaml-config",
+                SQLITE_CONFIG_PATH,
+                "--load-mode",
+                "--disable-constraints",
+                "--report",
+                report_path
+            ])
+
+        with open(report_path) as f:
+            report = json.load(f)
+        assert report["rows"] == 10
+        assert report["tables"][SOMETABLE]["rows"] == 10
+        assert report["tables"][SOMETABLE]["chunks"] == 1
+        assert set(report["tables"][SOMETABLE]["latency_seconds"]) == {"p50", "p95", "p99"}
+
+        run.clear_run_env_vars()
+
+    def test_run_dump(self, tmp_path):
+        run.clear_run_env_vars()
+        bundle = os.path.join(tmp_path, "bundle")
+
+        def _mock_testable_input(prompt, test_temp_url, **kwargs):
+            engine = create_engine(test_temp_url)
+            with engine.connect() as conn:
+                df = pd.read_sql_table(SOMETABLE, conn)
+            engine.dispose()
+            # dumped instead of inserted
+            assert df.shape == (0, 7)
+
+        with patch(TESTABLE_INPUT_PATH, _mock_testable_input):
+            run.main(argv=[
+                "--ephemeral",
+                "--yaml-config",
+                SQLITE_CONFIG_PATH,
+                "--dump",
+                bundle,
+                "--dump-format",
+                "sql"
+            ])
+
+        with open(os.path.join(bundle, "manifest.json")) as f:
+            manifest = json.load(f)
+        assert manifest["format"] == "sql"
+        assert manifest["tables"][0]["name"] == SOMETABLE
+        assert manifest["tables"][0]["rows"] == 10
+
+        run.clear_run_env_vars()
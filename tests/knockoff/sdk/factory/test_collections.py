@@ -7,9 +7,17 @@
 import pytest
 from unittest import TestCase
 
+import numpy as np
 import pandas as pd
 
-from knockoff.sdk.factory.collections import KnockoffDataFrameFactory, CollectionsFactory
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.constraints import KnockoffUniqueConstraint
+from knockoff.sdk.factory.column import ColumnFactory
+from knockoff.sdk.factory.sequence import SequenceFactory
+from knockoff.sdk.factory.distribution import UniformFactory
+from knockoff.sdk.factory.collections import (KnockoffDataFrameFactory,
+                                              CollectionsFactory,
+                                              FanOutFactory)
 from knockoff.sdk.factory.next_strategy.df import cycle_df_factory
 
 
@@ -62,3 +70,79 @@ class TestCollections(object):
 
         with pytest.raises(TypeError):
             factory()
+
+
+def make_orders_table(size=5):
+    return KnockoffTable("orders",
+                         columns=["order_id", "customer"],
+                         factories=[ColumnFactory("order_id", SequenceFactory(start=1)),
+                                    ColumnFactory("customer", lambda: "someone")],
+                         size=size)
+
+
+class TestFanOut(object):
+
+    def test_fan_out(self):
+        orders = make_orders_table(size=3)
+        factory = FanOutFactory(orders, [2, 0, 3],
+                                columns=["order_id"],
+                                ordinal="line_number",
+                                ordinal_start=1)
+        assert factory.size == 5
+        actual = pd.DataFrame([factory() for _ in range(5)])
+        expected = pd.DataFrame({"order_id": [1, 1, 3, 3, 3],
+                                 "line_number": [1, 2, 1, 2, 3]})
+        pd.testing.assert_frame_equal(actual, expected)
+        with pytest.raises(ValueError):
+            factory()
+
+    def test_fan_out_table_size_is_derived(self):
+        orders = make_orders_table(size=50)
+        line_items = KnockoffTable(
+            "line_items",
+            columns=["order_id", "line_number", "qty"],
+            factories=[
+                FanOutFactory(orders, UniformFactory(1, 21, dtype=int, seed=1),
+                              columns=["order_id"], ordinal="line_number"),
+                ColumnFactory("qty", lambda: 1),
+            ]
+        )
+        df = line_items.build()
+        counts = df.groupby("order_id").size()
+        assert counts.between(1, 20).all()
+        assert set(counts.index) == set(orders.df["order_id"])
+        assert (df.groupby("order_id")["line_number"].max() == counts - 1).all()
+
+        line_items.reset()
+        assert line_items.build().shape[0] > 0
+
+    def test_fan_out_unique_constraint(self):
+        orders = make_orders_table(size=20)
+        skus = iter(range(1000))
+        line_items = KnockoffTable(
+            "line_items",
+            columns=["order_id", "sku"],
+            factories=[
+                FanOutFactory(orders, 3, columns=["order_id"]),
+                # every other sku is a duplicate that gets rejected
+                ColumnFactory("sku", lambda: next(skus) // 2),
+            ],
+            constraints=[KnockoffUniqueConstraint(["sku"])]
+        )
+        df = line_items.build()
+        assert df.shape[0] == 60
+        assert df["sku"].is_unique
+        assert (df.groupby("order_id").size() == 3).all()
+
+    def test_fan_out_fixed_count_rename(self):
+        orders = make_orders_table(size=2)
+        factory = FanOutFactory(orders, 2, rename={"order_id": "parent_id"})
+        actual = pd.DataFrame([factory() for _ in range(factory.size)])
+        assert actual.columns.tolist() == ["parent_id", "customer"]
+        assert actual["parent_id"].tolist() == [1, 1, 2, 2]
+
+    @pytest.mark.parametrize("counts", [[1, 2], [-1, 1, 1], lambda size: np.ones(size + 1)])
+    def test_fan_out_invalid_counts(self, counts):
+        factory = FanOutFactory(make_orders_table(size=3), counts)
+        with pytest.raises(ValueError):
+            factory()
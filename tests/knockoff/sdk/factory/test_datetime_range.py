@@ -0,0 +1,123 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+from datetime import date, datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.factory.datetime_range import (DatetimeRangeFactory,
+                                                 DateRangeFactory,
+                                                 resolve_range)
+
+
+NOW = datetime(2021, 6, 15, 12, 30)
+
+
+class TestDatetimeRange(object):
+
+    @pytest.mark.parametrize("start,end,expected", [
+        ("2020-01-01", "2020-02-01", ("2020-01-01", "2020-02-01")),
+        ("-1m", "2020-02-01", ("2020-01-01", "2020-02-01")),
+        ("2020-01-01", "+1y", ("2020-01-01", "2021-01-01")),
+        ("-1d", "now", ("2021-06-14 12:30", "2021-06-15 12:30")),
+        ("-2d", "-1d", ("2021-06-13 12:30", "2021-06-14 12:30")),
+        (date(2020, 1, 1), datetime(2020, 1, 2), ("2020-01-01", "2020-01-02")),
+    ])
+    def test_resolve_range(self, start, end, expected):
+        with patch("knockoff.utilities.date.interval.now", return_value=NOW), \
+                patch("knockoff.sdk.factory.datetime_range.now", return_value=NOW):
+            actual = resolve_range(start, end)
+        assert actual == tuple(pd.Timestamp(ts) for ts in expected)
+
+    def test_resolve_range_value_error(self):
+        with pytest.raises(ValueError):
+            resolve_range("2020-01-02", "2020-01-01")
+
+    def test_draw(self):
+        factory = DatetimeRangeFactory("2020-01-01", "2020-01-02", seed=1)
+        values = factory(size=1000)
+        assert values.dtype == np.dtype('datetime64[ns]')
+        assert values.min() >= np.datetime64("2020-01-01")
+        assert values.max() < np.datetime64("2020-01-02")
+
+    def test_seed(self):
+        values1 = DatetimeRangeFactory("2020-01-01", "2021-01-01", seed=7)(size=10)
+        values2 = DatetimeRangeFactory("2020-01-01", "2021-01-01", seed=7)(size=10)
+        np.testing.assert_array_equal(values1, values2)
+
+    def test_unit(self):
+        factory = DatetimeRangeFactory("2020-01-01", "2020-02-01", unit="H", seed=1)
+        values = factory(size=100)
+        assert (values.astype(np.int64) % (3600*10**9) == 0).all()
+
+    @pytest.mark.parametrize("unit,expected", [
+        # same units as Interval strings, 'm' is months and 'M' minutes
+        ("y", "2020-01-01T00:00"),
+        ("m", "2020-05-01T00:00"),
+        ("d", "2020-05-17T00:00"),
+        ("M", "2020-05-17T13:42"),
+    ])
+    def test_interval_units(self, unit, expected):
+        factory = DatetimeRangeFactory("2020-05-17T13:42:30",
+                                       "2020-05-17T13:42:31", unit=unit)
+        np.testing.assert_array_equal(factory(size=3),
+                                      np.array([expected]*3, dtype='datetime64[ns]'))
+
+    def test_invalid_unit(self):
+        with pytest.raises(ValueError):
+            DatetimeRangeFactory(unit="fortnight")
+
+    def test_tz(self):
+        factory = DatetimeRangeFactory("2020-01-01", "2020-01-02",
+                                       tz="America/Los_Angeles", unit="d", seed=1)
+        values = pd.DatetimeIndex(factory(size=100))
+        assert str(values.tz) == "America/Los_Angeles"
+        assert (values == pd.Timestamp("2020-01-01", tz="America/Los_Angeles")).all()
+        single = factory()
+        assert isinstance(single, datetime)
+        assert single.tzinfo is not None
+
+    def test_single_values(self):
+        factory = DatetimeRangeFactory("2020-01-01", "2020-01-02", seed=1)
+        values = [factory() for _ in range(5)]
+        assert all(type(value) is datetime for value in values)
+        assert all(datetime(2020, 1, 1) <= value < datetime(2020, 1, 2)
+                   for value in values)
+
+
+class TestDateRange(object):
+
+    def test_draw(self):
+        factory = DateRangeFactory("2020-01-01", "2020-01-03", seed=1)
+        values = factory(size=1000)
+        assert values.dtype == np.dtype('datetime64[ns]')
+        assert set(values.astype('datetime64[D]').tolist()) == {date(2020, 1, 1),
+                                                               date(2020, 1, 2),
+                                                               date(2020, 1, 3)}
+
+    def test_single_values(self):
+        factory = DateRangeFactory("2020-01-01", "+0d", seed=1)
+        assert factory() == date(2020, 1, 1)
+
+    def test_knockoff_table_default_type_factory(self):
+        # the range factories are opt-in
+        table = KnockoffTable("sometable",
+                              columns=["dt", "d"],
+                              dtype={"dt": datetime, "d": date},
+                              default_type_factory={
+                                  datetime: DatetimeRangeFactory("2020-01-01", "2021-01-01"),
+                                  date: DateRangeFactory("2020-01-01", "2020-12-31"),
+                              },
+                              size=10)
+        df = table.build()
+        assert all(type(value) is date for value in df["d"])
+        assert all(isinstance(value, datetime) for value in df["dt"])
+        assert all(value.year == 2020 for value in df["dt"])
@@ -0,0 +1,93 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import numpy as np
+import pytest
+
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.factory.column import ColumnFactory
+from knockoff.sdk.factory.distribution import (DistributionFactory,
+                                               NormalFactory,
+                                               LogNormalFactory,
+                                               PoissonFactory,
+                                               ExponentialFactory,
+                                               ZipfFactory,
+                                               UniformFactory,
+                                               HistogramFactory,
+                                               CategoricalFactory)
+
+
+class TestDistribution(object):
+
+    @pytest.mark.parametrize("factory,method,kwargs", [
+        (NormalFactory(loc=1, scale=2, seed=3), "normal", {"loc": 1, "scale": 2}),
+        (LogNormalFactory(mean=1, sigma=.5, seed=3), "lognormal", {"mean": 1, "sigma": .5}),
+        (PoissonFactory(lam=3, seed=3), "poisson", {"lam": 3}),
+        (ExponentialFactory(scale=2, seed=3), "exponential", {"scale": 2}),
+        (ZipfFactory(a=2, seed=3), "zipf", {"a": 2}),
+        (UniformFactory(low=1, high=5, seed=3), "uniform", {"low": 1, "high": 5}),
+        (UniformFactory(low=1, high=5, dtype=int, seed=3), "integers", {"low": 1, "high": 5}),
+        (DistributionFactory("binomial", n=10, p=.5, seed=3), "binomial", {"n": 10, "p": .5}),
+    ])
+    def test_draw(self, factory, method, kwargs):
+        expected = getattr(np.random.default_rng(3), method)(size=100, **kwargs)
+        np.testing.assert_array_equal(factory(size=100), expected)
+
+    def test_single_values_use_buffer(self):
+        factory = PoissonFactory(lam=3, seed=3, buffer_size=10)
+        expected = np.random.default_rng(3).poisson(lam=3, size=20).tolist()
+        actual = [factory() for _ in range(20)]
+        assert actual == expected
+        assert all(isinstance(value, int) for value in actual)
+
+    def test_seed_from_global_state(self):
+        np.random.seed(123)
+        values1 = NormalFactory()(size=5)
+        np.random.seed(123)
+        values2 = NormalFactory()(size=5)
+        np.testing.assert_array_equal(values1, values2)
+
+    def test_histogram(self):
+        factory = HistogramFactory([0, 1, 10], [1, 0], seed=1)
+        values = factory(size=1000)
+        assert values.min() >= 0
+        assert values.max() < 1
+
+    def test_histogram_from_data(self):
+        data = np.random.default_rng(1).normal(loc=100, scale=5, size=10000)
+        values = HistogramFactory.from_data(data, bins=20, seed=1)(size=10000)
+        assert values.min() >= data.min()
+        assert values.max() <= data.max()
+        assert abs(values.mean() - 100) < 1
+
+    @pytest.mark.parametrize("bin_edges,counts", [([0, 1], [1, 1]),
+                                                  ([0, 1, 2], [0, 0])])
+    def test_histogram_value_error(self, bin_edges, counts):
+        with pytest.raises(ValueError):
+            HistogramFactory(bin_edges, counts)
+
+    def test_knockoff_table(self):
+        table = KnockoffTable("sometable",
+                              columns=["qty"],
+                              factories=[ColumnFactory("qty", PoissonFactory(lam=3))],
+                              size=10)
+        df = table.build()
+        assert df.shape == (10, 1)
+        assert (df["qty"] >= 0).all()
+
+    def test_categorical(self):
+        factory = CategoricalFactory(["a", "b", "c"], weights=[1, 0, 3], seed=1)
+        values = factory(size=1000)
+        assert set(values) == {"a", "c"}
+        assert (values == "c").sum() > (values == "a").sum()
+        assert factory() in {"a", "c"}
+
+    @pytest.mark.parametrize("values,weights", [(["a"], [1, 2]),
+                                                (["a", "b"], [0, 0])])
+    def test_categorical_value_error(self, values, weights):
+        with pytest.raises(ValueError):
+            CategoricalFactory(values, weights)
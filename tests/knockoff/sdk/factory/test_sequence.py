@@ -0,0 +1,105 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.factory.column import ColumnFactory
+from knockoff.sdk.factory.sequence import SequenceFactory
+
+
+class TestSequence(object):
+
+    def test_draw(self):
+        factory = SequenceFactory(start=10, step=2)
+        np.testing.assert_array_equal(factory(size=3), [10, 12, 14])
+        np.testing.assert_array_equal(factory(size=2), [16, 18])
+
+    def test_single_values(self):
+        factory = SequenceFactory(start=1, buffer_size=2)
+        actual = [factory() for _ in range(5)]
+        assert actual == [1, 2, 3, 4, 5]
+        assert all(isinstance(i, int) for i in actual)
+
+    def test_negative_step(self):
+        factory = SequenceFactory(start=0, step=-1)
+        np.testing.assert_array_equal(factory(size=3), [0, -1, -2])
+
+    @pytest.mark.parametrize("kwargs", [{"step": 0},
+                                        {"shard": 2, "num_shards": 2},
+                                        {"shard": -1}])
+    def test_invalid_args(self, kwargs):
+        with pytest.raises(ValueError):
+            SequenceFactory(**kwargs)
+
+    def test_shards_are_disjoint(self):
+        shards = SequenceFactory(start=5).shards(3)
+        values = [shard(size=10) for shard in shards]
+        np.testing.assert_array_equal(values[1][:3], [6, 9, 12])
+        combined = np.concatenate(values)
+        assert len(set(combined)) == 30
+        assert set(combined) == set(range(5, 35))
+
+    def test_nested_shards(self):
+        shard = SequenceFactory(start=0).shard(1, 2).shard(1, 2)
+        np.testing.assert_array_equal(shard(size=3), [3, 7, 11])
+
+    def test_shards_after_draws(self):
+        factory = SequenceFactory(start=0, buffer_size=4)
+        drawn = [factory() for _ in range(2)]
+        shards = factory.shards(2)
+        # the values buffered before sharding are still handed out
+        values = drawn + [factory() for _ in range(2)]
+        values += [value for shard in shards for value in shard(size=5)]
+        assert sorted(values) == list(range(14))
+
+    def test_sharded_parent_stops_drawing(self):
+        factory = SequenceFactory(start=0)
+        values = list(factory(size=4))
+        shards = factory.shards(2)
+        values += [value for shard in shards for value in shard(size=3)]
+        # the shards own the rest of the sequence
+        with pytest.raises(RuntimeError, match="sharded"):
+            factory(size=4)
+        with pytest.raises(RuntimeError, match="sharded"):
+            factory()
+        assert sorted(values) == list(range(10))
+
+    def test_threads_get_disjoint_values(self):
+        factory = SequenceFactory(buffer_size=7)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            values = list(executor.map(lambda _: factory(), range(1000)))
+        assert sorted(values) == list(range(1000))
+
+    def test_pickle(self):
+        factory = SequenceFactory(start=3).shard(0, 2)
+        clone = pickle.loads(pickle.dumps(factory))
+        np.testing.assert_array_equal(clone(size=2), [3, 5])
+
+    @pytest.mark.parametrize("current,expected", [(41, [42, 43]),
+                                                  (None, [7, 8])])
+    def test_from_database(self, current, expected):
+        database_service = MagicMock()
+        database_service.max_value.return_value = current
+        factory = SequenceFactory.from_database(database_service,
+                                                "sometable", "id",
+                                                start=7)
+        database_service.max_value.assert_not_called()
+        np.testing.assert_array_equal(factory(size=2), expected)
+        database_service.max_value.assert_called_once_with("sometable", "id")
+
+    def test_knockoff_table(self):
+        table = KnockoffTable("sometable",
+                              columns=["id"],
+                              factories=[ColumnFactory("id", SequenceFactory(start=1))],
+                              size=5)
+        assert table.build()["id"].tolist() == [1, 2, 3, 4, 5]
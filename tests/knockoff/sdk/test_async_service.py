@@ -0,0 +1,219 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from knockoff.sdk.db import KnockoffDB, create_database_service
+from knockoff.sdk.table import KnockoffTable
+from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
+from tests.knockoff.data_model import Base, SOMETABLE
+from .knockoff_table import PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME, TRANSACTION_TABLE_NAME
+from .knockoff_table import PRODUCT_TABLE, LOCATION_TABLE, TRANSACTION_TABLE
+
+aiosqlite = pytest.importorskip("aiosqlite")
+
+from knockoff.sdk.async_service import AsyncKnockoffDatabaseService  # noqa: E402
+
+
+@pytest.fixture(scope="function")
+def sqlite_url(tmp_path):
+    path = tmp_path / "knockoff.db"
+    with create_engine(f"sqlite:///{path}", future=True).begin() as conn:
+        Base.metadata.create_all(conn)
+    return f"sqlite+aiosqlite:///{path}"
+
+
+def read_sometable(database_service):
+    with database_service.engine.connect() as conn:
+        return pd.read_sql_table(SOMETABLE, conn)
+
+
+class TestAsyncKnockoffDatabaseService:
+
+    def test_create_database_service(self, sqlite_url):
+        database_service = create_database_service(sqlite_url)
+        assert isinstance(database_service, AsyncKnockoffDatabaseService)
+        assert database_service.engine.url.drivername == "sqlite"
+        database_service.dispose()
+
+    def test_insert_async(self, sqlite_url):
+        database_service = AsyncKnockoffDatabaseService(sqlite_url,
+                                                        max_in_flight=2,
+                                                        chunksize=10)
+        active = []
+        peak = []
+        begin = database_service.async_engine.begin
+
+        @asynccontextmanager
+        async def counting_begin():
+            active.append(1)
+            peak.append(len(active))
+            try:
+                await asyncio.sleep(.01)
+                async with begin() as conn:
+                    yield conn
+            finally:
+                active.pop()
+
+        table = KnockoffTable(SOMETABLE, autoload=True, size=100)
+        table.prepare(database_service=database_service)
+
+        async def insert():
+            async with database_service:
+                database_service.async_engine = type(
+                    "CountingEngine", (), {"begin": staticmethod(counting_begin),
+                                           "dialect": database_service.async_engine.dialect,
+                                           "dispose": database_service.async_engine.dispose}
+                )()
+                await database_service.insert_async(SOMETABLE, table.df)
+                return read_sometable(database_service)
+
+        df = asyncio.run(insert())
+        assert sorted(df["id"]) == sorted(table.df["id"])
+        assert df["json_col"].tolist() == table.df.sort_values("id")["json_col"].tolist()
+        # 10 chunks, one at a time since sqlite doesn't support concurrent writes
+        assert not database_service.supports_concurrent_writes
+        assert len(peak) == 10
+        assert max(peak) == 1
+
+    def test_insert_async_on_conflict(self, sqlite_url):
+        database_service = AsyncKnockoffDatabaseService(sqlite_url, chunksize=4)
+        table = KnockoffTable(SOMETABLE, autoload=True, size=10)
+        table.prepare(database_service=database_service)
+        df = table.df
+
+        async def insert():
+            async with database_service:
+                await database_service.insert_async(SOMETABLE, df[:5])
+                updated = df.assign(float_col=1.5)
+                await database_service.insert_async(SOMETABLE, updated,
+                                                    on_conflict="ignore")
+                ignored = read_sometable(database_service)
+                await database_service.insert_async(SOMETABLE, updated,
+                                                    on_conflict="update")
+                return ignored, read_sometable(database_service)
+
+        ignored, updated = asyncio.run(insert())
+        assert (ignored["float_col"] == 1.5).sum() == 5
+        assert (updated["float_col"] == 1.5).all()
+        assert updated.shape[0] == 10
+
+    def test_knockoff_db_insert_async(self, sqlite_url):
+        database_service = AsyncKnockoffDatabaseService(sqlite_url)
+        knockoff_db = KnockoffDB(database_service=database_service, chunksize=7)
+        knockoff_db.add(KnockoffTable(SOMETABLE, autoload=True, size=50))
+
+        async def insert():
+            async with database_service:
+                report = await knockoff_db.insert_async()
+                return report, read_sometable(database_service)
+
+        report, df = asyncio.run(insert())
+        assert df.shape == (50, 7)
+        assert report.summary(SOMETABLE)["chunks"] == 8
+        assert report.summary(SOMETABLE)["rows"] == 50
+
+    def test_knockoff_db_insert_async_order(self):
+        events = []
+
+        class RecordingDatabaseService:
+            async def insert_async(self, name, df, dtype=None, **kwargs):
+                events.append(("start", name))
+                await asyncio.sleep(.02)
+                events.append(("end", name))
+
+        knockoff_db = KnockoffDB(database_service=RecordingDatabaseService())
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE)
+        asyncio.run(knockoff_db.insert_async())
+
+        position = {event: i for i, event in enumerate(events)}
+        assert position[("end", PRODUCT_TABLE_NAME)] < position[("start", TRANSACTION_TABLE_NAME)]
+        assert position[("end", LOCATION_TABLE_NAME)] < position[("start", TRANSACTION_TABLE_NAME)]
+        # independent tables are inserted concurrently
+        assert position[("start", LOCATION_TABLE_NAME)] < position[("end", PRODUCT_TABLE_NAME)]
+
+    def test_knockoff_db_insert_async_error(self):
+        class FailingDatabaseService:
+            def insert(self, name, df, dtype=None, **kwargs):
+                if name == PRODUCT_TABLE_NAME:
+                    raise ValueError(name)
+
+        knockoff_db = KnockoffDB(database_service=FailingDatabaseService())
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE)
+        with pytest.raises(ValueError, match=PRODUCT_TABLE_NAME):
+            asyncio.run(knockoff_db.insert_async())
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_concurrent_writes_asyncpg(self, empty_db_with_sometable):
+        pytest.importorskip("asyncpg")
+        url = make_url(empty_db_with_sometable.url).set(drivername="postgresql+asyncpg")
+        database_service = AsyncKnockoffDatabaseService(
+            url.render_as_string(hide_password=False),
+            max_in_flight=2
+        )
+        assert database_service.supports_concurrent_writes
+        assert database_service.max_in_flight == 2
+        database_service.dispose()
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_insert_async_asyncpg(self, empty_db_with_sometable):
+        pytest.importorskip("asyncpg")
+        url = make_url(empty_db_with_sometable.url).set(drivername="postgresql+asyncpg")
+        database_service = AsyncKnockoffDatabaseService(
+            url.render_as_string(hide_password=False),
+            chunksize=30
+        )
+        knockoff_db = KnockoffDB(database_service=database_service)
+        table = KnockoffTable(SOMETABLE, autoload=True, size=100)
+        knockoff_db.add(table)
+
+        async def insert():
+            async with database_service:
+                await knockoff_db.insert_async()
+                return read_sometable(database_service)
+
+        df = asyncio.run(insert()).sort_values("id").reset_index(drop=True)
+        expected = table.df.sort_values("id").reset_index(drop=True)
+        pd.testing.assert_frame_equal(df, expected[df.columns], check_dtype=False)
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    @pytest.mark.parametrize("method", ["copy", "multi"])
+    def test_insert_async_load_mode(self, empty_db_with_sometable, method):
+        pytest.importorskip("asyncpg")
+        url = make_url(empty_db_with_sometable.url).set(drivername="postgresql+asyncpg")
+        database_service = AsyncKnockoffDatabaseService(
+            url.render_as_string(hide_password=False),
+            chunksize=30,
+            method=method
+        )
+        knockoff_db = KnockoffDB(database_service=database_service)
+        table = KnockoffTable(SOMETABLE, autoload=True, size=100)
+        knockoff_db.add(table)
+
+        async def insert():
+            async with database_service:
+                # session statements are executed before each chunk
+                await knockoff_db.insert_async(load_mode=True)
+                return read_sometable(database_service)
+
+        df = asyncio.run(insert())
+        assert sorted(df["id"]) == sorted(table.df["id"])
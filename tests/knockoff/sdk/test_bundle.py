@@ -0,0 +1,161 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import os
+import json
+import datetime
+from unittest.mock import patch
+
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.types import JSON
+
+from knockoff.sdk.db import KnockoffDB, SqliteDatabaseService, DefaultDatabaseService
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.bundle import (load_bundle, read_manifest, split_statements,
+                                 format_bundle_value, parse_copy_line,
+                                 MANIFEST, COPY, COPY_GZ, SQL)
+from knockoff.command import load
+from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
+from tests.knockoff.data_model import Base, SOMETABLE
+from .knockoff_table import PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME, TRANSACTION_TABLE_NAME
+from .knockoff_table import PRODUCT_TABLE, LOCATION_TABLE, TRANSACTION_TABLE
+
+
+def create_sqlite_db(path):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, future=True)
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+    engine.dispose()
+    return url
+
+
+def read_sometable(url):
+    engine = create_engine(url, future=True)
+    with engine.connect() as conn:
+        df = pd.read_sql_table(SOMETABLE, conn)
+    engine.dispose()
+    return df.sort_values(by="id").reset_index(drop=True)
+
+
+class TestBundle:
+
+    def test_copy_values(self):
+        values = ["a\tb\nc\\d\re", "", None, 1, 2.5, True,
+                  datetime.datetime(2020, 1, 2, 3, 4, 5), {"a": [1, "b"]}]
+        line = "\t".join(map(format_bundle_value, values)) + "\n"
+        assert parse_copy_line(line) == ["a\tb\nc\\d\re", "", None, "1", "2.5",
+                                          "1", "2020-01-02 03:04:05",
+                                          '{"a": [1, "b"]}']
+
+    def test_split_statements(self):
+        sql = ("insert into t values ('a;b', 'it''s');\n"
+               "insert into t values ('c');\n")
+        assert split_statements(sql) == ["insert into t values ('a;b', 'it''s')",
+                                         "insert into t values ('c')"]
+        sql = "insert into t values ('a\\';b');insert into t values (1)"
+        assert split_statements(sql, backslash_escapes=True) == [
+            "insert into t values ('a\\';b')",
+            "insert into t values (1)"
+        ]
+
+    def test_dump_order(self, tmp_path):
+        knockoff_db = KnockoffDB(database_service=None, chunksize=3)
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE, insert=False)
+        manifest = knockoff_db.dump(tmp_path)
+
+        assert manifest == read_manifest(tmp_path)
+        assert [table["name"] for table in manifest["tables"]] == [
+            PRODUCT_TABLE_NAME, TRANSACTION_TABLE_NAME
+        ]
+        entry = manifest["tables"][1]
+        assert entry["rows"] == TRANSACTION_TABLE.size
+        with open(os.path.join(tmp_path, entry["file"])) as f:
+            lines = f.readlines()
+        # chunks are appended in order
+        assert len(lines) == TRANSACTION_TABLE.size
+        assert not os.path.exists(os.path.join(tmp_path, LOCATION_TABLE_NAME + ".tsv"))
+
+    @pytest.mark.parametrize("format", [COPY, COPY_GZ, SQL])
+    def test_dump_and_load(self, tmp_path, format):
+        source_url = create_sqlite_db(os.path.join(tmp_path, "source.db"))
+        with SqliteDatabaseService(url=source_url) as database_service:
+            table = KnockoffTable(SOMETABLE, autoload=True, size=50)
+            knockoff_db = KnockoffDB(database_service=database_service)
+            knockoff_db.add(table)
+            bundle = os.path.join(tmp_path, "bundle")
+            manifest = knockoff_db.dump(bundle, format=format)
+            assert manifest["format"] == format
+            assert manifest["dialect"] == ("sqlite" if format == SQL else None)
+            database_service.insert(SOMETABLE, table.df,
+                                    dtype={"json_col": JSON})
+
+        url = create_sqlite_db(os.path.join(tmp_path, "target.db"))
+        load_bundle(bundle, url=url)
+        pd.testing.assert_frame_equal(read_sometable(url),
+                                      read_sometable(source_url))
+
+    def test_load_command(self, tmp_path):
+        bundle = os.path.join(tmp_path, "bundle")
+        os.makedirs(bundle)
+        with open(os.path.join(bundle, MANIFEST), "w") as f:
+            json.dump({"version": 1, "format": COPY, "dialect": None,
+                       "tables": [{"name": "t", "file": "t.tsv",
+                                   "columns": ["id", "value"], "rows": 2}]}, f)
+        with open(os.path.join(bundle, "t.tsv"), "w") as f:
+            f.write("1\ta\n2\t\\N\n")
+        url = f"sqlite:///{tmp_path}/test.db"
+        engine = create_engine(url, future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("create table t (id int, value text)")
+        load.main([bundle, "--url", url])
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("select * from t order by id").fetchall() == [
+                (1, "a"), (2, None)
+            ]
+        engine.dispose()
+
+    @pytest.mark.parametrize("argv,connect_args", [
+        ([], {}),
+        (["--local-infile"], {"local_infile": True}),
+    ])
+    def test_load_command_local_infile(self, tmp_path, argv, connect_args):
+        with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+            json.dump({"version": 1, "format": COPY, "dialect": None,
+                       "tables": [{"name": "t", "file": "t.tsv",
+                                   "columns": ["id"], "rows": 0}]}, f)
+        url = "mysql+pymysql://root@localhost/db"
+        with patch("knockoff.sdk.bundle.create_engine") as mock_create_engine:
+            load.main([str(tmp_path), "--url", url] + argv)
+        mock_create_engine.assert_called_once_with(url, future=True,
+                                                   connect_args=connect_args)
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    @pytest.mark.parametrize("format", [COPY_GZ, SQL])
+    def test_load_postgres(self, empty_db_with_sometable, tmp_path, format):
+        url = empty_db_with_sometable.url
+        with DefaultDatabaseService(url=url) as database_service:
+            table = KnockoffTable(SOMETABLE, autoload=True, size=100)
+            knockoff_db = KnockoffDB(database_service=database_service)
+            knockoff_db.add(table)
+            knockoff_db.dump(tmp_path, format=format)
+            table.df.loc[0, "str_col"] = "100% 'o\\k'"
+            knockoff_db.dump(tmp_path, format=format)
+
+        load_bundle(tmp_path, url=url)
+        df = read_sometable(url)
+        expected = table.df.sort_values(by="id").reset_index(drop=True)
+        assert df["id"].tolist() == expected["id"].tolist()
+        assert df["str_col"].tolist() == expected["str_col"].tolist()
+        assert df["json_col"].tolist() == expected["json_col"].tolist()
+        assert "100% 'o\\k'" in df["str_col"].tolist()
@@ -0,0 +1,20 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+from knockoff.sdk.container.default import KnockoffContainer
+
+
+class TestKnockoffContainer:
+
+    def test_engine(self):
+        container = KnockoffContainer()
+        container.config.from_dict({"database_service": {"url": "sqlite://"}})
+        database_service = container.database_service()
+        try:
+            assert container.engine() is database_service.engine
+        finally:
+            database_service.dispose()
@@ -5,15 +5,80 @@
 # the LICENSE file in the root directory of this source tree.
 
 
+import os
+import time
+import threading
+from unittest.mock import patch, MagicMock
+
+import pytest
 import pandas as pd
+from sqlalchemy import create_engine, inspect, text, event
+from sqlalchemy.types import JSON
 
-from knockoff.sdk.db import KnockoffDB
+from knockoff.sdk.db import (KnockoffDB,
+                             KnockoffDatabaseService,
+                             DefaultDatabaseService,
+                             SqliteDatabaseService,
+                             create_database_service)
+from knockoff.sdk.table import KnockoffTable
+from knockoff.sdk.factory.sequence import SequenceFactory
+from knockoff.sdk.factory.collections import (KnockoffTableFactory,
+                                              CollectionsFactory,
+                                              KnockoffTransform)
+from knockoff.tempdb.setup_teardown import sqlite_setup_teardown
+from knockoff.utilities import timing
+from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
+from tests.knockoff.data_model import Base, SOMETABLE
 from .knockoff_table import PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME, TRANSACTION_TABLE_NAME
 from .knockoff_table import PRODUCT_TABLE, LOCATION_TABLE, TRANSACTION_TABLE
 
 
+def parent_child_db(seed=None, child_factory=None):
+    knockoff_db = KnockoffDB(database_service=None, seed=seed, max_workers=2)
+    parent = KnockoffTable("parent", columns=["id", "value"], size=20,
+                           dtype={"id": int, "value": int})
+    other = KnockoffTable("other", columns=["name"], size=5)
+    child = KnockoffTable("child", columns=["parent_id", "pid"], size=30,
+                          factories=[KnockoffTableFactory(parent, columns=["id"],
+                                                          rename={"id": "parent_id"}),
+                                     child_factory or (lambda: {"pid": os.getpid()})])
+    knockoff_db.add(child, depends_on=["parent"])
+    knockoff_db.add(parent)
+    knockoff_db.add(other)
+    return knockoff_db
+
+
+class MinimalDatabaseService(KnockoffDatabaseService):
+    """implements only the abstract methods, like third party services"""
+    def reflect_table(self, name):
+        return None
+
+    def insert(self, name, df, dtype=None):
+        return None
+
+    def reflect_unique_constraints(self, name):
+        return []
+
+    def has_table(self, name):
+        return False
+
+    def reflect_schema(self, name):
+        return None
+
+
 class TestDB:
 
+    def test_optional_service_methods(self):
+        database_service = MinimalDatabaseService()
+        with pytest.raises(NotImplementedError, match="max_value"):
+            database_service.max_value("t", "id")
+        with pytest.raises(NotImplementedError, match="read_sample"):
+            database_service.read_sample("t", 10)
+        with pytest.raises(NotImplementedError, match="read_table"):
+            database_service.read_table("t")
+        with pytest.raises(NotImplementedError, match="truncate"):
+            database_service.truncate(["t"])
+
     def test_knockoff_db_build(self):
 
         # TODO: Should we make database_service optional?
@@ -42,3 +107,627 @@ class TestDB:
         assert pd.notnull(df["address"]).sum() == 50
         assert pd.notnull(df["gender"]).sum() == 50
         assert all(df["units"]*df["price"] == df["revenue"])
+
+    @pytest.mark.parametrize("prefer", ["processes", "threads"])
+    def test_knockoff_db_build_parallel(self, prefer):
+        knockoff_db = parent_child_db()
+        dfs = knockoff_db.build(prefer=prefer)
+        assert set(dfs["child"]["parent_id"]) <= set(dfs["parent"]["id"])
+        assert dfs["other"].shape == (5, 1)
+        if prefer == "processes":
+            assert os.getpid() not in set(dfs["child"]["pid"])
+        else:
+            assert set(dfs["child"]["pid"]) == {os.getpid()}
+        # tables that are already built are kept
+        assert knockoff_db.build(prefer=prefer)["child"] is dfs["child"]
+
+    def test_knockoff_db_build_sequential(self):
+        # tables share factories' state and are built in this process
+        ids = SequenceFactory(start=1)
+        knockoff_db = KnockoffDB(database_service=None)
+        for name in ["a", "b"]:
+            knockoff_db.add(KnockoffTable(name, columns=["id", "pid"], size=3,
+                                          factories=[lambda: {"id": ids(),
+                                                              "pid": os.getpid()}]))
+        dfs = knockoff_db.build()
+        assert sorted(dfs["a"]["id"].tolist() + dfs["b"]["id"].tolist()) == list(range(1, 7))
+        assert set(dfs["a"]["pid"]) == {os.getpid()}
+        assert ids() == 7
+
+    @pytest.mark.parametrize("prefer", [None, "processes"])
+    def test_knockoff_db_build_seed(self, prefer):
+        dfs = parent_child_db(seed=5).build(prefer=prefer)
+        other_dfs = parent_child_db(seed=5).build(prefer=prefer)
+        for name in ["parent", "child", "other"]:
+            pd.testing.assert_frame_equal(dfs[name].drop(columns="pid", errors="ignore"),
+                                          other_dfs[name].drop(columns="pid", errors="ignore"))
+        assert not parent_child_db(seed=6).build(prefer=prefer)["parent"].equals(dfs["parent"])
+
+    def test_knockoff_db_build_unpicklable(self):
+        pids = (os.getpid() for _ in iter(int, 1))
+        dfs = parent_child_db(child_factory=lambda: {"pid": next(pids)}).build(prefer="processes")
+        # built in this process since generators can't be pickled
+        assert set(dfs["child"]["pid"]) == {os.getpid()}
+
+    def test_knockoff_db_infer_dependencies(self):
+        parent = KnockoffTable("parent", columns=["id"], size=5, dtype={"id": int})
+        child = KnockoffTable("child", columns=["parent_id"], size=10,
+                              factories=[KnockoffTableFactory(parent, columns=["id"],
+                                                              rename={"id": "parent_id"})])
+        database_service = MagicMock()
+        knockoff_db = KnockoffDB(database_service=database_service)
+        knockoff_db.add(child)
+        assert knockoff_db.dag_service.parents("child") == ["parent"]
+        # read from, but not added, so it isn't inserted
+        assert knockoff_db.dag_service.get_node("parent").insert is False
+
+        knockoff_db.insert()
+        assert [c.args[0] for c in database_service.insert.call_args_list] == ["child"]
+
+        knockoff_db.add(parent)
+        assert knockoff_db.dag_service.get_node("parent").insert is True
+        assert [node.table.name for node in knockoff_db.dag_service.iter_topologically()] == [
+            "parent", "child"
+        ]
+
+    def test_knockoff_db_infer_dependencies_protocol(self):
+        class OtherFactory:
+            def __call__(self):
+                return {"other": 1}
+
+            def knockoff_dependencies(self):
+                return ["other"]
+
+        table = KnockoffTable("table", columns=["other", "transformed"], size=1,
+                              factories=[CollectionsFactory(OtherFactory()),
+                                         KnockoffTransform(KnockoffTableFactory(PRODUCT_TABLE,
+                                                                                columns=["sku"]),
+                                                           lambda r: {"transformed": r["sku"]})])
+        assert table.dependencies() == ["other", PRODUCT_TABLE]
+
+        knockoff_db = KnockoffDB(database_service=None)
+        knockoff_db.add(table)
+        assert knockoff_db.dag_service.parents("table") == ["other", PRODUCT_TABLE_NAME]
+
+        knockoff_db = KnockoffDB(database_service=None)
+        knockoff_db.add(table, infer_dependencies=False)
+        assert knockoff_db.dag_service.parents("table") == []
+
+    def test_knockoff_db_build_only(self, tmp_path):
+        knockoff_db = parent_child_db(seed=3)
+        dfs = knockoff_db.build(only=["child"], cache_dir=tmp_path, max_workers=1)
+        assert set(dfs) == {"parent", "child"}
+        assert knockoff_db.tables["other"]._df is None
+        assert sorted(os.listdir(tmp_path)) == ["child.pkl", "parent.pkl"]
+
+        with pytest.raises(ValueError, match="Unknown tables"):
+            knockoff_db.build(only=["missing"])
+        with pytest.raises(ValueError, match="cache_dir"):
+            knockoff_db.build(only=["child"], load_ancestors="cache")
+
+        # the parent is read from the cache instead of being generated
+        other_db = parent_child_db(seed=4)
+        other_dfs = other_db.build(only=["child"], load_ancestors="cache",
+                                   cache_dir=tmp_path, max_workers=1)
+        pd.testing.assert_frame_equal(other_dfs["parent"], dfs["parent"])
+        assert set(other_dfs["child"]["parent_id"]) <= set(dfs["parent"]["id"])
+
+    def test_knockoff_db_insert_only(self):
+        database_service = MagicMock()
+        parent_df = pd.DataFrame({"id": [1, 2], "value": [3, 4]})
+        database_service.read_table.return_value = parent_df
+        knockoff_db = parent_child_db()
+        knockoff_db.database_service = database_service
+        knockoff_db.insert(only=["child"], load_ancestors="database", load_mode=True)
+
+        database_service.read_table.assert_called_once_with("parent")
+        database_service.load_mode.assert_called_once_with(tables=["child"])
+        assert [c.args[0] for c in database_service.insert.call_args_list] == ["child"]
+        df = database_service.insert.call_args.args[1]
+        assert set(df["parent_id"]) <= {1, 2}
+        assert knockoff_db.tables["other"]._df is None
+
+    def test_knockoff_db_insert_only_default(self, caplog):
+        database_service = MagicMock()
+        database_service.read_table.return_value = pd.DataFrame({"id": [1, 2],
+                                                                 "value": [3, 4]})
+        knockoff_db = parent_child_db()
+        knockoff_db.database_service = database_service
+        # ancestors are read from the database by default
+        knockoff_db.insert(only=["child"])
+        database_service.read_table.assert_called_once_with("parent")
+        assert set(database_service.insert.call_args.args[1]["parent_id"]) <= {1, 2}
+
+        knockoff_db = parent_child_db()
+        knockoff_db.database_service = database_service
+        knockoff_db.insert(only=["child"], load_ancestors=None)
+        assert "may reference rows that don't exist" in caplog.text
+
+    def test_knockoff_db_insert_order(self):
+        events = []
+        lock = threading.Lock()
+
+        class RecordingDatabaseService:
+            def insert(self, name, df, dtype=None, **kwargs):
+                with lock:
+                    events.append(("start", name, kwargs.get("n_jobs")))
+                # give independent tables a chance to overlap
+                time.sleep(.05)
+                with lock:
+                    events.append(("end", name, kwargs.get("n_jobs")))
+
+        knockoff_db = KnockoffDB(database_service=RecordingDatabaseService(),
+                                 max_workers=2)
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE, n_jobs=2)
+        knockoff_db.add(LOCATION_TABLE)
+        knockoff_db.insert()
+
+        position = {(event, name): i for i, (event, name, _) in enumerate(events)}
+        # parents are inserted before their children start
+        assert position[("end", PRODUCT_TABLE_NAME)] < position[("start", TRANSACTION_TABLE_NAME)]
+        assert position[("end", LOCATION_TABLE_NAME)] < position[("start", TRANSACTION_TABLE_NAME)]
+        # independent tables are inserted concurrently
+        assert position[("start", PRODUCT_TABLE_NAME)] < position[("end", LOCATION_TABLE_NAME)]
+        assert position[("start", LOCATION_TABLE_NAME)] < position[("end", PRODUCT_TABLE_NAME)]
+        assert ("start", PRODUCT_TABLE_NAME, 2) in events
+        assert ("start", LOCATION_TABLE_NAME, None) in events
+
+    def test_knockoff_db_insert_report(self):
+        class TimedDatabaseService:
+            def insert(self, name, df, dtype=None, **kwargs):
+                with timing.timed(timing.SERIALIZATION):
+                    time.sleep(.01)
+                time.sleep(.02)
+
+        knockoff_db = KnockoffDB(database_service=TimedDatabaseService(),
+                                 chunksize=4)
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE)
+        report = knockoff_db.insert()
+        assert report is knockoff_db.report
+
+        summary = report.summary(TRANSACTION_TABLE_NAME)
+        assert summary["rows"] == TRANSACTION_TABLE.size
+        assert summary["chunks"] == -(-TRANSACTION_TABLE.size // 4)
+        assert summary["bytes"] > 0
+        assert summary["serialization_seconds"] >= .01 * summary["chunks"]
+        assert summary["database_seconds"] >= .02 * summary["chunks"]
+        assert summary["latency_seconds"]["p50"] >= .03
+        assert report.summary()["rows"] == (TRANSACTION_TABLE.size +
+                                            PRODUCT_TABLE.size +
+                                            LOCATION_TABLE.size)
+        assert report.elapsed_seconds > 0
+        assert set(report.to_dict()["tables"]) == {TRANSACTION_TABLE_NAME,
+                                                   PRODUCT_TABLE_NAME,
+                                                   LOCATION_TABLE_NAME}
+
+    def test_knockoff_db_insert_pipeline(self):
+        events = []
+        lock = threading.Lock()
+
+        def record(event):
+            with lock:
+                events.append(event)
+
+        class SlowDatabaseService:
+            def insert(self, name, df, dtype=None, **kwargs):
+                record(("start", name, df.shape[0]))
+                time.sleep(.1)
+                record(("end", name, df.shape[0]))
+
+        def generated(name):
+            def factory():
+                record(("generate", name, None))
+                return 1
+            return factory
+
+        knockoff_db = KnockoffDB(database_service=SlowDatabaseService(),
+                                 max_workers=1,
+                                 chunksize=10,
+                                 max_queue_size=1)
+        parent = KnockoffTable("parent", columns=["id"], size=15,
+                               factories=[("id", generated("parent"))])
+        child = KnockoffTable("child", columns=["id"], size=25,
+                              factories=[("id", generated("child"))])
+        knockoff_db.add(parent)
+        knockoff_db.add(child, depends_on=["parent"])
+        knockoff_db.insert()
+
+        inserts = [(event, name, n) for event, name, n in events if event != "generate"]
+        assert inserts == [("start", "parent", 10), ("end", "parent", 10),
+                           ("start", "parent", 5), ("end", "parent", 5),
+                           ("start", "child", 10), ("end", "child", 10),
+                           ("start", "child", 10), ("end", "child", 10),
+                           ("start", "child", 5), ("end", "child", 5)]
+        # the parent is needed downstream, so its data is kept
+        assert parent.df.shape == (15, 1)
+        # the child is generated while the parent is being inserted
+        assert events.index(("generate", "child", None)) < events.index(("end", "parent", 5))
+
+    def test_knockoff_db_insert_error(self):
+        database_service = MagicMock()
+        database_service.insert.side_effect = ValueError("insert failed")
+
+        knockoff_db = KnockoffDB(database_service=database_service)
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE, insert=False)
+        with pytest.raises(ValueError):
+            knockoff_db.insert()
+        # the child is never scheduled
+        assert [c.args[0] for c in database_service.insert.call_args_list] == [PRODUCT_TABLE_NAME]
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_max_value(self, empty_db_with_sometable):
+        engine = create_engine(empty_db_with_sometable.url, future=True)
+        database_service = DefaultDatabaseService(engine=engine)
+        assert database_service.max_value(SOMETABLE, "id") is None
+
+        database_service.insert(SOMETABLE, pd.DataFrame({"id": [3, 9, 4]}))
+        assert database_service.max_value(SOMETABLE, "id") == 9
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_read_sample(self, empty_db_with_sometable):
+        engine = create_engine(empty_db_with_sometable.url, future=True)
+        database_service = DefaultDatabaseService(engine=engine)
+        database_service.insert(SOMETABLE, pd.DataFrame({"id": range(10)}))
+        df = database_service.read_sample(SOMETABLE, 4)
+        assert df.shape == (4, 7)
+
+    def test_pooled_engine(self):
+        database_service = DefaultDatabaseService(
+            url="postgresql://postgres@localhost:5432/postgres",
+            pool_size=2,
+            max_overflow=0
+        )
+        assert database_service.engine.pool.size() == 2
+        assert database_service.engine.pool._max_overflow == 0
+        assert database_service.url == "postgresql://postgres@localhost:5432/postgres"
+        database_service.dispose()
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_engine_is_reused(self, empty_db_with_sometable):
+        with DefaultDatabaseService(url=empty_db_with_sometable.url) as database_service:
+            with patch("knockoff.sdk.db.create_engine") as mock_db_create_engine, \
+                    patch("knockoff.utilities.io.create_engine") as mock_io_create_engine:
+                assert database_service.has_table(SOMETABLE)
+                database_service.reflect_schema(SOMETABLE)
+                database_service.reflect_unique_constraints(SOMETABLE)
+                database_service.insert(SOMETABLE,
+                                        pd.DataFrame({"id": range(10)}),
+                                        parallelize=False)
+                assert database_service.max_value(SOMETABLE, "id") == 9
+            mock_db_create_engine.assert_not_called()
+            mock_io_create_engine.assert_not_called()
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_writer_pool(self, empty_db_with_sometable):
+        database_service = DefaultDatabaseService(url=empty_db_with_sometable.url,
+                                                  max_writers=2,
+                                                  chunksize=10)
+        writer_pool = database_service.writer_pool
+        assert writer_pool.engine is database_service.engine
+        assert writer_pool is database_service.writer_pool
+        with patch("knockoff.utilities.io.create_engine") as mock_io_create_engine:
+            for i in range(3):
+                database_service.insert(SOMETABLE,
+                                        pd.DataFrame({"id": range(i*100, (i+1)*100)}))
+        mock_io_create_engine.assert_not_called()
+        assert list(writer_pool._tables) == [(SOMETABLE, None)]
+        assert database_service.max_value(SOMETABLE, "id") == 299
+        database_service.dispose()
+        assert database_service._writer_pool is None
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_bulk_reflection(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        with DefaultDatabaseService(url=url, bulk_reflect=False) as database_service:
+            expected_schema = database_service.reflect_schema(SOMETABLE)
+            expected_constraints = database_service.reflect_unique_constraints(SOMETABLE)
+
+        with DefaultDatabaseService(url=url) as database_service:
+            with patch.object(database_service, "_reflect_all",
+                              wraps=database_service._reflect_all) as mock_reflect_all:
+                schema = database_service.reflect_schema(SOMETABLE)
+                constraints = database_service.reflect_unique_constraints(SOMETABLE)
+                # new instances are returned since constraints are stateful
+                assert constraints[0] is not database_service.reflect_unique_constraints(SOMETABLE)[0]
+            mock_reflect_all.assert_called_once()
+
+        assert schema == expected_schema
+        assert ([(c.keys, c.name) for c in constraints] ==
+                [(c.keys, c.name) for c in expected_constraints])
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_reflection_cache_dir(self, empty_db_with_sometable, tmp_path):
+        url = empty_db_with_sometable.url
+        with DefaultDatabaseService(url=url, reflection_cache_dir=tmp_path) as database_service:
+            schema = database_service.reflect_schema(SOMETABLE)
+        assert len(os.listdir(tmp_path)) == 1
+
+        # a new service loads the reflection from disk
+        with DefaultDatabaseService(url=url, reflection_cache_dir=tmp_path) as database_service:
+            with patch.object(database_service, "_reflect_all") as mock_reflect_all:
+                assert database_service.reflect_schema(SOMETABLE) == schema
+            mock_reflect_all.assert_not_called()
+
+            # schema changes invalidate the cache
+            with database_service.engine.begin() as conn:
+                conn.execute(text("alter table sometable add column new_col int"))
+            database_service.clear_reflection_cache()
+            assert "new_col" in database_service.reflect_schema(SOMETABLE).columns
+        assert len(os.listdir(tmp_path)) == 2
+
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_load_mode(self, empty_db):
+        with DefaultDatabaseService(url=empty_db.url) as database_service:
+            with database_service.engine.begin() as conn:
+                conn.execute(text("create table parent (id int primary key)"))
+                conn.execute(text("create table child ("
+                                  "id int primary key, "
+                                  "parent_id int references parent (id), "
+                                  "name text)"))
+                conn.execute(text("create index ix_child_name on child (name)"))
+
+            with database_service.load_mode(tables=["child"]):
+                with database_service.engine.connect() as conn:
+                    # constraints are still checked by default
+                    assert conn.execute(text("show session_replication_role")).scalar() == "origin"
+                with pytest.raises(Exception, match="foreign key"):
+                    database_service.insert("child",
+                                            pd.DataFrame({"id": [0], "parent_id": [0], "name": ["a"]}),
+                                            parallelize=False)
+
+            with database_service.load_mode(tables=["child"], disable_constraints=True):
+                with database_service.engine.connect() as conn:
+                    assert inspect(conn).get_indexes("child") == []
+                # the foreign key isn't enforced while loading
+                database_service.insert("child",
+                                        pd.DataFrame({"id": [1, 2],
+                                                      "parent_id": [10, 20],
+                                                      "name": ["a", "b"]}))
+
+            with database_service.engine.connect() as conn:
+                assert [ix["name"] for ix in inspect(conn).get_indexes("child")] == ["ix_child_name"]
+                assert conn.execute(text("select last_analyze from pg_stat_user_tables "
+                                         "where relname = 'child'")).scalar() is not None
+                # settings don't leak outside of load mode
+                assert conn.execute(text("show session_replication_role")).scalar() == "origin"
+
+            with pytest.raises(Exception, match="foreign key"):
+                database_service.insert("child",
+                                        pd.DataFrame({"id": [3], "parent_id": [30], "name": ["c"]}),
+                                        parallelize=False)
+
+    def test_knockoff_db_load_mode(self):
+        database_service = MagicMock()
+        knockoff_db = KnockoffDB(database_service=database_service)
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE, insert=False)
+        knockoff_db.insert(load_mode=True)
+        database_service.load_mode.assert_called_once_with(tables=[PRODUCT_TABLE_NAME])
+
+        database_service.reset_mock()
+        knockoff_db.insert(load_mode={"disable_constraints": True})
+        database_service.load_mode.assert_called_once_with(tables=[PRODUCT_TABLE_NAME],
+                                                           disable_constraints=True)
+
+    def test_knockoff_db_truncate(self):
+        database_service = MagicMock()
+        knockoff_db = KnockoffDB(database_service=database_service)
+        knockoff_db.add(TRANSACTION_TABLE,
+                        depends_on=[PRODUCT_TABLE_NAME, LOCATION_TABLE_NAME])
+        knockoff_db.add(PRODUCT_TABLE)
+        knockoff_db.add(LOCATION_TABLE, insert=False)
+        knockoff_db.truncate()
+        database_service.truncate.assert_called_once_with(
+            [PRODUCT_TABLE_NAME, TRANSACTION_TABLE_NAME]
+        )
+
+    @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
+                        reason="postgres not available")
+    def test_truncate(self, empty_db):
+        with DefaultDatabaseService(url=empty_db.url) as database_service:
+            with database_service.engine.begin() as conn:
+                conn.execute(text("create table parent (id serial primary key)"))
+                conn.execute(text("create table child ("
+                                  "id int primary key, "
+                                  "parent_id int references parent (id))"))
+                conn.execute(text("insert into parent default values"))
+                conn.execute(text("insert into child values (1, 1)"))
+
+            database_service.truncate(["parent", "child"])
+            with database_service.engine.begin() as conn:
+                assert conn.execute(text("select count(*) from child")).scalar() == 0
+                # identities start over
+                assert conn.execute(text("insert into parent default values "
+                                         "returning id")).scalar() == 1
+
+
+class TestSqliteDatabaseService:
+
+    @pytest.mark.parametrize("url", ["sqlite://", None])
+    def test_insert(self, url):
+        generator = sqlite_setup_teardown(url)
+        temp_url = next(generator)
+        with create_engine(temp_url, future=True).begin() as conn:
+            Base.metadata.create_all(conn)
+
+        database_service = create_database_service(temp_url, ephemeral=True)
+        assert isinstance(database_service, SqliteDatabaseService)
+        with database_service:
+            with database_service.engine.connect() as conn:
+                assert conn.exec_driver_sql("pragma synchronous").scalar() == 0
+
+            table = KnockoffTable(SOMETABLE, autoload=True, size=100)
+            table.prepare(database_service=database_service)
+            database_service.insert(SOMETABLE, table.build(),
+                                    dtype={"json_col": JSON})
+            assert database_service.max_value(SOMETABLE, "id") is not None
+            assert database_service.read_sample(SOMETABLE, 200).shape == (100, 7)
+            assert database_service.read_table(SOMETABLE).shape == (100, 7)
+        next(generator, None)
+
+    def test_knockoff_db_insert(self):
+        generator = sqlite_setup_teardown("sqlite://")
+        url = next(generator)
+        with create_database_service(url) as database_service:
+            assert not database_service.supports_concurrent_writes
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table a (id int, value text)")
+                conn.exec_driver_sql("create table b (id int, value text)")
+            knockoff_db = KnockoffDB(database_service=database_service,
+                                     max_workers=4, chunksize=50)
+            # independent tables would be inserted concurrently
+            for name in ["a", "b"]:
+                ids = iter(range(1000))
+                knockoff_db.add(KnockoffTable(name, columns=["id", "value"], size=1000,
+                                              factories=[lambda ids=ids: {"id": next(ids),
+                                                                          "value": "x"}]))
+            knockoff_db.insert()
+            assert database_service.read_table("a").shape == (1000, 2)
+            assert database_service.read_table("b").shape == (1000, 2)
+        next(generator, None)
+
+    def test_private_memory_database(self):
+        with SqliteDatabaseService(url="sqlite://") as database_service:
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table t (id int)")
+            database_service.insert("t", pd.DataFrame({"id": range(10)}))
+            assert database_service.max_value("t", "id") == 9
+
+    def test_single_transaction(self):
+        with SqliteDatabaseService(url="sqlite://", chunksize=3) as database_service:
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table t (id int primary key)")
+            transactions = []
+            event.listen(database_service.engine, "begin", transactions.append)
+            database_service.insert("t", pd.DataFrame({"id": range(10)}))
+            assert len(transactions) == 1
+
+            # the last chunk fails so none of them are kept
+            with pytest.raises(Exception, match="UNIQUE"):
+                database_service.insert("t", pd.DataFrame({"id": [*range(10, 20), 0]}))
+            assert database_service.max_value("t", "id") == 9
+
+    def test_on_conflict(self):
+        with SqliteDatabaseService(url="sqlite://", chunksize=3) as database_service:
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table t (id int primary key, value text)")
+            database_service.insert("t", pd.DataFrame({"id": range(5), "value": "a"}))
+            df = pd.DataFrame({"id": range(10), "value": "b"})
+            with pytest.raises(Exception, match="UNIQUE"):
+                database_service.insert("t", df)
+
+            database_service.insert("t", df, on_conflict="ignore")
+            with database_service.engine.connect() as conn:
+                assert conn.exec_driver_sql(
+                    "select value, count(*) from t group by value order by value"
+                ).fetchall() == [("a", 5), ("b", 5)]
+
+            knockoff_db = KnockoffDB(database_service=database_service)
+            ids = iter(range(10))
+            table = KnockoffTable("t", columns=["id", "value"], size=10,
+                                  factories=[lambda: {"id": next(ids), "value": "c"}])
+            knockoff_db.add(table, on_conflict="update")
+            knockoff_db.insert()
+            with database_service.engine.connect() as conn:
+                assert conn.exec_driver_sql(
+                    "select value, count(*) from t group by value"
+                ).fetchall() == [("c", 10)]
+
+    def test_truncate(self):
+        with SqliteDatabaseService(url="sqlite://") as database_service:
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table parent "
+                                     "(id integer primary key autoincrement)")
+                conn.exec_driver_sql("create table child ("
+                                     "id int primary key, "
+                                     "parent_id int references parent (id))")
+                conn.exec_driver_sql("insert into parent default values")
+                conn.exec_driver_sql("insert into child values (1, 1)")
+            child = database_service.reflect_table("child")
+
+            # children are deleted before the rows they reference
+            database_service.truncate(["parent", "child"])
+            # the schema is unchanged so its reflection is kept
+            assert database_service.reflect_table("child") is child
+            with database_service.engine.begin() as conn:
+                assert conn.exec_driver_sql("select count(*) from child").scalar() == 0
+                conn.exec_driver_sql("insert into parent default values")
+                assert conn.exec_driver_sql("select id from parent").scalar() == 1
+
+    def test_autotune(self):
+        with SqliteDatabaseService(url="sqlite://",
+                                   method="autotune") as database_service:
+            with database_service.engine.begin() as conn:
+                conn.exec_driver_sql("create table t (id int, value text)")
+            # too few rows to probe
+            database_service.insert("t", pd.DataFrame({"id": [0], "value": ["a"]}))
+            assert database_service.autotune_report == {}
+
+            df = pd.DataFrame({"id": range(1, 1001), "value": "a"})
+            database_service.insert("t", df)
+            report = database_service.autotune_report["t"]
+            assert report["method"] in ("executemany", "multi")
+            assert set(report["rows_per_second"]) == {"executemany", "multi"}
+            assert report["chunksize"] > 0
+
+            database_service.insert("t", pd.DataFrame({"id": [1001], "value": ["a"]}))
+            with database_service.engine.connect() as conn:
+                ids = [row[0] for row in conn.exec_driver_sql("select id from t order by id")]
+            # every row is inserted exactly once
+            assert ids == list(range(1002))
+
+    def test_autotune_concurrent(self):
+        probing = threading.Event()
+        release = threading.Event()
+
+        def probe_insert_methods(df, name, engine, methods, **kwargs):
+            if name == "a":
+                probing.set()
+                release.wait(5)
+            return "multi", {"multi": 1.0}, 1
+
+        df = pd.DataFrame({"id": range(10)})
+        with SqliteDatabaseService(url="sqlite://",
+                                   method="autotune") as database_service, \
+                patch("knockoff.sdk.db.probe_insert_methods",
+                      side_effect=probe_insert_methods):
+            thread = threading.Thread(target=database_service._autotune,
+                                      args=("a", df, {}))
+            thread.start()
+            try:
+                assert probing.wait(5)
+                # other tables are probed while "a" is, and inserts
+                # into "a" use the default method in the meantime
+                assert database_service._autotune("b", df, {})[0] == "multi"
+                method, rows = database_service._autotune("a", df, {})
+                assert method is None
+                assert rows is df
+            finally:
+                release.set()
+                thread.join()
+            assert database_service._autotune("a", df, {})[0] == "multi"
+            assert set(database_service.autotune_report) == {"a", "b"}
+
+    def test_create_database_service(self):
+        database_service = create_database_service(
+            "postgresql://postgres@localhost:5432/postgres",
+            ephemeral=True
+        )
+        assert type(database_service) is DefaultDatabaseService
+        database_service.dispose()
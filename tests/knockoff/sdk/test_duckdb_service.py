@@ -0,0 +1,138 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import datetime
+
+import pytest
+import pandas as pd
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.types import JSON
+
+from knockoff.sdk.db import KnockoffDB, create_database_service
+from knockoff.sdk.table import KnockoffTable
+
+duckdb = pytest.importorskip("duckdb")
+
+from knockoff.sdk.duckdb_service import DuckDBDatabaseService  # noqa: E402
+
+
+@pytest.fixture(scope="function")
+def database_service():
+    with create_database_service("duckdb:///:memory:") as database_service:
+        database_service.connection.execute(
+            "create table sometable ("
+            "id bigint primary key, "
+            "str_col varchar, "
+            "dt_col timestamp, "
+            "json_col json, "
+            "bool_col boolean, "
+            "unique (str_col, dt_col))"
+        )
+        yield database_service
+
+
+class TestDuckDBDatabaseService:
+
+    def test_create_database_service(self, database_service):
+        assert isinstance(database_service, DuckDBDatabaseService)
+        assert not database_service.supports_concurrent_writes
+        # e.g. the container's database_service config
+        with create_database_service("duckdb:///:memory:",
+                                     ephemeral=True,
+                                     pool_size=5,
+                                     max_overflow=10,
+                                     pool_pre_ping=True,
+                                     pool_recycle=3600,
+                                     reflection_cache_dir=None) as other:
+            assert isinstance(other, DuckDBDatabaseService)
+
+    def test_reflect(self, database_service):
+        assert database_service.has_table("sometable")
+        assert not database_service.has_table("othertable")
+
+        schema = database_service.reflect_schema("sometable")
+        assert schema.columns == ["id", "str_col", "dt_col", "json_col", "bool_col"]
+        assert schema.dtype == {"id": int,
+                                "str_col": str,
+                                "dt_col": datetime.datetime,
+                                "json_col": dict,
+                                "bool_col": bool}
+
+        constraints = database_service.reflect_unique_constraints("sometable")
+        assert [c.keys for c in constraints] == [["id"], ["str_col", "dt_col"]]
+
+        with pytest.raises(NoSuchTableError):
+            database_service.reflect_table("othertable")
+
+    def test_insert(self, database_service):
+        df = pd.DataFrame({"id": [1, 2, 3],
+                           "json_col": [{"a": 1}, None, {}]})
+        database_service.insert("sometable", df, dtype={"json_col": JSON})
+        assert database_service.max_value("sometable", "id") == 3
+
+        df_actual = database_service.read_sample("sometable", 10)
+        assert df_actual.shape == (3, 5)
+        assert df_actual["json_col"].tolist() == ['{"a": 1}', None, '{}']
+        assert database_service.read_table("sometable")["id"].tolist() == [1, 2, 3]
+
+    def test_knockoff_db_insert(self, database_service):
+        knockoff_db = KnockoffDB(database_service)
+        knockoff_db.add(KnockoffTable("sometable", autoload=True, size=100))
+        knockoff_db.insert()
+        assert database_service.read_sample("sometable", 200).shape == (100, 5)
+
+    def test_truncate(self, database_service):
+        database_service.connection.execute(
+            "create table child (id bigint, sometable_id bigint references sometable (id))"
+        )
+        database_service.insert("sometable", pd.DataFrame({"id": [1, 2]}))
+        database_service.insert("child", pd.DataFrame({"id": [1], "sometable_id": [1]}))
+        database_service.truncate(["sometable", "child"])
+        assert database_service.read_sample("sometable", 10).empty
+        assert database_service.read_sample("child", 10).empty
+
+    def test_insert_on_conflict(self, database_service):
+        df = pd.DataFrame({"id": [1, 2], "str_col": ["a", "b"]})
+        database_service.insert("sometable", df)
+        updated = pd.DataFrame({"id": [2, 3], "str_col": ["c", "d"]})
+        database_service.insert("sometable", updated, on_conflict="ignore")
+        assert database_service.read_table("sometable")["str_col"].tolist() == ["a", "b", "d"]
+        database_service.insert("sometable", updated, on_conflict="update")
+        assert database_service.read_table("sometable")["str_col"].tolist() == ["a", "c", "d"]
+        with pytest.raises(ValueError):
+            database_service.insert("sometable", updated, on_conflict="replace")
+
+    def test_knockoff_db_insert_on_conflict(self):
+        with create_database_service("duckdb:///:memory:",
+                                     on_conflict="ignore") as database_service:
+            database_service.connection.execute(
+                "create table t (id bigint primary key, value varchar)"
+            )
+            database_service.insert("t", pd.DataFrame({"id": [1], "value": ["a"]}))
+            knockoff_db = KnockoffDB(database_service)
+            knockoff_db.add(KnockoffTable("t", columns=["id", "value"],
+                                          factories=[("id", lambda: 1),
+                                                     ("value", lambda: "b")],
+                                          size=1))
+            # the service's default
+            knockoff_db.insert()
+            assert database_service.read_table("t")["value"].tolist() == ["a"]
+
+            knockoff_db = KnockoffDB(database_service)
+            knockoff_db.add(KnockoffTable("t", columns=["id", "value"],
+                                          factories=[("id", lambda: 1),
+                                                     ("value", lambda: "b")],
+                                          size=1),
+                            on_conflict="update")
+            knockoff_db.insert()
+            assert database_service.read_table("t")["value"].tolist() == ["b"]
+
+    def test_unsupported_options(self):
+        with pytest.raises(TypeError, match="max_writers"):
+            DuckDBDatabaseService(max_writers=4)
+        with pytest.raises(ValueError):
+            DuckDBDatabaseService(on_conflict="replace")
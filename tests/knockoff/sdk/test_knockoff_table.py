@@ -99,6 +99,20 @@ class TestKnockoffTable(object):
         assert len(set(zip(df.col1, df.col2))) == 15
         assert len(set(df.col3)) == 15
 
+    def test_iter_build(self):
+        table = KnockoffTable(SOMETABLE, size=25,
+                              columns=["col1", "col2"],
+                              constraints=[KnockoffUniqueConstraint(['col1'])],
+                              factories=[("col1", FakerFactory("pyint",
+                                                               min_value=0,
+                                                               max_value=100))],
+                              rename={"col2": "renamed"})
+        chunks = list(table.iter_build(10))
+        assert [chunk.shape for chunk in chunks] == [(10, 2), (10, 2), (5, 2)]
+        assert list(chunks[0].columns) == ["col1", "renamed"]
+        # unique constraints are enforced across chunks
+        assert pd.concat(chunks)["col1"].is_unique
+
     @pytest.mark.skipif(not TEST_POSTGRES_ENABLED,
                     reason="postgres not available")
     def test_unique_constraint_reflection(self, empty_db_with_tbl, knockoff_db):
@@ -0,0 +1,110 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from knockoff.sdk.profile import TableProfile, profile_column, StringFactory
+
+
+@pytest.fixture(scope="function")
+def sample_df():
+    rng = np.random.default_rng(1)
+    size = 1000
+    price = rng.lognormal(3, .5, size=size)
+    price[rng.random(size) < .1] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(size),
+        "status": rng.choice(["new", "shipped", "returned"], p=[.2, .7, .1], size=size),
+        "price": price,
+        "name": ["".join(rng.choice(list("xyz"), size=n)) for n in rng.integers(3, 8, size=size)],
+        "created": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 10**6, size=size), unit="s"),
+        "is_active": rng.random(size) < .5,
+        "attributes": [{}]*size,
+    })
+
+
+class TestProfile(object):
+
+    def test_profile_column_categorical(self):
+        profile = profile_column(pd.Series(["a", "a", "b", None]))
+        assert profile["kind"] == "categorical"
+        assert profile["values"] == ["a", "b"]
+        assert profile["weights"] == [2, 1]
+        assert profile["null_rate"] == .25
+
+    def test_profile_column_unhashable(self):
+        assert profile_column(pd.Series([{}, {"a": 1}])) is None
+
+    def test_fit_and_generate(self, sample_df):
+        profile = TableProfile.fit(sample_df, name="orders", max_categories=10)
+        assert set(profile.columns) == set(sample_df.columns) - {"attributes"}
+        assert profile.columns["id"]["kind"] == "numeric"
+        assert profile.columns["status"]["kind"] == "categorical"
+        assert profile.columns["name"]["kind"] == "string"
+        assert profile.columns["created"]["kind"] == "datetime"
+
+        df = profile.factory(seed=1)(size=10000)
+        assert df.shape == (10000, 6)
+        assert df["id"].between(0, 999).all()
+        assert set(df["status"]) == {"new", "shipped", "returned"}
+        assert abs((df["status"] == "shipped").mean() - .7) < .05
+        assert abs(df["price"].isnull().mean() - .1) < .02
+        assert df["name"].str.len().between(3, 7).all()
+        assert set("".join(df["name"])) == {"x", "y", "z"}
+        assert df["created"].dtype == np.dtype("datetime64[ns]")
+        assert df["created"].min() >= sample_df["created"].min()
+        assert df["is_active"].dtype == bool
+
+    def test_seed(self, sample_df):
+        profile = TableProfile.fit(sample_df)
+        df1 = profile.factory(seed=3)(size=100)
+        df2 = profile.factory(seed=3)(size=100)
+        pd.testing.assert_frame_equal(df1, df2)
+
+    def test_save_and_load(self, sample_df, tmp_path):
+        profile = TableProfile.fit(sample_df, name="orders")
+        path = os.path.join(tmp_path, "orders.json")
+        profile.save(path)
+        loaded = TableProfile.load(path)
+        assert loaded.name == "orders"
+        assert loaded.size == 1000
+        assert loaded.columns == profile.columns
+        pd.testing.assert_frame_equal(loaded.factory(seed=3)(size=100),
+                                      profile.factory(seed=3)(size=100))
+
+    def test_knockoff_table(self, sample_df):
+        table = TableProfile.fit(sample_df, name="orders").knockoff_table(size=20)
+        df = table.build()
+        assert table.name == "orders"
+        assert df.shape == (20, 6)
+
+    def test_from_database(self, sample_df):
+        database_service = MagicMock()
+        database_service.read_sample.return_value = sample_df
+        profile = TableProfile.from_database(database_service, "orders",
+                                             sample_size=500)
+        database_service.read_sample.assert_called_once_with("orders", 500)
+        assert profile.name == "orders"
+
+    def test_from_sql(self, sample_df):
+        with patch("knockoff.sdk.profile.read_sql",
+                   return_value=sample_df) as mock_read_sql:
+            profile = TableProfile.from_sql("select * from orders", "default",
+                                            name="orders")
+        mock_read_sql.assert_called_once_with("select * from orders", "default")
+        assert profile.size == 1000
+
+    def test_string_factory(self):
+        factory = StringFactory([2, 4], [1, 1], "ab", [1, 1], seed=1)
+        values = factory(size=100)
+        assert set(map(len, values)) == {2, 4}
+        assert set("".join(values)) == {"a", "b"}
@@ -0,0 +1,54 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import pytest
+
+from knockoff.exceptions import CyclicDependencyError
+from knockoff.utilities.dag import Dag
+
+
+@pytest.fixture(scope="function")
+def dag():
+    dag = Dag()
+    dag.add_edges_from([("a", "c"), ("b", "c"), ("c", "d"), ("a", "d")])
+    dag.add_node("e")
+    return dag
+
+
+class TestDag:
+
+    def test_order(self, dag):
+        assert len(dag) == 5
+        assert "e" in dag
+        assert dag.levels() == [("a", "b", "e"), ("c",), ("d",)]
+        assert dag.topological_sort() == ["a", "b", "e", "c", "d"]
+        assert dag.predecessors("d") == ["c", "a"]
+        assert dag.successors("a") == ["c", "d"]
+
+    def test_cache_invalidation(self, dag):
+        assert dag.topological_sort()[-1] == "d"
+        dag.add_edge("d", "f")
+        assert dag.topological_sort()[-1] == "f"
+        # duplicate edges are ignored
+        dag.add_edge("d", "f")
+        assert dag.edges.count(("d", "f")) == 1
+
+    def test_ready(self, dag):
+        assert dag.ready(set()) == ["a", "b", "e"]
+        assert dag.ready({"a", "e"}) == ["b"]
+        assert dag.ready({"a", "b", "e"}) == ["c"]
+        assert dag.ready({"a", "b", "c", "e"}) == ["d"]
+
+    def test_ancestors(self, dag):
+        assert dag.ancestors(["d"]) == {"a", "b", "c"}
+        assert dag.ancestors(["c", "e"]) == {"a", "b"}
+        assert dag.ancestors(["a"]) == set()
+
+    def test_cycle(self, dag):
+        dag.add_edge("d", "b")
+        with pytest.raises(CyclicDependencyError, match="b"):
+            dag.topological_sort()
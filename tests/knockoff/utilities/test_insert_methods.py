@@ -0,0 +1,342 @@
+# Copyright 2021-present, Nike, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the Apache-2.0 license found in
+# the LICENSE file in the root directory of this source tree.
+
+
+import re
+import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String
+from sqlalchemy.dialects import postgresql, mysql, sqlite
+from sqlalchemy.types import JSON
+
+from knockoff.sdk.db import DefaultDatabaseService
+from knockoff.utilities.io import to_sql
+from knockoff.utilities.insert_methods import (copy_insert,
+                                               load_data_insert,
+                                               executemany_insert,
+                                               format_copy_value,
+                                               format_array_value,
+                                               format_load_data_value,
+                                               load_data_connect_args,
+                                               resolve_insert_method,
+                                               conflict_statement,
+                                               ConflictInsert)
+from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
+
+from tests.knockoff.data_model import SOMETABLE
+from tests.knockoff.utilities.test_io import get_sometable_df
+
+
+class TestInsertMethods:
+
+    @pytest.mark.parametrize("value,expected", [
+        (None, "\\N"),
+        ("a\tb\nc\\d\re", "a\\tb\\nc\\\\d\\re"),
+        ("\\N", "\\\\N"),
+        ({"a": [1, None]}, '{"a": [1, null]}'),
+        ({"a": "x\ty"}, '{"a": "x\\\\ty"}'),
+        (datetime.datetime(2021, 1, 2, 3, 4, 5), "2021-01-02T03:04:05"),
+        (datetime.date(2021, 1, 2), "2021-01-02"),
+        (True, "True"),
+        (1.5, "1.5"),
+        (b"\x01\xff", "\\\\x01ff"),
+    ])
+    def test_format_copy_value(self, value, expected):
+        assert format_copy_value(value) == expected
+
+    @pytest.mark.parametrize("value,expected", [
+        ([], "{}"),
+        (["a", "b"], '{"a","b"}'),
+        (['q"uote', "back\\slash", "a,b", "{}"],
+         '{"q\\"uote","back\\\\slash","a,b","{}"}'),
+        ([None, "NULL"], '{NULL,"NULL"}'),
+        ([[1, 2], [3, None]], '{{"1","2"},{"3",NULL}}'),
+        ([datetime.date(2021, 1, 2)], '{"2021-01-02"}'),
+    ])
+    def test_format_array_value(self, value, expected):
+        assert format_array_value(value) == expected
+
+    @pytest.mark.parametrize("method,dialect,expected", [
+        ("auto", "postgresql", copy_insert),
+        ("auto", "mysql", executemany_insert),
+        ("auto", "sqlite", None),
+        ("auto", "oracle", "multi"),
+        ("executemany", "mysql", executemany_insert),
+        ("copy", "postgresql", copy_insert),
+        ("multi", "postgresql", "multi"),
+        (None, "postgresql", None),
+    ])
+    def test_resolve_insert_method(self, method, dialect, expected):
+        assert resolve_insert_method(method, dialect) == expected
+
+    def test_resolve_insert_method_local_infile(self):
+        assert resolve_insert_method("auto", "mysql", local_infile=True) == load_data_insert
+
+    @pytest.mark.parametrize("value,expected", [
+        (None, "\\N"),
+        (True, "1"),
+        (datetime.datetime(2021, 1, 2, 3, 4, 5), "2021-01-02 03:04:05"),
+        ("a\tb", "a\\tb"),
+    ])
+    def test_format_load_data_value(self, value, expected):
+        assert format_load_data_value(value) == expected
+
+
+def get_conflict_table():
+    return Table("t", MetaData(),
+                 Column("id", Integer, primary_key=True),
+                 Column("value", String(10)))
+
+
+class TestConflictStatement:
+
+    @pytest.mark.parametrize("dialect,on_conflict,expected", [
+        (postgresql, "ignore", "ON CONFLICT DO NOTHING"),
+        (postgresql, "update", "ON CONFLICT (id) DO UPDATE SET value = excluded.value"),
+        (sqlite, "update", "ON CONFLICT (id) DO UPDATE SET value = excluded.value"),
+        (mysql, "ignore", "INSERT IGNORE INTO t"),
+        (mysql, "update", "ON DUPLICATE KEY UPDATE value = VALUES(value)"),
+    ])
+    def test_conflict_statement(self, dialect, on_conflict, expected):
+        statement = conflict_statement(get_conflict_table(), ["id", "value"],
+                                       dialect.dialect.name, on_conflict)
+        sql = str(statement.compile(dialect=dialect.dialect()))
+        assert expected in sql
+
+    def test_conflict_statement_nothing_to_update(self):
+        statement = conflict_statement(get_conflict_table(), ["id"],
+                                       "postgresql", "update")
+        assert "DO NOTHING" in str(statement.compile(dialect=postgresql.dialect()))
+
+    def test_conflict_statement_unsupported(self):
+        with pytest.raises(ValueError):
+            conflict_statement(get_conflict_table(), ["id"], "mssql", "ignore")
+        with pytest.raises(ValueError):
+            ConflictInsert("replace")
+
+
+class FakeMySQLCursor:
+    """records the statements a mysql insertion method executes"""
+    def __init__(self, local_infile=1, fail_load_data=False):
+        self.variables = {"local_infile": local_infile,
+                          "max_allowed_packet": 64*1024*1024}
+        self.fail_load_data = fail_load_data
+        self.max_stmt_length = 1024000
+        self.loaded = None
+        self.executemany_args = None
+
+    def execute(self, sql):
+        if sql.startswith("select @@"):
+            self.result = self.variables[sql[len("select @@"):]]
+        elif sql.startswith("LOAD DATA"):
+            if self.fail_load_data:
+                raise self.dbapi.err.OperationalError(3948, "Loading local data is disabled")
+            path = re.search("INFILE '(.*?)'", sql).group(1)
+            with open(path) as f:
+                self.loaded = f.read()
+
+    def fetchone(self):
+        return (self.result,)
+
+    def executemany(self, sql, rows):
+        self.executemany_args = (sql, rows)
+
+    def close(self):
+        pass
+
+
+class TestMySQLInsertMethods:
+
+    def get_conn(self, cursor):
+        pymysql = pytest.importorskip("pymysql")
+        cursor.dbapi = pymysql
+        conn = MagicMock()
+        conn.dialect = create_engine("mysql+pymysql://root@localhost:3306/mysql").dialect
+        conn.connection.cursor.return_value = cursor
+        return conn
+
+    def test_load_data(self):
+        cursor = FakeMySQLCursor()
+        rows = [(1, "a\tb", None, {"x": 1}), (2, "c", True, None)]
+        nrows = load_data_insert(SimpleNamespace(name="sometable", schema=None),
+                                 self.get_conn(cursor),
+                                 ["id", "str_col", "bool_col", "json_col"],
+                                 iter(rows))
+        assert nrows == 2
+        assert cursor.loaded == '1\ta\\tb\t\\N\t{"x": 1}\n2\tc\t1\t\\N\n'
+        assert cursor.executemany_args is None
+
+    @pytest.mark.parametrize("cursor", [
+        FakeMySQLCursor(local_infile=0),
+        FakeMySQLCursor(fail_load_data=True),
+    ])
+    def test_load_data_fallback(self, cursor):
+        rows = [(1, {"x": 1}), (2, None)]
+        nrows = load_data_insert(SimpleNamespace(name="sometable", schema=None),
+                                 self.get_conn(cursor),
+                                 ["id", "json_col"],
+                                 iter(rows))
+        assert nrows == 2
+        assert cursor.loaded is None
+        sql, actual = cursor.executemany_args
+        assert sql == "INSERT INTO sometable (id, json_col) VALUES (%s, %s)"
+        assert actual == [(1, '{"x": 1}'), (2, None)]
+        assert cursor.max_stmt_length == 64*1024*1024 - 16*1024
+
+    def test_server_variables_cached(self):
+        cursor = FakeMySQLCursor()
+        queries = []
+        execute = cursor.execute
+
+        def record(sql):
+            queries.append(sql)
+            execute(sql)
+
+        cursor.execute = record
+        conn = self.get_conn(cursor)
+        for _ in range(2):
+            executemany_insert(SimpleNamespace(name="sometable", schema=None),
+                               conn, ["id"], iter([(1,), (2,)]))
+        assert queries == ["select @@max_allowed_packet"]
+
+    @pytest.mark.parametrize("url,expected", [
+        ("mysql://root@localhost/db", {"local_infile": True}),
+        ("mysql+pymysql://root@localhost/db", {"local_infile": True}),
+        ("mariadb+mysqlconnector://root@localhost/db", {"allow_local_infile": True}),
+        ("postgresql://postgres@localhost/db", {}),
+        ("sqlite://", {}),
+    ])
+    def test_load_data_connect_args(self, url, expected):
+        assert load_data_connect_args(url) == expected
+
+    @pytest.mark.parametrize("kwargs,expected_method,local_infile", [
+        ({}, executemany_insert, None),
+        ({"local_infile": True}, load_data_insert, True),
+        ({"method": "load_data"}, load_data_insert, True),
+    ])
+    def test_database_service_local_infile(self, monkeypatch, kwargs,
+                                           expected_method, local_infile):
+        pymysql = pytest.importorskip("pymysql")
+        connect_kwargs = {}
+
+        def connect(*args, **kwargs):
+            connect_kwargs.update(kwargs)
+            raise pymysql.err.OperationalError(2003, "no server")
+
+        monkeypatch.setattr(pymysql, "connect", connect)
+        database_service = DefaultDatabaseService(url="mysql+pymysql://root@localhost/db",
+                                                  **kwargs)
+        with pytest.raises(Exception):
+            database_service.engine.connect()
+        assert connect_kwargs.get("local_infile") is local_infile
+        assert database_service.kwargs["method"] == expected_method
+
+
+@pytest.mark.skipif(
+    not TEST_POSTGRES_ENABLED,
+    reason="postgres not available"
+)
+class TestCopyInsert:
+
+    def test_copy_insert(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        df = get_sometable_df(1000)
+        df.loc[::3, "str_col"] = None
+        df.at[1, "str_col"] = "t\tn\nb\\"
+        df.at[2, "json_col"] = {"quote": "\"", "tab": "\t"}
+        to_sql(
+            df,
+            SOMETABLE,
+            url,
+            chunksize=100,
+            method=copy_insert,
+            dtype={'json_col': JSON}
+        )
+
+        with create_engine(url, future=True).connect() as conn:
+            df_actual = pd.read_sql_table(SOMETABLE, conn)
+
+        df = df.sort_values(by='id').reset_index(drop=True)
+        df_actual = df_actual.sort_values(by='id').reset_index(drop=True)
+        assert df.equals(df_actual)
+
+    def test_array_columns(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        engine = create_engine(url, future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE arraytable "
+                                 "(id int, tags text[], points int[], doc json)")
+        tags = [["a", "b"], ['q"uote', "back\\slash", "t\tab", None], [], None]
+        df = pd.DataFrame({"id": range(4),
+                           "tags": tags,
+                           "points": [[1, 2], [3], None, [None]],
+                           "doc": [["a", "b"], None, [1], ["x\ty"]]})
+        with DefaultDatabaseService(url=url) as database_service:
+            database_service.insert("arraytable", df)
+            df_actual = database_service.read_table("arraytable")
+        df_actual = df_actual.sort_values(by="id").reset_index(drop=True)
+        assert df_actual["tags"].tolist() == tags
+        assert df_actual["points"].tolist() == [[1, 2], [3], None, [None]]
+        # lists in json columns are still json
+        assert df_actual["doc"].tolist() == [["a", "b"], None, [1], ["x\ty"]]
+
+    @pytest.mark.parametrize("method", ["copy", "multi"])
+    def test_array_columns_writer_pool(self, empty_db_with_sometable, method):
+        url = empty_db_with_sometable.url
+        engine = create_engine(url, future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE arraytable "
+                                 "(id int, tags text[], doc json)")
+        engine.dispose()
+        tags = [["a", str(i)] if i % 3 else None for i in range(50)]
+        docs = [[i] for i in range(50)]
+        df = pd.DataFrame({"id": range(50), "tags": tags, "doc": docs})
+        # chunks of 10 rows are written by the service's WriterPool,
+        # whose reflected table is used to find the ARRAY columns
+        with DefaultDatabaseService(url=url, chunksize=10,
+                                    method=method) as database_service, \
+                patch("knockoff.utilities.insert_methods.inspect") as mock_inspect:
+            database_service.insert("arraytable", df, dtype={"doc": JSON})
+            assert database_service._writer_pool is not None
+            mock_inspect.assert_not_called()
+            df_actual = database_service.read_table("arraytable")
+        df_actual = df_actual.sort_values(by="id").reset_index(drop=True)
+        assert df_actual["tags"].tolist() == tags
+        assert df_actual["doc"].tolist() == docs
+
+    def test_database_service_uses_copy(self, empty_db_with_sometable):
+        with DefaultDatabaseService(url=empty_db_with_sometable.url) as database_service:
+            assert database_service.kwargs['method'] is copy_insert
+            df = pd.DataFrame({"id": range(10),
+                               "str_col": [None] + ["x"]*9})
+            database_service.insert(SOMETABLE, df)
+            assert database_service.max_value(SOMETABLE, "id") == 9
+
+    def test_on_conflict(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        df = get_sometable_df(100)
+        with DefaultDatabaseService(url=url, chunksize=10) as database_service:
+            database_service.insert(SOMETABLE, df[:50], dtype={'json_col': JSON})
+            df = df.copy()
+            df["float_col"] = 1.5
+            # parallelized through the service's writer pool
+            database_service.insert(SOMETABLE, df, dtype={'json_col': JSON},
+                                    on_conflict="ignore")
+            with database_service.engine.connect() as conn:
+                df_actual = pd.read_sql_table(SOMETABLE, conn)
+            assert df_actual.shape[0] == 100
+            assert (df_actual["float_col"] == 1.5).sum() == 50
+
+            database_service.insert(SOMETABLE, df, dtype={'json_col': JSON},
+                                    on_conflict="update")
+            with database_service.engine.connect() as conn:
+                df_actual = pd.read_sql_table(SOMETABLE, conn)
+            assert df_actual.shape[0] == 100
+            assert (df_actual["float_col"] == 1.5).all()
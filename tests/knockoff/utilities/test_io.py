@@ -1,12 +1,18 @@
+from unittest.mock import patch
+
 import pytest
 import pandas as pd
 from sqlalchemy.types import JSON
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, Table
+from sqlalchemy.exc import IntegrityError
 
 from knockoff.sdk.table import KnockoffTable
 from knockoff.sdk.constraints import KnockoffUniqueConstraint
 from knockoff.utilities.testing.postgresql import TEST_POSTGRES_ENABLED
-from knockoff.utilities.io import to_sql
+from knockoff.utilities.io import (to_sql, auto_chunksize, probe_insert_methods,
+                                   WriterPool, MAX_CHUNKSIZE, MAX_PARAMETERS)
+from knockoff.utilities.insert_methods import copy_insert
+from knockoff.utilities import timing
 
 from tests.knockoff.data_model import SomeTable, SOMETABLE
 
@@ -22,6 +28,77 @@ def get_sometable_df(size):
     ).build()
 
 
+class TestChunksize:
+
+    def test_auto_chunksize(self):
+        # narrow tables are capped
+        assert auto_chunksize(1, "postgresql", method=copy_insert) == MAX_CHUNKSIZE
+        # wider tables get fewer rows per chunk
+        assert auto_chunksize(100, "postgresql", method=copy_insert) == 10000
+
+    def test_auto_chunksize_multi(self):
+        for dialect_name, max_parameters in MAX_PARAMETERS.items():
+            for ncols in (1, 7, 300):
+                chunksize = auto_chunksize(ncols, dialect_name, method="multi")
+                assert chunksize * ncols <= max_parameters
+        assert auto_chunksize(10**6, "mssql", method="multi") == 1
+
+    def test_to_sql_auto_chunksize(self):
+        engine = create_engine("sqlite://", future=True)
+        df = pd.DataFrame({"id": range(10), "value": "a"})
+        with patch("knockoff.utilities.io._to_sql") as mock_to_sql, \
+                patch("knockoff.utilities.io.auto_chunksize",
+                      return_value=3) as mock_auto_chunksize:
+            to_sql(df, "t", None, parallelize=False, engine=engine)
+        mock_auto_chunksize.assert_called_once_with(2, "sqlite", "multi")
+        mock_to_sql.assert_called_once()
+        engine.dispose()
+
+
+class TestWriterPool:
+
+    def test_write(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/test.db", future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("create table t (id int, value text, attrs json)")
+        df = pd.DataFrame({"id": range(100),
+                           "value": ["a", None] * 50,
+                           "attrs": [{"a": 1}] * 100})
+        with patch("knockoff.utilities.io.Table",
+                   wraps=Table) as mock_table, \
+                WriterPool(engine, max_workers=4) as pool:
+            pool.write(df[:50], "t", chunksize=10)
+            pool.write(df[50:], "t", chunksize=10)
+        # reflected once for all chunks
+        mock_table.assert_called_once()
+
+        with engine.connect() as conn:
+            df_actual = pd.read_sql_query("select * from t order by id", conn)
+        assert list(df_actual["id"]) == list(range(100))
+        assert df_actual["value"].isnull().sum() == 50
+        assert df_actual["attrs"][0] == '{"a": 1}'
+        engine.dispose()
+
+    def test_write_timing(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/test.db", future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("create table t (id int)")
+        with WriterPool(engine, max_workers=2) as pool, timing.collect() as timer:
+            pool.write(pd.DataFrame({"id": range(100)}), "t", chunksize=10)
+        # collected from the writer threads
+        assert timer.seconds[timing.SERIALIZATION] > 0
+        engine.dispose()
+
+    def test_write_error(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/test.db", future=True)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("create table t (id int not null)")
+        with WriterPool(engine, max_workers=2) as pool:
+            with pytest.raises(IntegrityError):
+                pool.write(pd.DataFrame({"id": [1, None]}), "t", chunksize=1)
+        engine.dispose()
+
+
 @pytest.mark.skipif(
     not TEST_POSTGRES_ENABLED,
     reason="postgres not available"
@@ -68,3 +145,84 @@ class TestIO:
         df = df.sort_values(by='id').reset_index(drop=True)
         df_actual = df_actual.sort_values(by='id').reset_index(drop=True)
         assert df.equals(df_actual)
+
+    def test_to_sql_engine_per_worker(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        df = get_sometable_df(1000)
+        with patch("knockoff.utilities.io.create_engine",
+                   wraps=create_engine) as mock_create_engine:
+            to_sql(
+                df,
+                SOMETABLE,
+                url,
+                chunksize=100,
+                n_jobs=1,
+                dtype={'json_col': JSON}
+            )
+        # all 10 chunks are written with a single engine
+        mock_create_engine.assert_called_once()
+
+        with create_engine(url, future=True).connect() as conn:
+            df_actual = pd.read_sql_table(
+                SOMETABLE,
+                conn
+            )
+        assert df_actual.shape[0] == 1000
+
+    def test_to_sql_engine(self, empty_db_with_sometable):
+        engine = create_engine(empty_db_with_sometable.url, future=True)
+        df = get_sometable_df(100)
+        with patch("knockoff.utilities.io.create_engine") as mock_create_engine:
+            to_sql(
+                df,
+                SOMETABLE,
+                None,
+                parallelize=False,
+                engine=engine,
+                dtype={'json_col': JSON}
+            )
+        mock_create_engine.assert_not_called()
+        with engine.connect() as conn:
+            assert pd.read_sql_table(SOMETABLE, conn).shape[0] == 100
+        engine.dispose()
+
+    def test_probe_insert_methods(self, empty_db_with_sometable):
+        engine = create_engine(empty_db_with_sometable.url, future=True)
+        df = get_sometable_df(1000)
+        method, rows_per_second, nrows = probe_insert_methods(
+            df, SOMETABLE, engine, [copy_insert, "multi", None],
+            dtype={'json_col': JSON}, index=False, if_exists="append"
+        )
+        assert method in (copy_insert, "multi", None)
+        assert set(rows_per_second) == {"copy_insert", "multi", "executemany"}
+        # the remaining rows can be inserted with the chosen method
+        to_sql(df[nrows:], SOMETABLE, None, parallelize=False, engine=engine,
+               method=method, dtype={'json_col': JSON})
+        with engine.connect() as conn:
+            df_actual = pd.read_sql_table(SOMETABLE, conn)
+        assert sorted(df_actual['id']) == sorted(df['id'])
+        engine.dispose()
+
+    def test_to_sql_writer_pool(self, empty_db_with_sometable):
+        engine = create_engine(empty_db_with_sometable.url, future=True)
+        df = get_sometable_df(1000)
+        with WriterPool(engine, max_workers=4) as pool:
+            to_sql(df, SOMETABLE, None, chunksize=100, engine=engine,
+                   writer_pool=pool, method=copy_insert,
+                   dtype={'json_col': JSON})
+        with engine.connect() as conn:
+            df_actual = pd.read_sql_table(SOMETABLE, conn)
+        df = df.sort_values(by='id').reset_index(drop=True)
+        df_actual = df_actual.sort_values(by='id').reset_index(drop=True)
+        assert df.equals(df_actual)
+        engine.dispose()
+
+    def test_to_sql_processes(self, empty_db_with_sometable):
+        url = empty_db_with_sometable.url
+        df = get_sometable_df(1000)
+        with patch("knockoff.utilities.io.WriterPool") as mock_writer_pool:
+            to_sql(df, SOMETABLE, url, chunksize=100, n_jobs=2,
+                   prefer="processes", dtype={'json_col': JSON})
+        mock_writer_pool.assert_not_called()
+        with create_engine(url, future=True).connect() as conn:
+            assert pd.read_sql_table(SOMETABLE, conn).shape[0] == 1000